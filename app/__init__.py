@@ -3,25 +3,46 @@ from config import Config
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_login import LoginManager
+from app.db_session import RoutingSession
 
-app = Flask(__name__)
-app.config.from_object(Config)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+migrate = Migrate()
+login_manager = LoginManager()
+login_manager.login_view = 'main.login'
 
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
-login_manager = LoginManager(app)
-login_manager.login_view = 'login'
 
-from app import routes, models
-from app.seed_db import seed_database
+def create_app(config_class=Config):
+    """Собирает приложение без обращений к базе: схема и данные - `flask seed`, прогрев - при первом запросе."""
+    app = Flask(__name__)
+    app.config.from_object(config_class)
 
-@login_manager.user_loader
-def load_user(id):
-    return models.User.query.get(int(id))
+    db.init_app(app)
+    migrate.init_app(app, db)
+    login_manager.init_app(app)
 
-# ----------------------------
-# Автоматическое наполнение БД только если нет админа
-# ----------------------------
-with app.app_context():
-    db.create_all()
-    seed_database()
+    from app import models, tasks  # noqa: F401 - модели и фоновые задачи регистрируются при импорте
+    from app.routes import bp, static_file
+    from app.thumbnails import cover_url, cover_srcset
+    from app.database import init_engine, bench_db_command
+    from app.sql_stats import init_sql_stats
+    from app.metrics import init_metrics
+    from app.profiler import init_profiler
+    from app.startup import init_startup, bench_startup_command
+    from app.seed_db import seed_command
+
+    app.register_blueprint(bp)
+    app.view_functions['static'] = static_file
+    app.add_template_global(cover_url)
+    app.add_template_global(cover_srcset)
+    app.cli.add_command(seed_command)
+    app.cli.add_command(bench_startup_command)
+    app.cli.add_command(bench_db_command)
+
+    # прогрев регистрируется первым, чтобы остальные before_request видели готовое приложение
+    init_startup(app)
+    with app.app_context():
+        init_engine(app)
+        init_sql_stats(app)
+        init_metrics(app)
+        init_profiler(app)
+    return app
@@ -0,0 +1,90 @@
+from decimal import Decimal
+from app import db
+from app.models import Record, Release
+
+# --- МАССОВОЕ ИЗМЕНЕНИЕ ЦЕН И ОСТАТКОВ ---
+# Операция применяется к выборке пластинок одним UPDATE ... WHERE, без
+# загрузки объектов. Пробный запуск (dry_run) выполняет тот же WHERE
+# как SELECT count(*), поэтому показывает ровно то число строк,
+# которое затронет настоящий запуск.
+
+BULK_OPERATIONS = [
+    ('set_price', 'Установить цену'),
+    ('adjust_price', 'Изменить цену на %'),
+    ('set_stock', 'Установить остаток'),
+]
+
+FILTER_KEYS = ('release_id', 'band_id', 'manufacturer_profile_id', 'record_type')
+
+# price - Numeric(10, 2); остаток - целое SQLite (64 бита); наценка за один раз - в процентах
+MAX_PRICE = Decimal('99999999.99')
+MAX_STOCK = 2 ** 63 - 1
+MAX_ADJUST = 10000
+
+
+class BulkEditError(ValueError):
+    pass
+
+
+def bulk_criteria(release_id=None, band_id=None, manufacturer_profile_id=None, record_type=None):
+    criteria = []
+    if release_id:
+        criteria.append(Record.release_id == release_id)
+    if band_id:
+        criteria.append(Record.release_id.in_(db.select(Release.id).where(Release.band_id == band_id)))
+    if manufacturer_profile_id:
+        criteria.append(Record.manufacturer_profile_id == manufacturer_profile_id)
+    if record_type:
+        criteria.append(Record.record_type == record_type)
+    return criteria
+
+
+def _new_values(operation, value):
+    try:
+        value = Decimal(str(value))
+    except ArithmeticError:
+        raise BulkEditError('Значение должно быть числом')
+    # NaN ломает сравнения, Infinity - quantize и int()
+    if not value.is_finite():
+        raise BulkEditError('Значение должно быть конечным числом')
+
+    if operation == 'set_price':
+        if value < 0:
+            raise BulkEditError('Цена не может быть отрицательной')
+        if value > MAX_PRICE:
+            raise BulkEditError(f'Цена не может быть больше {MAX_PRICE}')
+        return {'price': value.quantize(Decimal('0.01'))}
+    if operation == 'adjust_price':
+        if value <= -100:
+            raise BulkEditError('Цену можно уменьшить меньше чем на 100%')
+        if value > MAX_ADJUST:
+            raise BulkEditError(f'Цену можно увеличить не больше чем на {MAX_ADJUST}%')
+        factor = 1 + value / 100
+        return {'price': db.func.round(Record.price * factor, 2)}
+    if operation == 'set_stock':
+        # stock_quantity - доступно к продаже; удержанные в корзинах экземпляры не затрагиваются
+        if value < 0 or value != value.to_integral_value():
+            raise BulkEditError('Остаток должен быть целым неотрицательным числом')
+        if value > MAX_STOCK:
+            raise BulkEditError(f'Остаток не может быть больше {MAX_STOCK}')
+        return {'stock_quantity': int(value)}
+    raise BulkEditError(f'Неизвестная операция: {operation}')
+
+
+def bulk_update(operation, value, criteria, dry_run=False, whole_catalog=False):
+    """Применяет операцию к пластинкам, подходящим под criteria; возвращает число строк.
+
+    Без фильтров UPDATE задел бы весь каталог - это нужно подтвердить явно (whole_catalog).
+    """
+    values = _new_values(operation, value)
+    if dry_run:
+        return db.session.query(db.func.count(Record.id)).filter(*criteria).scalar()
+    if not criteria and not whole_catalog:
+        raise BulkEditError('Не выбран ни один фильтр: подтвердите изменение всего каталога')
+
+    updated = db.session.execute(
+        db.update(Record).where(*criteria).values(**values)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return updated
@@ -0,0 +1,121 @@
+import threading
+from collections import OrderedDict
+from flask import current_app
+from app import db
+from app.database import upsert_insert
+from app.models import CartItem
+
+# --- СЕРВЕРНАЯ КОРЗИНА ---
+# Корзина хранится на сервере по id покупателя как {record_id: qty} с целыми
+# ключами, в cookie остаётся только сессия входа. Бэкенд выбирается CART_BACKEND:
+# 'sql' - таблица cart_items (каждое изменение - один upsert/delete),
+# 'memory' - LRU в памяти процесса (для одного воркера и тестовых стендов).
+
+
+class SqlCartStore:
+    def get(self, user_id):
+        rows = db.session.query(CartItem.record_id, CartItem.quantity).filter(CartItem.user_id == user_id)
+        return dict(rows)
+
+    def add(self, user_id, record_id, quantity):
+        # без commit: строка корзины сохраняется одной транзакцией с удержанием (см. routes.add_to_cart)
+        stmt = upsert_insert(CartItem).values(user_id=user_id, record_id=record_id, quantity=quantity)
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=['user_id', 'record_id'],
+            set_={'quantity': CartItem.quantity + stmt.excluded.quantity}
+        ))
+
+    def decrease(self, user_id, record_id, quantity=1):
+        updated = db.session.execute(
+            db.update(CartItem)
+            .where(CartItem.user_id == user_id, CartItem.record_id == record_id,
+                   CartItem.quantity > quantity)
+            .values(quantity=CartItem.quantity - quantity)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not updated:
+            return self.remove(user_id, record_id)
+        db.session.commit()
+
+    def remove(self, user_id, record_id):
+        db.session.execute(
+            db.delete(CartItem)
+            .where(CartItem.user_id == user_id, CartItem.record_id == record_id)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+    def clear(self, user_id):
+        db.session.execute(
+            db.delete(CartItem).where(CartItem.user_id == user_id)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+    def remove_record(self, record_id):
+        # из всех корзин; без commit - выполняется в транзакции удаления пластинки
+        db.session.execute(
+            db.delete(CartItem).where(CartItem.record_id == record_id)
+            .execution_options(synchronize_session=False)
+        )
+
+
+class MemoryCartStore:
+    def __init__(self, capacity=10000):
+        self.capacity = capacity
+        self._carts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _cart(self, user_id):
+        # вызывается под блокировкой; недавно использованные корзины - в конце
+        cart = self._carts.pop(user_id, None)
+        if cart is None:
+            cart = {}
+        self._carts[user_id] = cart
+        while len(self._carts) > self.capacity:
+            self._carts.popitem(last=False)
+        return cart
+
+    def get(self, user_id):
+        with self._lock:
+            return dict(self._cart(user_id))
+
+    def add(self, user_id, record_id, quantity):
+        with self._lock:
+            cart = self._cart(user_id)
+            cart[record_id] = cart.get(record_id, 0) + quantity
+
+    def decrease(self, user_id, record_id, quantity=1):
+        with self._lock:
+            cart = self._cart(user_id)
+            if record_id in cart:
+                cart[record_id] -= quantity
+                if cart[record_id] <= 0:
+                    del cart[record_id]
+
+    def remove(self, user_id, record_id):
+        with self._lock:
+            self._cart(user_id).pop(record_id, None)
+
+    def clear(self, user_id):
+        with self._lock:
+            self._carts.pop(user_id, None)
+
+    def remove_record(self, record_id):
+        with self._lock:
+            for cart in self._carts.values():
+                cart.pop(record_id, None)
+
+
+def get_cart_store():
+    store = current_app.extensions.get('cart_store')
+    if store is None:
+        backend = current_app.config['CART_BACKEND']
+        if backend == 'memory':
+            store = MemoryCartStore(current_app.config['CART_MEMORY_CAPACITY'])
+        elif backend == 'sql':
+            store = SqlCartStore()
+        else:
+            raise ValueError(f'Неизвестный CART_BACKEND: {backend}')
+        store = current_app.extensions.setdefault('cart_store', store)
+    return store
@@ -0,0 +1,93 @@
+import datetime
+import random
+import time
+from sqlalchemy.exc import OperationalError
+from app import db
+from app.models import Record, Order, OrderItem
+from app.sales import add_sales
+from app.reservations import claim, take_from_stock, return_to_stock
+from app.jobs import enqueue
+
+# --- ОФОРМЛЕНИЕ ЗАКАЗА ---
+# Удержания покупателя (см. reservations.py) превращаются в продажу, а
+# недостающее списывается одним UPDATE ... WHERE stock_quantity >= qty,
+# поэтому два покупателя не могут продать один и тот же экземпляр.
+# Позиции заказа вставляются пачкой, адрес профиля и уведомления уходят в
+# фоновые задачи (в той же транзакции, что и заказ), а при блокировке SQLite
+# ("database is locked") транзакция повторяется с экспоненциальной задержкой.
+
+NEW_ORDER_STATUS = 'В обработке'
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 0.05
+
+
+class OutOfStock(Exception):
+    def __init__(self, record_ids):
+        super().__init__(f'Недостаточно на складе: {sorted(record_ids)}')
+        self.record_ids = set(record_ids)
+
+
+def _is_lock_error(exc):
+    return 'database is locked' in str(exc.orig) or 'database table is locked' in str(exc.orig)
+
+
+def _place_order(user_id, quantities, payment_method, shipping_address, comment):
+    # сначала забираем удержания из корзины, со склада списываем только недостающее
+    held = claim(user_id, quantities)
+    need = {rid: q - held.get(rid, 0) for rid, q in quantities.items() if q > held.get(rid, 0)}
+    short = take_from_stock(need)
+    if short:
+        db.session.rollback()
+        raise OutOfStock(short)
+    return_to_stock({rid: held[rid] - q for rid, q in quantities.items() if held.get(rid, 0) > q})
+
+    prices = dict(db.session.query(Record.id, Record.price).filter(Record.id.in_(list(quantities))))
+    # пластинку могли удалить, пока её удержание лежало в корзине, - для покупателя её нет в наличии
+    gone = set(quantities) - set(prices)
+    if gone:
+        db.session.rollback()
+        raise OutOfStock(gone)
+
+    now = datetime.datetime.utcnow()
+    order = Order(
+        user_id=user_id,
+        order_date=now,
+        total_amount=sum(prices[rid] * q for rid, q in quantities.items()),
+        status=NEW_ORDER_STATUS,
+        payment_method=payment_method,
+        shipping_address=shipping_address,
+        comment=comment
+    )
+    db.session.add(order)
+    db.session.flush()
+
+    db.session.execute(db.insert(OrderItem), [
+        {'order_id': order.id, 'record_id': rid, 'quantity': q, 'price_at_purchase': prices[rid]}
+        for rid, q in quantities.items()
+    ])
+    add_sales(now.date(), [(rid, q, prices[rid]) for rid, q in quantities.items()])
+
+    # всё, что не влияет на сам заказ, - в фоне; задачи сохраняются одним commit с заказом
+    enqueue('save_shipping_address', user_id=user_id, address=shipping_address)
+    enqueue('order_placed', order_id=order.id)
+
+    db.session.commit()
+    return order
+
+
+def place_order(user_id, cart, payment_method, shipping_address, comment=None):
+    """Оформляет заказ из корзины {record_id: qty}; OutOfStock, если чего-то не хватило."""
+    quantities = {int(rid): int(q) for rid, q in cart.items() if int(q) > 0}
+    if not quantities:
+        raise OutOfStock(())
+
+    for attempt in range(MAX_ATTEMPTS):
+        try:
+            order = _place_order(user_id, quantities, payment_method, shipping_address, comment)
+            break
+        except OperationalError as exc:
+            db.session.rollback()
+            if not _is_lock_error(exc) or attempt == MAX_ATTEMPTS - 1:
+                raise
+            time.sleep(BACKOFF_BASE * (2 ** attempt) * random.uniform(0.5, 1.5))
+    return order
@@ -0,0 +1,171 @@
+import logging
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.dialects import postgresql, sqlite
+from app import db
+
+# --- НАСТРОЙКА СОЕДИНЕНИЙ ---
+# Для SQLite каждое новое соединение пула получает PRAGMA из SQLITE_PRAGMAS.
+# journal_mode=WAL хранится в самом файле базы, остальные действуют
+# только на соединение, поэтому выставляются при каждом подключении.
+
+logger = logging.getLogger(__name__)
+
+# INSERT ... ON CONFLICT DO UPDATE (корзина, удержания, свод продаж) одинаково
+# строится для SQLite и PostgreSQL; на других базах upsert не собрать
+UPSERT_INSERTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+
+def _pragma_listener(key, pragmas):
+    warned = []
+
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            # busy_timeout первым: смена journal_mode тоже может ждать блокировку
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name}={value}')
+                if name == 'journal_mode' and str(value).lower() == 'wal':
+                    mode = cursor.fetchone()[0]
+                    if mode != 'wal' and not warned:
+                        warned.append(mode)
+                        logger.warning('SQLite (%s) не перешла в WAL (journal_mode=%s)', key or 'основная', mode)
+        finally:
+            cursor.close()
+    return set_pragmas
+
+
+def upsert_insert(model):
+    """insert() диалекта основной базы - с on_conflict_do_update и excluded."""
+    return UPSERT_INSERTS[db.engine.dialect.name](model)
+
+
+def init_engine(app):
+    # неподдерживаемую базу видно сразу при запуске, а не на первой покупке
+    dialect = db.engine.dialect.name
+    if dialect not in UPSERT_INSERTS:
+        raise RuntimeError(f'База {dialect} не поддерживается: нужна SQLite или PostgreSQL (DATABASE_URL)')
+    pragmas = {name: value for name, value in app.config['SQLITE_PRAGMAS'].items() if value not in (None, '')}
+    for key, engine in db.engines.items():
+        if engine.dialect.name != 'sqlite':
+            continue
+        event.listen(engine, 'connect', _pragma_listener(key, pragmas))
+        # соединения, открытые до подписки, закрываем, чтобы и они получили PRAGMA
+        engine.dispose()
+
+
+def optimize_planner():
+    # без sqlite_stat1 планировщик выбирает индекс наугад: при первом запуске
+    # собираем статистику ANALYZE, дальше PRAGMA optimize обновляет устаревшую;
+    # analysis_limit ограничивает число просматриваемых строк на индекс
+    if db.engine.dialect.name != 'sqlite':
+        return
+    with db.engine.connect() as connection:
+        connection.exec_driver_sql('PRAGMA analysis_limit=1000')
+        has_stats = connection.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'"
+        ).first() is not None
+        connection.exec_driver_sql('PRAGMA optimize' if has_stats else 'ANALYZE')
+        connection.commit()
+
+
+# --- ЗАМЕР ЧТЕНИЯ И ЗАПИСИ ---
+# Копия базы нагружается читателями (страница каталога + пластинка по id) и
+# писателями (остаток + строка в jobs) дважды: с журналом отката без PRAGMA,
+# как было до WAL, и с SQLITE_PRAGMAS. Рабочая база не меняется.
+
+_READ_SQL = text(
+    'SELECT r.id, r.title, b.name, count(rc.id) FROM releases r JOIN bands b ON b.id = r.band_id '
+    'LEFT JOIN records rc ON rc.release_id = r.id GROUP BY r.id ORDER BY r.title LIMIT 24'
+)
+_RECORD_SQL = text('SELECT * FROM records WHERE id = :id')
+_STOCK_SQL = text('UPDATE records SET stock_quantity = stock_quantity + 1 WHERE id = :id')
+_JOB_SQL = text(
+    "INSERT INTO jobs (name, payload, status, attempts, max_attempts, created_at, run_at) "
+    "VALUES ('bench', '{}', 'done', 0, 1, :now, :now)"
+)
+
+
+def _bench_run(path, pragmas, timeout, readers, writers, seconds, record_ids):
+    engine = create_engine(f'sqlite:///{path}', connect_args={'timeout': timeout},
+                           pool_size=readers + writers)
+    if pragmas:
+        event.listen(engine, 'connect', _pragma_listener('bench', pragmas))
+    counts = {'reads': 0, 'writes': 0, 'lock_errors': 0}
+    lock = threading.Lock()
+    stop = time.perf_counter() + seconds
+
+    def reader():
+        n = 0
+        while time.perf_counter() < stop:
+            with engine.connect() as connection:
+                connection.execute(_READ_SQL).all()
+                connection.execute(_RECORD_SQL, {'id': random.choice(record_ids)}).all()
+            n += 1
+        with lock:
+            counts['reads'] += n
+
+    def writer():
+        n = errors = 0
+        while time.perf_counter() < stop:
+            try:
+                with engine.begin() as connection:
+                    connection.execute(_STOCK_SQL, {'id': random.choice(record_ids)})
+                    connection.execute(_JOB_SQL, {'now': '2000-01-01 00:00:00'})
+                n += 1
+            except OperationalError:
+                errors += 1
+        with lock:
+            counts['writes'] += n
+            counts['lock_errors'] += errors
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads += [threading.Thread(target=writer) for _ in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    engine.dispose()
+    return counts
+
+
+@click.command('bench-db')
+@click.option('--seconds', default=5.0, show_default=True, help='Длительность каждого прогона.')
+@click.option('--readers', default=6, show_default=True, help='Потоков-читателей.')
+@click.option('--writers', default=2, show_default=True, help='Потоков-писателей.')
+@with_appcontext
+def bench_db_command(seconds, readers, writers):
+    """Пропускная способность чтения и записи SQLite: журнал отката против WAL и PRAGMA."""
+    if db.engine.dialect.name != 'sqlite':
+        raise click.ClickException('Замер рассчитан на SQLite')
+    record_ids = db.session.scalars(text('SELECT id FROM records')).all()
+    if not record_ids:
+        raise click.ClickException('В базе нет пластинок: сначала flask seed')
+    db.session.rollback()
+    source = sqlite3.connect(db.engine.url.database)
+    pragmas = {name: value for name, value in current_app.config['SQLITE_PRAGMAS'].items() if value not in (None, '')}
+    with tempfile.TemporaryDirectory() as folder:
+        for label, run_pragmas, timeout in (('до (журнал отката)', {}, 5),
+                                            ('после (WAL, PRAGMA)', pragmas, 15)):
+            path = os.path.join(folder, 'bench.db')
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+            # backup() даёт согласованную копию и при открытом WAL рабочей базы
+            target = sqlite3.connect(path)
+            source.backup(target)
+            target.execute('PRAGMA journal_mode=DELETE')
+            target.close()
+            counts = _bench_run(path, run_pragmas, timeout, readers, writers, seconds, record_ids)
+            click.echo(f'{label:>20}: чтений/с {counts["reads"] / seconds:8.0f}, '
+                       f'записей/с {counts["writes"] / seconds:7.0f}, ошибок блокировки {counts["lock_errors"]}')
+    source.close()
@@ -0,0 +1,58 @@
+import datetime
+import threading
+import time
+from sqlalchemy import Select, text
+from flask_sqlalchemy.session import Session
+
+# --- МАРШРУТИЗАЦИЯ ЧТЕНИЯ НА РЕПЛИКУ ---
+# Сессия, помеченная read_replica (см. replica.replica_reads), отправляет
+# SELECT в bind 'replica'. Запись (flush, UPDATE/INSERT/DELETE) всегда идёт
+# в основную базу и закрепляет за ней сессию до конца запроса, поэтому
+# только что записанное читается оттуда же. Реплика, отставшая больше
+# REPLICA_MAX_LAG секунд по строке replication_heartbeat, не используется.
+
+REPLICA_BIND = 'replica'
+FRESHNESS_TTL = 1.0  # как часто перепроверять отставание, секунды
+
+_freshness = {'checked': 0.0, 'fresh': False}
+_freshness_lock = threading.Lock()
+
+
+def replica_lag(engine):
+    """Отставание реплики в секундах по строке heartbeat; None, если прочитать её не удалось."""
+    try:
+        with engine.connect() as connection:
+            value = connection.execute(text('SELECT updated_at FROM replication_heartbeat WHERE id = 1')).scalar()
+    except Exception:
+        return None
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.datetime.fromisoformat(value)
+    return (datetime.datetime.utcnow() - value).total_seconds()
+
+
+def replica_is_fresh(engine, max_lag):
+    now = time.monotonic()
+    if now - _freshness['checked'] < FRESHNESS_TTL:
+        return _freshness['fresh']
+    with _freshness_lock:
+        if now - _freshness['checked'] >= FRESHNESS_TTL:
+            lag = replica_lag(engine)
+            _freshness['fresh'] = lag is not None and lag <= max_lag
+            _freshness['checked'] = time.monotonic()
+    return _freshness['fresh']
+
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self.info.get('read_replica'):
+            if self._flushing or (clause is not None and not isinstance(clause, Select)):
+                self.info['wrote'] = True
+            elif clause is not None and not self.info.get('wrote') \
+                    and not clause.get_execution_options().get('use_primary'):
+                engine = self._db.engines.get(REPLICA_BIND)
+                max_lag = self.info.get('replica_max_lag', 0)
+                if engine is not None and replica_is_fresh(engine, max_lag):
+                    return engine
+        return super().get_bind(mapper, clause, bind, **kwargs)
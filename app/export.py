@@ -0,0 +1,77 @@
+import csv
+import io
+import json
+from app import db
+from app.models import Order, OrderItem, Record, User
+from app.order_search import filter_orders
+
+# --- ВЫГРУЗКА ЗАКАЗОВ ---
+# Одна строка на позицию заказа. Строки читаются из курсора пачками
+# (yield_per) и сразу уходят клиенту, поэтому память не растёт с размером
+# выгрузки, а первые байты отправляются до того, как прочитан весь результат.
+
+EXPORT_BATCH = 1000
+
+EXPORT_COLUMNS = [
+    'order_id', 'order_date', 'username', 'status', 'payment_method', 'total_amount',
+    'item_id', 'record_id', 'record_title', 'quantity', 'price_at_purchase',
+]
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+
+def export_rows(q='', status=None, date_from=None, date_to=None):
+    query = db.session.query(
+        Order.id, Order.order_date, User.username, Order.status, Order.payment_method, Order.total_amount,
+        OrderItem.id, OrderItem.record_id, Record.title, OrderItem.quantity, OrderItem.price_at_purchase
+    ).select_from(OrderItem) \
+        .join(Order, Order.id == OrderItem.order_id) \
+        .join(User, User.id == Order.user_id) \
+        .join(Record, Record.id == OrderItem.record_id)
+    query = filter_orders(query, q, status, date_from, date_to)
+    # в порядке ix_orders_order_date: выгрузка за период читает только свой диапазон, без сортировки
+    return query.order_by(Order.order_date, Order.id, OrderItem.id).yield_per(EXPORT_BATCH)
+
+
+def _plain(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if value is None or isinstance(value, (int, str)):
+        return value
+    return str(value)  # Decimal - строкой, без потери копеек
+
+
+def _batches(rows):
+    batch = []
+    for row in rows:
+        batch.append([_plain(v) for v in row])
+        if len(batch) == EXPORT_BATCH:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def generate_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for batch in _batches(rows):
+        writer.writerows(batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def generate_jsonl(rows):
+    for batch in _batches(rows):
+        yield ''.join(json.dumps(dict(zip(EXPORT_COLUMNS, values)), ensure_ascii=False) + '\n'
+                      for values in batch)
+
+
+GENERATORS = {'csv': generate_csv, 'jsonl': generate_jsonl}
@@ -0,0 +1,136 @@
+import gzip
+import logging
+import mimetypes
+import os
+from flask import current_app, request, abort
+from werkzeug.security import safe_join
+from werkzeug.utils import send_file
+
+try:
+    import brotli
+except ImportError:  # без brotli готовятся только .gz
+    brotli = None
+
+# --- ОТДАЧА ФАЙЛОВ ---
+# Общая точка для статики, обложек и их копий. send_file даёт ETag и
+# Last-Modified (ответ 304 на If-None-Match / If-Modified-Since) и диапазоны
+# байтов. Сверх этого:
+# - для CSS/JS заранее сжатые .br/.gz копии (лежат в PRECOMPRESSED_FOLDER)
+#   отдаются по Accept-Encoding, без сжатия на каждый запрос;
+# - SENDFILE_MODE = 'x-sendfile' | 'x-accel-redirect' отдаёт вместо тела
+#   только заголовки, а байты читает с диска прокси (Apache / nginx).
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+PRECOMPRESS_EXTENSIONS = ('.css', '.js', '.svg')
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+logger = logging.getLogger(__name__)
+
+
+def _precompressed(path, relative):
+    # самая выгодная из принятых клиентом копий, если она не старше исходника
+    folder = current_app.config['PRECOMPRESSED_FOLDER']
+    mtime = os.path.getmtime(path)
+    for encoding, suffix in ENCODINGS:
+        if not request.accept_encodings[encoding]:
+            continue
+        candidate = os.path.join(folder, relative + suffix)
+        if os.path.isfile(candidate) and os.path.getmtime(candidate) >= mtime:
+            return candidate, encoding
+    return path, None
+
+
+def _offload(response, path):
+    mode = current_app.config['SENDFILE_MODE']
+    if mode == 'x-accel-redirect':
+        # nginx: location <SENDFILE_ACCEL_PREFIX>/ { internal; alias <SENDFILE_ROOT>/; }
+        relative = os.path.relpath(path, current_app.config['SENDFILE_ROOT'])
+        response.headers['X-Accel-Redirect'] = f"{current_app.config['SENDFILE_ACCEL_PREFIX']}/{relative}"
+    else:
+        response.headers['X-Sendfile'] = path
+    return response
+
+
+def send_file_cached(folder, filename, etag=True, max_age=None, immutable=False, vary=()):
+    """Отдаёт folder/filename с условными запросами, диапазонами и, где можно, сжатой копией или через прокси."""
+    path = safe_join(folder, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+
+    encoding = None
+    vary = set(vary)
+    if os.path.splitext(filename)[1].lower() in PRECOMPRESS_EXTENSIONS:
+        vary.add('Accept-Encoding')
+        path, encoding = _precompressed(path, filename)
+        if encoding and isinstance(etag, str):
+            etag = f'{etag}-{encoding}'
+
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    offload = current_app.config['SENDFILE_MODE'] in ('x-sendfile', 'x-accel-redirect')
+    # при выгрузке через прокси диапазоны разбирает прокси, здесь - только 304
+    response = send_file(path, request.environ, mimetype=mimetype, etag=etag, max_age=max_age,
+                         conditional=not offload, use_x_sendfile=offload,
+                         response_class=current_app.response_class)
+    if offload:
+        response.headers.pop('X-Sendfile', None)
+        response = response.make_conditional(request)
+        if response.status_code != 304:
+            _offload(response, path)
+        # тело и его длину подставит прокси
+        response.content_length = None
+
+    if encoding:
+        response.content_encoding = encoding
+    if immutable:
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+    for header in vary:
+        response.vary.add(header)
+    return response
+
+
+# --- ПОДГОТОВКА СЖАТЫХ КОПИЙ ---
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f'{path}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def precompress_static(folder=None):
+    """Готовит .gz (и .br, если есть brotli) для CSS/JS, у которых копии нет или она устарела."""
+    folder = folder or current_app.static_folder
+    target = current_app.config['PRECOMPRESSED_FOLDER']
+    written = 0
+    for root, _, files in os.walk(folder):
+        for name in files:
+            if os.path.splitext(name)[1].lower() not in PRECOMPRESS_EXTENSIONS:
+                continue
+            source = os.path.join(root, name)
+            relative = os.path.relpath(source, folder)
+            mtime = os.path.getmtime(source)
+            data = None
+            for encoding, suffix in ENCODINGS:
+                if encoding == 'br' and brotli is None:
+                    continue
+                out = os.path.join(target, relative + suffix)
+                if os.path.exists(out) and os.path.getmtime(out) >= mtime:
+                    continue
+                if data is None:
+                    with open(source, 'rb') as f:
+                        data = f.read()
+                packed = brotli.compress(data, quality=11) if encoding == 'br' \
+                    else gzip.compress(data, compresslevel=9, mtime=0)
+                if len(packed) < len(data):
+                    _write(out, packed)
+                    written += 1
+    return written
+
+
+def init_file_serving():
+    try:
+        precompress_static()
+    except OSError:
+        logger.exception('Не удалось подготовить сжатые копии статики')
@@ -1,9 +1,9 @@
 from flask_wtf import FlaskForm
 from wtforms import StringField, TextAreaField, SubmitField, PasswordField, BooleanField, IntegerField, DecimalField, SelectField, FileField, SelectMultipleField, TimeField
-from wtforms.validators import DataRequired, EqualTo, Optional, ValidationError, NumberRange
+from wtforms.validators import DataRequired, InputRequired, EqualTo, Optional, ValidationError, NumberRange
 from app.models import User, Release, UserMixin
 from flask_login import current_user
-from flask_wtf.file import FileAllowed
+from flask_wtf.file import FileAllowed, FileRequired
 
 class LoginForm(FlaskForm):
     username = StringField('Имя пользователя', validators=[DataRequired()])
@@ -69,6 +69,28 @@ class RecordForm(FlaskForm):
     submit = SubmitField('Сохранить пластинку')
 
 
+class RecordImportForm(FlaskForm):
+    data_file = FileField('Файл (CSV с заголовком или JSONL)', validators=[
+        FileRequired(),
+        FileAllowed(['csv', 'jsonl'], 'Только CSV или JSONL!')
+    ])
+    skip_invalid = BooleanField('Пропустить строки с ошибками и загрузить остальные')
+    submit = SubmitField('Загрузить')
+
+
+class RecordBulkEditForm(FlaskForm):
+    operation = SelectField('Операция', validators=[DataRequired()])
+    # InputRequired, а не DataRequired: 0 (обнулить остаток, цена +0%) - допустимое значение
+    value = DecimalField('Значение', validators=[InputRequired(message='Укажите значение')])
+    release_id = SelectField('Релиз', coerce=int, validators=[Optional()])
+    band_id = SelectField('Группа', coerce=int, validators=[Optional()])
+    manufacturer_profile_id = SelectField('Производитель', coerce=int, validators=[Optional()])
+    record_type = StringField('Тип записи', validators=[Optional()])
+    all_records = BooleanField('Применить ко всему каталогу, если фильтры не выбраны')
+    preview = SubmitField('Посчитать')
+    submit = SubmitField('Применить')
+
+
 class AdminEditUserForm(EditProfileForm):
     role = SelectField('Роль', choices=[
         ('user', 'Покупатель'), 
@@ -109,14 +131,16 @@ class ReleaseForm(FlaskForm):
     cover_image = FileField('Обложка', validators=[Optional()])
     submit = SubmitField('Сохранить')
 
+ORDER_STATUS_CHOICES = [
+    ('pending', 'В ожидании'),
+    ('paid', 'Оплачен'),
+    ('shipped', 'Отправлен'),
+    ('completed', 'Завершён'),
+    ('cancelled', 'Отменён')
+]
+
 class AdminOrderForm(FlaskForm):
-    status = SelectField('Статус', choices=[
-        ('pending', 'В ожидании'),
-        ('paid', 'Оплачен'),
-        ('shipped', 'Отправлен'),
-        ('completed', 'Завершён'),
-        ('cancelled', 'Отменён')
-    ], validators=[DataRequired()])
+    status = SelectField('Статус', choices=ORDER_STATUS_CHOICES, validators=[DataRequired()])
     shipping_address = TextAreaField('Адрес доставки', validators=[DataRequired()])
     payment_method = SelectField('Способ оплаты', choices=[('Card', 'Картой онлайн'), ('Cash', 'Наличными при получении')], validators=[DataRequired()])
     comment = TextAreaField('Комментарий к заказу')
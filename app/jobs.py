@@ -0,0 +1,218 @@
+import datetime
+import json
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app import db
+from app.models import Job
+
+# --- ФОНОВЫЕ ЗАДАЧИ ---
+# Задачи пишутся в таблицу jobs и поэтому переживают перезапуск.
+# Поток-диспетчер атомарно забирает готовые задачи (UPDATE ... RETURNING)
+# и отдаёт их пулу потоков. Упавшая задача повторяется с экспоненциальной
+# задержкой, пока не исчерпает max_attempts. Задачу, которая числится
+# выполняемой дольше JOB_LEASE_TIMEOUT, процесс-владелец бросил (упал или
+# перезапущен) - её возвращает в очередь любой живой процесс.
+# enqueue только добавляет строку в сессию вызывающего: задача сохраняется
+# его же commit вместе с остальными изменениями (или пропадает с откатом).
+
+BACKOFF_BASE = 2  # секунды
+BACKOFF_MAX = 15 * 60
+
+logger = logging.getLogger(__name__)
+
+_tasks = {}
+_wakeup = threading.Event()
+
+
+def task(name):
+    def decorator(f):
+        _tasks[name] = f
+        return f
+    return decorator
+
+
+def enqueue(name, delay=0, max_attempts=5, **payload):
+    if name not in _tasks:
+        raise ValueError(f'Неизвестная задача: {name}')
+    now = datetime.datetime.utcnow()
+    job = Job(
+        name=name,
+        payload=json.dumps(payload),
+        max_attempts=max_attempts,
+        created_at=now,
+        run_at=now + datetime.timedelta(seconds=delay)
+    )
+    db.session.add(job)
+    db.session.info['jobs_enqueued'] = True
+    return job
+
+
+@event.listens_for(Session, 'after_commit')
+def _wake_workers(session):
+    # будим диспетчер, когда задачи уже видны другим соединениям
+    if session.info.pop('jobs_enqueued', False):
+        _wakeup.set()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_enqueued(session):
+    session.info.pop('jobs_enqueued', None)
+
+
+def _claim():
+    now = datetime.datetime.utcnow()
+    ready = db.session.execute(
+        db.select(Job.id)
+        .where(Job.status == 'queued', Job.run_at <= now)
+        .order_by(Job.run_at, Job.id).limit(1)
+    ).scalar()
+    if ready is None:
+        # пустой опрос не берёт блокировку на запись
+        db.session.rollback()
+        return None
+    row = db.session.execute(
+        db.update(Job)
+        .where(Job.id == ready, Job.status == 'queued')
+        .values(status='running', started_at=now, attempts=Job.attempts + 1)
+        .returning(Job.id, Job.name, Job.payload, Job.attempts, Job.max_attempts)
+        .execution_options(synchronize_session=False)
+    ).first()
+    db.session.commit()
+    return row
+
+
+def _finish(job_id, **values):
+    db.session.execute(
+        db.update(Job).where(Job.id == job_id).values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+
+def _run(app, job):
+    job_id, name, payload, attempts, max_attempts = job
+    with app.app_context():
+        try:
+            _tasks[name](**json.loads(payload))
+        except Exception as exc:
+            db.session.rollback()
+            logger.exception('Задача %s #%s упала (попытка %s)', name, job_id, attempts)
+            now = datetime.datetime.utcnow()
+            if attempts >= max_attempts:
+                _finish(job_id, status='failed', finished_at=now, last_error=repr(exc))
+            else:
+                delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempts - 1)) * random.uniform(0.8, 1.2)
+                _finish(job_id, status='queued', last_error=repr(exc),
+                        run_at=now + datetime.timedelta(seconds=delay))
+                _wakeup.set()
+        else:
+            _finish(job_id, status='done', finished_at=datetime.datetime.utcnow(), last_error=None)
+        finally:
+            db.session.remove()
+
+
+def requeue_stale(lease):
+    """Возвращает в очередь задачи, выполняемые дольше lease секунд; результат - их число."""
+    # свежие 'running' не трогаем: их может выполнять другой живой процесс
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(seconds=lease)
+    count = db.session.execute(
+        db.update(Job).where(Job.status == 'running', Job.started_at < cutoff).values(status='queued')
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return count
+
+
+def _next_due(poll):
+    # спим до ближайшей отложенной задачи, но не дольше интервала опроса
+    run_at = db.session.query(db.func.min(Job.run_at)).filter(Job.status == 'queued').scalar()
+    if run_at is None:
+        return poll
+    return min(poll, max(0.0, (run_at - datetime.datetime.utcnow()).total_seconds()))
+
+
+def _dispatch_loop(app, pool, slots):
+    poll = app.config['JOB_POLL_INTERVAL']
+    lease = app.config['JOB_LEASE_TIMEOUT']
+    timeout = 0
+    recovered_at = time.monotonic()
+    while True:
+        _wakeup.wait(timeout)
+        _wakeup.clear()
+        timeout = poll
+        if time.monotonic() - recovered_at >= lease:
+            recovered_at = time.monotonic()
+            with app.app_context():
+                try:
+                    if requeue_stale(lease):
+                        _wakeup.set()
+                except Exception:
+                    db.session.rollback()
+                    logger.exception('Не удалось вернуть в очередь брошенные задачи')
+                finally:
+                    db.session.remove()
+        while slots.acquire(blocking=False):
+            with app.app_context():
+                try:
+                    job = _claim()
+                    if job is None:
+                        timeout = _next_due(poll)
+                except Exception:
+                    db.session.rollback()
+                    logger.exception('Не удалось забрать задачу из очереди')
+                    job = None
+                finally:
+                    db.session.remove()
+            if job is None:
+                slots.release()
+                break
+            try:
+                future = pool.submit(_run, app, job)
+            except RuntimeError:
+                # пул уже закрыт - интерпретатор завершается, задачу вернёт в очередь следующий запуск
+                return
+            future.add_done_callback(lambda _: (slots.release(), _wakeup.set()))
+
+
+def start_job_workers(app):
+    workers = app.config['JOB_WORKERS']
+    if workers <= 0:
+        return None
+    # задачи, брошенные упавшими процессами; остальные 'running' могут выполняться соседями
+    with app.app_context():
+        requeue_stale(app.config['JOB_LEASE_TIMEOUT'])
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+    slots = threading.BoundedSemaphore(workers)
+    thread = threading.Thread(target=_dispatch_loop, args=(app, pool, slots), name='job-dispatcher', daemon=True)
+    thread.start()
+    _wakeup.set()
+    return pool
+
+
+def queue_stats():
+    now = datetime.datetime.utcnow()
+    counts = dict(db.session.query(Job.status, db.func.count(Job.id)).group_by(Job.status))
+    oldest = db.session.query(db.func.min(Job.run_at)) \
+        .filter(Job.status == 'queued', Job.run_at <= now).scalar()
+
+    # задержка до старта и время выполнения по последним 100 завершённым задачам
+    recent = db.session.query(Job.created_at, Job.started_at, Job.finished_at) \
+        .filter(Job.status == 'done').order_by(Job.finished_at.desc()).limit(100).all()
+    waits = [(s - c).total_seconds() for c, s, f in recent if s and c]
+    runs = [(f - s).total_seconds() for c, s, f in recent if s and f]
+
+    failed = Job.query.filter(Job.status == 'failed').order_by(Job.finished_at.desc()).limit(20).all()
+    return {
+        'counts': counts,
+        'depth': counts.get('queued', 0),
+        'oldest_wait': (now - oldest).total_seconds() if oldest else 0,
+        'avg_wait': sum(waits) / len(waits) if waits else 0,
+        'max_wait': max(waits) if waits else 0,
+        'avg_run': sum(runs) / len(runs) if runs else 0,
+        'failed': failed,
+    }
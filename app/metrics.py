@@ -0,0 +1,202 @@
+import threading
+import time
+from flask import Response, abort, g, request
+from app import db
+from app.sql_stats import request_sql_stats
+
+# --- МЕТРИКИ ДЛЯ PROMETHEUS ---
+# Каждый поток пишет в свои словари без блокировок; /metrics складывает
+# словари всех потоков в момент опроса. Счётчики завершившихся потоков
+# переносятся в общий итог при регистрации нового потока и при опросе,
+# поэтому список не растёт, даже если /metrics никто не опрашивает
+# (dev-сервер Werkzeug заводит поток на каждый запрос).
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_HELP = {
+    'http_requests_total': ('counter', 'Завершённые HTTP-запросы'),
+    'http_request_duration_seconds': ('histogram', 'Время обработки HTTP-запроса'),
+    'http_requests_in_flight': ('gauge', 'HTTP-запросы в обработке'),
+    'db_queries_total': ('counter', 'SQL-запросы, выполненные при обработке HTTP-запросов'),
+    'db_query_duration_seconds_total': ('counter', 'Время в базе при обработке HTTP-запросов'),
+    'db_pool_size': ('gauge', 'Размер пула соединений'),
+    'db_pool_checked_out': ('gauge', 'Соединения, выданные из пула'),
+    'db_pool_overflow': ('gauge', 'Соединения сверх размера пула'),
+    'refcache_requests_total': ('counter', 'Обращения к кэшу справочников'),
+}
+
+
+class _ThreadMetrics:
+    def __init__(self):
+        self.counters = {}    # (имя, метки) -> значение
+        self.histograms = {}  # (имя, метки) -> [счётчики по корзинам..., +Inf, сумма]
+
+
+_local = threading.local()
+_lock = threading.Lock()
+_threads = []  # [(поток, _ThreadMetrics)]
+_retired = _ThreadMetrics()
+
+
+def _retire_dead():
+    # под _lock: словари завершившихся потоков - в общий итог, в списке остаются живые
+    alive = []
+    for thread, metrics in _threads:
+        if thread.is_alive():
+            alive.append((thread, metrics))
+        else:
+            _merge_into(_retired, metrics.counters, metrics.histograms)
+    _threads[:] = alive
+
+
+def _mine():
+    metrics = getattr(_local, 'metrics', None)
+    if metrics is None:
+        metrics = _local.metrics = _ThreadMetrics()
+        with _lock:
+            _retire_dead()
+            _threads.append((threading.current_thread(), metrics))
+    return metrics
+
+
+def inc(name, labels=(), value=1):
+    counters = _mine().counters
+    key = (name, labels)
+    counters[key] = counters.get(key, 0) + value
+
+
+def observe(name, labels, value):
+    histograms = _mine().histograms
+    key = (name, labels)
+    buckets = histograms.get(key)
+    if buckets is None:
+        buckets = histograms[key] = [0] * (len(LATENCY_BUCKETS) + 2)
+    for i, bound in enumerate(LATENCY_BUCKETS):
+        if value <= bound:
+            break
+    else:
+        i = len(LATENCY_BUCKETS)
+    buckets[i] += 1
+    buckets[-1] += value
+
+
+def _merge_into(target, counters, histograms):
+    for key, value in counters.items():
+        target.counters[key] = target.counters.get(key, 0) + value
+    for key, buckets in histograms.items():
+        total = target.histograms.setdefault(key, [0] * len(buckets))
+        for i, value in enumerate(buckets):
+            total[i] += value
+
+
+def snapshot():
+    """Сумма метрик всех потоков: (counters, histograms)."""
+    merged = _ThreadMetrics()
+    with _lock:
+        _retire_dead()
+        for thread, metrics in _threads:
+            # copy() у словаря атомарен под GIL, владелец может писать параллельно
+            counters = metrics.counters.copy()
+            histograms = {key: list(buckets) for key, buckets in metrics.histograms.copy().items()}
+            _merge_into(merged, counters, histograms)
+        _merge_into(merged, _retired.counters, _retired.histograms)
+    return merged.counters, merged.histograms
+
+
+def _pool_gauges():
+    gauges = {}
+    for bind, engine in db.engines.items():
+        pool = engine.pool
+        labels = (('bind', bind or 'default'),)
+        for name, attr in (('db_pool_size', 'size'), ('db_pool_checked_out', 'checkedout'),
+                           ('db_pool_overflow', 'overflow')):
+            if hasattr(pool, attr):
+                gauges[(name, labels)] = getattr(pool, attr)()
+    return gauges
+
+
+# --- ТЕКСТОВЫЙ ФОРМАТ ---
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render():
+    counters, histograms = snapshot()
+    counters.update(_pool_gauges())
+
+    by_name = {}
+    for (name, labels), value in counters.items():
+        by_name.setdefault(name, []).append((labels, value))
+    for (name, labels), buckets in histograms.items():
+        by_name.setdefault(name, []).append((labels, buckets))
+
+    lines = []
+    for name in sorted(by_name):
+        kind, help_text = _HELP.get(name, ('untyped', name))
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, value in sorted(by_name[name], key=lambda item: item[0]):
+            if kind != 'histogram':
+                lines.append(f'{name}{_labels(labels)} {_number(value)}')
+                continue
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), value[:-1]):
+                cumulative += count
+                lines.append(f'{name}_bucket{_labels(labels, [("le", bound)])} {cumulative}')
+            lines.append(f'{name}_sum{_labels(labels)} {_number(value[-1])}')
+            lines.append(f'{name}_count{_labels(labels)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+# --- ПОДКЛЮЧЕНИЕ К ПРИЛОЖЕНИЮ ---
+
+def init_metrics(app):
+    if not app.config['METRICS_ENABLED']:
+        return
+
+    @app.before_request
+    def start_request_metrics():
+        g.metrics_start = time.perf_counter()
+        g.metrics_in_flight = True
+        inc('http_requests_in_flight')
+
+    @app.after_request
+    def record_request_metrics(response):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return response
+        endpoint = request.endpoint or 'unmatched'
+        inc('http_requests_total', (('endpoint', endpoint), ('method', request.method),
+                                    ('status', str(response.status_code))))
+        observe('http_request_duration_seconds', (('endpoint', endpoint),), time.perf_counter() - start)
+        stats = request_sql_stats()
+        if stats is not None and stats.count:
+            inc('db_queries_total', (('endpoint', endpoint),), stats.count)
+            inc('db_query_duration_seconds_total', (('endpoint', endpoint),), stats.total)
+        return response
+
+    @app.teardown_request
+    def finish_request_metrics(exc):
+        # teardown выполняется и после необработанного исключения
+        if g.pop('metrics_in_flight', False):
+            inc('http_requests_in_flight', value=-1)
+
+    def metrics():
+        token = app.config['METRICS_TOKEN']
+        if token and request.headers.get('Authorization') != f'Bearer {token}':
+            abort(403)
+        return Response(render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+    app.add_url_rule('/metrics', 'metrics', metrics)
@@ -8,13 +8,13 @@ from werkzeug.security import generate_password_hash, check_password_hash
 # группа <-> музыкант
 band_members = db.Table('band_members',
     db.Column('band_id', db.Integer, db.ForeignKey('bands.id'), primary_key=True),
-    db.Column('artist_id', db.Integer, db.ForeignKey('artists.id'), primary_key=True)
+    db.Column('artist_id', db.Integer, db.ForeignKey('artists.id'), primary_key=True, index=True)
 )
 
 # релиз <-> композиция
 release_compositions = db.Table('release_compositions',
     db.Column('release_id', db.Integer, db.ForeignKey('releases.id'), primary_key=True),
-    db.Column('composition_id', db.Integer, db.ForeignKey('compositions.id'), primary_key=True)
+    db.Column('composition_id', db.Integer, db.ForeignKey('compositions.id'), primary_key=True, index=True)
 )
 
 # основное
@@ -43,6 +43,9 @@ class User(UserMixin, db.Model):
     def __repr__(self):
         return f'<User {self.username}>'
 
+# поиск заказов по началу имени без учёта регистра; выражение - как в order_search.filter_orders
+db.Index('ix_users_username_lower', db.func.lower(User.username))
+
 class CustomerProfile(db.Model):
     __tablename__ = 'customer_profiles'
     id = db.Column(db.Integer, primary_key=True)
@@ -68,9 +71,9 @@ class Genre(db.Model):
 class Band(db.Model):
     __tablename__ = 'bands'
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(150), nullable=False)
+    name = db.Column(db.String(150), nullable=False, index=True)
     bio = db.Column(db.Text)
-    genre_id = db.Column(db.Integer, db.ForeignKey('genres.id'))
+    genre_id = db.Column(db.Integer, db.ForeignKey('genres.id'), index=True)
     cover_image_url = db.Column(db.String(255))
     members = db.relationship('Artist', secondary=band_members, back_populates='bands')
     compositions = db.relationship('Composition', backref='author_band', lazy='dynamic')
@@ -88,19 +91,23 @@ class Composition(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(255), nullable=False)
     duration = db.Column(db.Integer)
-    author_band_id = db.Column(db.Integer, db.ForeignKey('bands.id'), nullable=False)
+    author_band_id = db.Column(db.Integer, db.ForeignKey('bands.id'), nullable=False, index=True)
     releases = db.relationship('Release', secondary=release_compositions, back_populates='compositions')
 
 class Release(db.Model):
     __tablename__ = 'releases'
     id = db.Column(db.Integer, primary_key=True)
-    title = db.Column(db.String(255), nullable=False)
-    release_year = db.Column(db.Integer)
+    title = db.Column(db.String(255), nullable=False, index=True)
+    release_year = db.Column(db.Integer, index=True)
     cover_image_url = db.Column(db.String(255))
-    band_id = db.Column(db.Integer, db.ForeignKey('bands.id'), nullable=False)
+    band_id = db.Column(db.Integer, db.ForeignKey('bands.id'), nullable=False, index=True)
     records = db.relationship('Record', backref='release', lazy='dynamic')
     compositions = db.relationship('Composition', secondary=release_compositions, back_populates='releases')
 
+# сортировка главной по году (NULL как 0); выражение должно совпадать с routes.index,
+# иначе SQLite не узнает индекс
+db.Index('ix_releases_sort_year', db.func.coalesce(Release.release_year, db.literal_column('0')))
+
 class Record(db.Model):
     __tablename__ = 'records'
     id = db.Column(db.Integer, primary_key=True)
@@ -111,17 +118,21 @@ class Record(db.Model):
     description = db.Column(db.Text)
     cover_image_url = db.Column(db.String(255))
     record_type = db.Column(db.String(45))
-    release_id = db.Column(db.Integer, db.ForeignKey('releases.id'), nullable=False)
-    manufacturer_profile_id = db.Column(db.Integer, db.ForeignKey('manufacturer_profiles.id'), nullable=False)
+    release_id = db.Column(db.Integer, db.ForeignKey('releases.id'), nullable=False, index=True)
+    manufacturer_profile_id = db.Column(db.Integer, db.ForeignKey('manufacturer_profiles.id'), nullable=False, index=True)
     manufacturer_profile = db.relationship(
         'ManufacturerProfile', back_populates='records'
     )
 
 class Order(db.Model):
     __tablename__ = 'orders'
+    __table_args__ = (
+        db.Index('ix_orders_status_order_date', 'status', 'order_date'),
+        db.Index('ix_orders_user_id_order_date', 'user_id', 'order_date'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    order_date = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    order_date = db.Column(db.DateTime, default=datetime.datetime.utcnow, index=True)
     total_amount = db.Column(db.Numeric(10, 2), nullable=False)
     status = db.Column(db.String(50), nullable=False)
     payment_method = db.Column(db.String(50))
@@ -132,8 +143,59 @@ class Order(db.Model):
 class OrderItem(db.Model):
     __tablename__ = 'order_items'
     id = db.Column(db.Integer, primary_key=True)
-    order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=False)
-    record_id = db.Column(db.Integer, db.ForeignKey('records.id'), nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=False, index=True)
+    record_id = db.Column(db.Integer, db.ForeignKey('records.id'), nullable=False, index=True)
     quantity = db.Column(db.Integer, nullable=False)
     price_at_purchase = db.Column(db.Numeric(10, 2), nullable=False)
-    record = db.relationship('Record')
\ No newline at end of file
+    record = db.relationship('Record')
+
+class RecordSalesDaily(db.Model):
+    # дневной свод продаж по пластинке, обновляется при оформлении заказа
+    __tablename__ = 'record_sales_daily'
+    record_id = db.Column(db.Integer, db.ForeignKey('records.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True, index=True)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+
+
+class StockReservation(db.Model):
+    # временное удержание экземпляров под корзину; на время удержания они списаны со склада
+    __tablename__ = 'stock_reservations'
+    __table_args__ = (db.UniqueConstraint('user_id', 'record_id'),)
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    record_id = db.Column(db.Integer, db.ForeignKey('records.id'), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+
+class CartItem(db.Model):
+    # серверная корзина: одна строка на (покупатель, пластинка)
+    __tablename__ = 'cart_items'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    record_id = db.Column(db.Integer, db.ForeignKey('records.id'), primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False)
+
+
+class Job(db.Model):
+    # фоновая задача; очередь переживает перезапуск приложения
+    __tablename__ = 'jobs'
+    __table_args__ = (db.Index('ix_jobs_status_run_at', 'status', 'run_at'),)
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default='{}')
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+
+class ReplicationHeartbeat(db.Model):
+    # одна строка, которую основная база регулярно обновляет; по ней на реплике видно отставание
+    __tablename__ = 'replication_heartbeat'
+    id = db.Column(db.Integer, primary_key=True)
+    updated_at = db.Column(db.DateTime, nullable=False)
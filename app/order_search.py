@@ -0,0 +1,50 @@
+import datetime
+from app import db
+from app.models import Order, User
+from app.forms import ORDER_STATUS_CHOICES
+from app.checkout import NEW_ORDER_STATUS
+
+# --- ПОИСК ЗАКАЗОВ ---
+# Каждый фильтр сформулирован так, чтобы его обслуживал индекс:
+# число - точный поиск по первичному ключу, текст - диапазон по индексу
+# lower(users.username) без учёта регистра (LIKE '%q%' читал бы всю таблицу),
+# статус и даты - составной индекс orders (status, order_date).
+
+MAX_ORDER_ID = 2 ** 63 - 1
+
+ORDER_STATUSES = [(NEW_ORDER_STATUS, NEW_ORDER_STATUS)] + ORDER_STATUS_CHOICES
+
+
+def parse_date(value):
+    try:
+        return datetime.date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def prefix_range(column, prefix):
+    # column LIKE 'prefix%' без полного просмотра: prefix <= column < prefix + U+10FFFF
+    return db.and_(column >= prefix, column < prefix + '\U0010ffff')
+
+
+def filter_orders(query, q='', status=None, date_from=None, date_to=None):
+    """Накладывает на запрос заказов поиск по id/имени пользователя, статус и диапазон дат."""
+    q = q.strip().lstrip('#')
+    # isdigit() пропускает и '²', и цифры других алфавитов - int() на них падает
+    if q.isascii() and q.isdigit():
+        # id вне 64-битного INTEGER заказом быть не может, а SQLite такой параметр не примет
+        query = query.filter(Order.id == int(q) if int(q) <= MAX_ORDER_ID else db.false())
+    elif q:
+        # lower() с обеих сторон в SQL, как делал ilike: в SQLite он меняет только ASCII
+        user_ids = db.select(User.id).where(prefix_range(db.func.lower(User.username),
+                                                         db.func.lower(q, type_=db.String)))
+        query = query.filter(Order.user_id.in_(user_ids))
+
+    if status:
+        query = query.filter(Order.status == status)
+    if date_from:
+        query = query.filter(Order.order_date >= date_from)
+    if date_to:
+        # включительно: всё до начала следующего дня
+        query = query.filter(Order.order_date < date_to + datetime.timedelta(days=1))
+    return query
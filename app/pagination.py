@@ -0,0 +1,116 @@
+import base64
+import datetime
+import json
+from flask import request, abort
+from sqlalchemy import and_, or_
+
+# --- KEYSET-ПАГИНАЦИЯ ---
+# Страница выбирается условием "после последнего ключа" вместо OFFSET,
+# поэтому любая страница стоит столько же, сколько первая, и COUNT(*) не нужен.
+# order - список (выражение, 'asc' | 'desc'); последним должен идти id,
+# чтобы ключ был уникальным.
+
+
+def _encode_value(value):
+    if isinstance(value, datetime.datetime):
+        return {'dt': value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    # в ключе бывают только скаляры и даты; остальное (списки, объекты) - подделанный курсор
+    if isinstance(value, dict) and value.keys() == {'dt'} and isinstance(value['dt'], str):
+        return datetime.datetime.fromisoformat(value['dt'])
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    raise ValueError('недопустимое значение в курсоре')
+
+
+def encode_cursor(values, direction):
+    payload = json.dumps({'k': [_encode_value(v) for v in values], 'd': direction}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, size):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        data = json.loads(raw)
+        if not isinstance(data['k'], list):
+            return None
+        values = [_decode_value(v) for v in data['k']]
+        direction = data['d']
+    except (ValueError, KeyError, TypeError):
+        return None
+    if len(values) != size or direction not in ('next', 'prev'):
+        return None
+    return values, direction
+
+
+def _after(order, values, backwards):
+    # (a, b) > (x, y)  ->  a > x OR (a = x AND b > y), с учётом направления каждой колонки
+    clauses = []
+    for i, (expr, direction) in enumerate(order):
+        ascending = (direction == 'asc') != backwards
+        step = expr > values[i] if ascending else expr < values[i]
+        clauses.append(and_(*[order[j][0] == values[j] for j in range(i)], step))
+    return or_(*clauses)
+
+
+class KeysetPage:
+    def __init__(self, items, has_next, has_prev, next_cursor, prev_cursor, per_page):
+        self.items = items
+        self.has_next = has_next
+        self.has_prev = has_prev
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.per_page = per_page
+
+
+def keyset_paginate(query, order, per_page=20, cursor=None):
+    values, direction = None, 'next'
+    if cursor:
+        decoded = decode_cursor(cursor, len(order))
+        if decoded is None:
+            abort(400)
+        values, direction = decoded
+    backwards = direction == 'prev'
+
+    if values is not None:
+        query = query.filter(_after(order, values, backwards))
+
+    ordering = []
+    for expr, col_direction in order:
+        ascending = (col_direction == 'asc') != backwards
+        ordering.append(expr.asc() if ascending else expr.desc())
+
+    rows = (
+        query.order_by(None)
+        .order_by(*ordering)
+        .add_columns(*[expr for expr, _ in order])
+        .limit(per_page + 1)
+        .all()
+    )
+
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    if backwards:
+        has_next, has_prev = values is not None, has_more
+    else:
+        has_next, has_prev = has_more, values is not None
+
+    next_cursor = encode_cursor(list(rows[-1][1:]), 'next') if rows and has_next else None
+    prev_cursor = encode_cursor(list(rows[0][1:]), 'prev') if rows and has_prev else None
+
+    return KeysetPage([row[0] for row in rows], has_next, has_prev, next_cursor, prev_cursor, per_page)
+
+
+def paginate_query(query, order, per_page=20):
+    """Keyset-пагинация по ?cursor=...; номера страниц (с COUNT) - только по явному ?page=N."""
+    page = request.args.get('page', type=int)
+    if page is not None:
+        ordering = [expr.asc() if direction == 'asc' else expr.desc() for expr, direction in order]
+        return query.order_by(None).order_by(*ordering).paginate(page=page, per_page=per_page, error_out=False)
+    return keyset_paginate(query, order, per_page=per_page, cursor=request.args.get('cursor'))
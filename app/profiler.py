@@ -0,0 +1,221 @@
+import cProfile
+import datetime
+import logging
+import os
+import sys
+import threading
+import time
+from flask import g, request
+from flask_login import current_user
+
+# --- ПРОФИЛИРОВАНИЕ ЗАПРОСОВ ---
+# Администратор добавляет к любому адресу ?_profile=1 (или заголовок
+# X-Profile: 1) - запрос выполняется под cProfile, результат сохраняется
+# в PROFILE_FOLDER как .prof (pstats, snakeviz). ?_profile=sample вместо
+# этого снимает стек потока каждую миллисекунду и пишет .collapsed
+# (формат flamegraph.pl / speedscope). Отдельно фоновый поток раз в
+# PROFILE_SAMPLE_INTERVAL секунд снимает стеки всех обрабатываемых
+# запросов и копит самые частые - это видно на странице /admin/profiles.
+
+REQUEST_SAMPLE_INTERVAL = 0.001
+MAX_DEPTH = 64
+MAX_STACKS = 5000  # больше разных стеков не храним, остальное - в [other]
+
+logger = logging.getLogger(__name__)
+
+_active = {}  # id потока -> endpoint обрабатываемого запроса
+_hot = {}     # свёрнутый стек -> число выборок
+_hot_lock = threading.Lock()
+_sampling = {'interval': 0.0, 'since': None}
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+def collapse(frame, root=None):
+    """Стек от корня к листу через ';', как в collapsed-формате flamegraph."""
+    names = []
+    while frame is not None and len(names) < MAX_DEPTH:
+        names.append(_frame_label(frame))
+        frame = frame.f_back
+    if root:
+        names.append(root)
+    return ';'.join(reversed(names))
+
+
+def _write_collapsed(path, counts):
+    with open(path, 'w', encoding='utf-8') as f:
+        for stack, n in sorted(counts.items(), key=lambda item: -item[1]):
+            f.write(f'{stack} {n}\n')
+
+
+# --- ПРОФИЛЬ ОДНОГО ЗАПРОСА ---
+
+class _ThreadSampler(threading.Thread):
+    def __init__(self, thread_id):
+        super().__init__(name='profile-sampler', daemon=True)
+        self.thread_id = thread_id
+        self.counts = {}
+        self.stop = threading.Event()
+
+    def run(self):
+        while not self.stop.wait(REQUEST_SAMPLE_INTERVAL):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                stack = collapse(frame)
+                self.counts[stack] = self.counts.get(stack, 0) + 1
+
+
+def _profile_requested():
+    flag = request.args.get('_profile') or request.headers.get('X-Profile')
+    if not flag or not current_user.is_authenticated or current_user.role != 'admin':
+        return None
+    return 'sample' if flag == 'sample' else 'cprofile'
+
+
+def _start(mode):
+    if mode == 'sample':
+        sampler = _ThreadSampler(threading.get_ident())
+        sampler.start()
+        return sampler
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # в потоке уже работает другой профилировщик
+        logger.warning('cProfile не запущен для %s: профилировщик уже активен', request.path)
+        return None
+    return profiler
+
+
+def _stop(mode, profiler):
+    if mode == 'sample':
+        profiler.stop.set()
+        profiler.join()
+    else:
+        profiler.disable()
+
+
+def _save(folder, keep, mode, profiler, elapsed):
+    os.makedirs(folder, exist_ok=True)
+    stamp = datetime.datetime.utcnow().strftime('%Y%m%d-%H%M%S-%f')
+    endpoint = (request.endpoint or 'unmatched').replace('.', '-')
+    name = f'{stamp}-{endpoint}-{elapsed * 1000:.0f}ms.{"collapsed" if mode == "sample" else "prof"}'
+    if mode == 'sample':
+        _write_collapsed(os.path.join(folder, name), profiler.counts)
+    else:
+        profiler.dump_stats(os.path.join(folder, name))
+
+    # храним только keep последних файлов
+    for old in list_profiles(folder)[keep:]:
+        try:
+            os.remove(os.path.join(folder, old['name']))
+        except OSError:
+            pass
+    return name
+
+
+def list_profiles(folder):
+    """Сохранённые профили, новые первыми."""
+    if not os.path.isdir(folder):
+        return []
+    profiles = []
+    for name in os.listdir(folder):
+        if name.endswith(('.prof', '.collapsed')):
+            stat = os.stat(os.path.join(folder, name))
+            profiles.append({
+                'name': name,
+                'size': stat.st_size,
+                'created': datetime.datetime.fromtimestamp(stat.st_mtime),
+            })
+    profiles.sort(key=lambda p: p['name'], reverse=True)
+    return profiles
+
+
+# --- ПОСТОЯННАЯ ВЫБОРКА ---
+
+def _record_sample(stack):
+    with _hot_lock:
+        if stack not in _hot and len(_hot) >= MAX_STACKS:
+            stack = '[other]'
+        _hot[stack] = _hot.get(stack, 0) + 1
+
+
+def _sampling_loop(interval, stop):
+    own = threading.get_ident()
+    while not stop.wait(interval):
+        frames = sys._current_frames()
+        for thread_id, endpoint in list(_active.items()):
+            frame = frames.get(thread_id)
+            if frame is not None and thread_id != own:
+                _record_sample(collapse(frame, root=endpoint))
+
+
+def hot_stacks(limit=30):
+    """Самые частые стеки постоянной выборки: [(стек, выборок)], всего выборок."""
+    with _hot_lock:
+        items = sorted(_hot.items(), key=lambda item: -item[1])
+        total = sum(_hot.values())
+    return items[:limit], total
+
+
+def sampled_collapsed():
+    with _hot_lock:
+        counts = dict(_hot)
+    return ''.join(f'{stack} {n}\n' for stack, n in sorted(counts.items(), key=lambda item: -item[1]))
+
+
+def reset_samples():
+    with _hot_lock:
+        _hot.clear()
+    _sampling['since'] = datetime.datetime.utcnow()
+
+
+def sampling_status():
+    return dict(_sampling)
+
+
+def start_sampling(app):
+    interval = app.config['PROFILE_SAMPLE_INTERVAL']
+    if interval <= 0:
+        return None
+    _sampling.update(interval=interval, since=datetime.datetime.utcnow())
+    stop = threading.Event()
+    thread = threading.Thread(target=_sampling_loop, args=(interval, stop), name='stack-sampler', daemon=True)
+    thread.start()
+    return stop
+
+
+# --- ПОДКЛЮЧЕНИЕ К ПРИЛОЖЕНИЮ ---
+
+def init_profiler(app):
+    folder = app.config['PROFILE_FOLDER']
+    keep = app.config['PROFILE_KEEP']
+
+    @app.before_request
+    def start_request_profile():
+        _active[threading.get_ident()] = request.endpoint or 'unmatched'
+        mode = _profile_requested()
+        if mode:
+            profiler = _start(mode)
+            if profiler is not None:
+                g.request_profile = (mode, profiler, time.perf_counter())
+
+    @app.after_request
+    def save_request_profile(response):
+        profile = g.pop('request_profile', None)
+        if profile is not None:
+            mode, profiler, start = profile
+            _stop(mode, profiler)
+            response.headers['X-Profile-File'] = _save(folder, keep, mode, profiler, time.perf_counter() - start)
+        return response
+
+    @app.teardown_request
+    def finish_request_profile(exc):
+        _active.pop(threading.get_ident(), None)
+        # после необработанного исключения after_request мог не дойти до профиля
+        profile = g.pop('request_profile', None)
+        if profile is not None:
+            _stop(profile[0], profile[1])
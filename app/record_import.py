@@ -0,0 +1,179 @@
+import codecs
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+from app import db
+from app.bulk_edit import MAX_PRICE, MAX_STOCK
+from app.models import Record
+from app.refcache import ref_choices
+
+# --- МАССОВЫЙ ИМПОРТ ПЛАСТИНОК ---
+# Файл читается построчно (CSV с заголовком или JSONL), каждая строка сразу
+# проверяется, а годные накапливаются в пачки и вставляются одним executemany.
+# Всё идёт в одной транзакции: при ошибках в строках (если не просили их
+# пропустить) или сбое базы откатывается весь файл.
+
+IMPORT_CHUNK = 500
+IMPORT_FORMATS = ('csv', 'jsonl')
+MAX_REPORTED_ERRORS = 500
+# год издания - в тех же границах, что и в форме релиза
+MIN_YEAR, MAX_YEAR = 1900, 2100
+
+AMBIGUOUS = object()
+
+
+class ImportResult:
+    def __init__(self):
+        self.total = 0
+        self.inserted = 0
+        self.errors = []  # (номер строки, [сообщения])
+        self.error_rows = 0
+
+    def add_error(self, line, messages):
+        self.error_rows += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, messages))
+
+
+def release_lookup():
+    # название релиза (без учёта регистра) -> id; одинаковые названия помечаются как неоднозначные.
+    # Целые ключи - сами id, чтобы проверять release_id тем же словарём.
+    lookup = {}
+    for release_id, title in ref_choices('releases'):
+        key = title.strip().casefold()
+        lookup[key] = AMBIGUOUS if key in lookup else release_id
+        lookup[release_id] = release_id
+    return lookup
+
+
+def read_rows(stream, fmt):
+    """Отдаёт (номер строки, dict) из потока загруженного файла, не читая его целиком."""
+    lines = codecs.getreader('utf-8-sig')(stream, errors='replace')
+    if fmt == 'csv':
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for line_no, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield line_no, row if isinstance(row, dict) else None
+
+
+def _text(row, key):
+    value = row.get(key)
+    return str(value).strip() if value is not None else ''
+
+
+def _int(row, key, errors, required=False, minimum=None, maximum=None):
+    raw = _text(row, key)
+    if not raw:
+        if required:
+            errors.append(f'{key}: обязательное поле')
+        return None
+    try:
+        value = int(raw)
+    except ValueError:
+        errors.append(f'{key}: ожидается целое число, получено "{raw}"')
+        return None
+    if minimum is not None and value < minimum:
+        errors.append(f'{key}: не может быть меньше {minimum}')
+    # иначе строка дойдёт до executemany и уронит весь файл переполнением
+    elif maximum is not None and value > maximum:
+        errors.append(f'{key}: не может быть больше {maximum}')
+    return value
+
+
+def validate_row(row, releases, profile_id):
+    """Превращает строку файла в значения для INSERT; вторым элементом - список ошибок."""
+    if row is None:
+        return None, ['строка не разбирается как JSON-объект']
+    errors = []
+
+    title = _text(row, 'title')
+    if not title:
+        errors.append('title: обязательное поле')
+    elif len(title) > 255:
+        errors.append('title: длиннее 255 символов')
+
+    release_id = _int(row, 'release_id', errors)
+    if release_id is None:
+        release_title = _text(row, 'release')
+        found = releases.get(release_title.casefold())
+        if not release_title:
+            errors.append('release: укажите название релиза или release_id')
+        elif found is None:
+            errors.append(f'release: релиз "{release_title}" не найден')
+        elif found is AMBIGUOUS:
+            errors.append(f'release: несколько релизов "{release_title}", укажите release_id')
+        else:
+            release_id = found
+    elif release_id not in releases:
+        errors.append(f'release_id: релиз {release_id} не найден')
+
+    price = None
+    raw_price = _text(row, 'price').replace(',', '.')
+    try:
+        price = Decimal(raw_price).quantize(Decimal('0.01'))
+        if price < 0:
+            errors.append('price: не может быть отрицательной')
+        elif price > MAX_PRICE:
+            errors.append(f'price: не может быть больше {MAX_PRICE}')
+    except InvalidOperation:
+        errors.append(f'price: ожидается число, получено "{raw_price}"' if raw_price else 'price: обязательное поле')
+
+    stock = _int(row, 'stock_quantity', errors, minimum=0, maximum=MAX_STOCK)
+    year = _int(row, 'release_year', errors, minimum=MIN_YEAR, maximum=MAX_YEAR)
+    record_type = _text(row, 'record_type')[:45] or None
+
+    if errors:
+        return None, errors
+    return {
+        'title': title,
+        'release_id': release_id,
+        'price': price,
+        'stock_quantity': stock or 0,
+        'release_year': year,
+        'record_type': record_type,
+        'description': _text(row, 'description') or None,
+        'manufacturer_profile_id': profile_id,
+    }, []
+
+
+def import_records(rows, profile_id, skip_invalid=False, chunk_size=IMPORT_CHUNK):
+    result = ImportResult()
+    releases = release_lookup()
+    chunk = []
+
+    def flush():
+        if chunk:
+            db.session.execute(db.insert(Record), chunk)
+            result.inserted += len(chunk)
+            chunk.clear()
+
+    try:
+        for line, row in rows:
+            result.total += 1
+            values, errors = validate_row(row, releases, profile_id)
+            if errors:
+                result.add_error(line, errors)
+            elif not result.error_rows or skip_invalid:
+                # после первой ошибки без skip_invalid файл всё равно откатится -
+                # дальше только проверяем строки для отчёта
+                chunk.append(values)
+                if len(chunk) >= chunk_size:
+                    flush()
+        if result.error_rows and not skip_invalid:
+            db.session.rollback()
+            result.inserted = 0
+            return result
+        flush()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return result
@@ -0,0 +1,75 @@
+import threading
+from sqlalchemy import event
+from app import db
+from app.metrics import inc
+from app.models import Band, Genre, Artist, Release, ManufacturerProfile
+
+# --- КЭШ СПРАВОЧНИКОВ ---
+# Компактные списки (id, название) для фильтров каталога и SelectField.choices.
+# У каждого справочника свой счётчик версии: коммит, затронувший модель,
+# увеличивает версию, и при следующем обращении список перечитывается.
+
+_SOURCES = {
+    'bands': (Band, Band.name),
+    'genres': (Genre, Genre.name),
+    'artists': (Artist, Artist.name),
+    'releases': (Release, Release.title),
+    'manufacturers': (ManufacturerProfile, ManufacturerProfile.company_name),
+}
+
+_KIND_BY_MODEL = {model: kind for kind, (model, _) in _SOURCES.items()}
+
+_lock = threading.Lock()
+_versions = {kind: 0 for kind in _SOURCES}
+_cache = {}  # kind -> (version, [(id, name), ...])
+
+
+def version(kind):
+    return _versions[kind]
+
+
+def invalidate(*kinds):
+    with _lock:
+        for kind in kinds or _SOURCES:
+            _versions[kind] += 1
+
+
+def ref_choices(kind):
+    current = _versions[kind]
+    cached = _cache.get(kind)
+    if cached and cached[0] == current:
+        inc('refcache_requests_total', (('kind', kind), ('result', 'hit')))
+        return list(cached[1])
+    inc('refcache_requests_total', (('kind', kind), ('result', 'miss')))
+
+    model, label = _SOURCES[kind]
+    # список кешируется под текущей версией, поэтому читаем только основную базу, не реплику
+    query = db.session.query(model.id, label).order_by(label, model.id).execution_options(use_primary=True)
+    rows = [(row_id, name) for row_id, name in query]
+    # сохраняем с версией на момент начала чтения: если список успели
+    # инвалидировать, следующий запрос перечитает его ещё раз
+    _cache[kind] = (current, rows)
+    return list(rows)
+
+
+# --- ИНВАЛИДАЦИЯ ПО КОММИТАМ ---
+
+@event.listens_for(db.session, 'after_flush')
+def _collect_kinds(session, flush_context):
+    kinds = session.info.setdefault('refcache_kinds', set())
+    for obj in session.new | session.dirty | session.deleted:
+        kind = _KIND_BY_MODEL.get(type(obj))
+        if kind:
+            kinds.add(kind)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_committed(session):
+    kinds = session.info.pop('refcache_kinds', None)
+    if kinds:
+        invalidate(*kinds)
+
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _discard_kinds(session, previous_transaction):
+    session.info.pop('refcache_kinds', None)
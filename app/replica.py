@@ -0,0 +1,105 @@
+import datetime
+import logging
+import sqlite3
+import threading
+import time
+from functools import wraps
+from flask import current_app, session as cookie_session, has_request_context
+from sqlalchemy import event
+from app import db
+from app.models import ReplicationHeartbeat
+from app.db_session import REPLICA_BIND
+
+# --- РЕПЛИКА ДЛЯ ЧТЕНИЯ КАТАЛОГА ---
+# Маршруты каталога помечаются @replica_reads. Основная база раз в
+# REPLICA_HEARTBEAT_INTERVAL секунд обновляет replication_heartbeat, по ней
+# на реплике видно её отставание. После записи покупатель ещё REPLICA_MAX_LAG
+# секунд читает основную базу (метка в cookie-сессии), чтобы не увидеть
+# свои изменения откатившимися. Для локальной проверки REPLICA_COPY_INTERVAL
+# периодически копирует файл SQLite в реплику через backup API.
+
+logger = logging.getLogger(__name__)
+
+
+def replica_enabled():
+    return REPLICA_BIND in current_app.config.get('SQLALCHEMY_BINDS', {})
+
+
+def replica_reads(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if replica_enabled() and cookie_session.get('primary_until', 0) < time.time():
+            db.session.info['read_replica'] = True
+            db.session.info['replica_max_lag'] = current_app.config['REPLICA_MAX_LAG']
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+@event.listens_for(db.session, 'after_flush')
+def _remember_flush(session, flush_context):
+    session.info['wrote'] = True
+
+
+@event.listens_for(db.session, 'do_orm_execute')
+def _remember_write(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info['wrote'] = True
+
+
+@event.listens_for(db.session, 'after_commit')
+def _pin_to_primary(session):
+    if session.info.get('wrote') and has_request_context() and replica_enabled():
+        cookie_session['primary_until'] = time.time() + current_app.config['REPLICA_MAX_LAG']
+
+
+def write_heartbeat():
+    now = datetime.datetime.utcnow()
+    updated = db.session.execute(
+        db.update(ReplicationHeartbeat).where(ReplicationHeartbeat.id == 1).values(updated_at=now)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not updated:
+        db.session.add(ReplicationHeartbeat(id=1, updated_at=now))
+    db.session.commit()
+
+
+def copy_sqlite_replica():
+    # согласованный снимок основной базы в файл реплики (только для локальной проверки)
+    primary = db.engines[None].url.database
+    replica = db.engines[REPLICA_BIND].url.database
+    source = sqlite3.connect(primary)
+    target = sqlite3.connect(replica, timeout=30)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+
+def _replication_loop(app, stop):
+    interval = app.config['REPLICA_HEARTBEAT_INTERVAL']
+    copy_interval = app.config['REPLICA_COPY_INTERVAL']
+    copied_at = 0.0
+    while True:
+        with app.app_context():
+            try:
+                write_heartbeat()
+                if copy_interval > 0 and time.monotonic() - copied_at >= copy_interval:
+                    copy_sqlite_replica()
+                    copied_at = time.monotonic()
+            except Exception:
+                db.session.rollback()
+                logger.exception('Ошибка обновления реплики')
+            finally:
+                db.session.remove()
+        if stop.wait(interval):
+            return
+
+
+def start_replication(app):
+    if REPLICA_BIND not in app.config.get('SQLALCHEMY_BINDS', {}) or app.config['REPLICA_HEARTBEAT_INTERVAL'] <= 0:
+        return None
+    stop = threading.Event()
+    thread = threading.Thread(target=_replication_loop, args=(app, stop), name='replica-heartbeat', daemon=True)
+    thread.start()
+    return stop
@@ -0,0 +1,169 @@
+import datetime
+import logging
+import threading
+from flask import current_app
+from app import db
+from app.database import upsert_insert
+from app.models import Record, StockReservation
+
+# --- УДЕРЖАНИЕ ТОВАРА В КОРЗИНЕ ---
+# При добавлении в корзину экземпляры сразу списываются с records.stock_quantity
+# и записываются в stock_reservations со сроком действия. Поэтому
+# stock_quantity - это всегда количество, доступное к продаже (чтение по PK).
+# Просроченные удержания пачками возвращает на склад фоновый поток,
+# а оформление заказа забирает удержания покупателя вместо повторного списания.
+
+SWEEP_BATCH = 500
+
+logger = logging.getLogger(__name__)
+
+
+def _expiry():
+    return datetime.datetime.utcnow() + datetime.timedelta(seconds=current_app.config['RESERVATION_TTL'])
+
+
+def return_to_stock(quantities):
+    # quantities: {record_id: qty} -> один UPDATE с CASE
+    quantities = {rid: q for rid, q in quantities.items() if q > 0}
+    if not quantities:
+        return
+    qty = db.case(quantities, value=Record.id)
+    db.session.execute(
+        db.update(Record)
+        .where(Record.id.in_(list(quantities)))
+        .values(stock_quantity=Record.stock_quantity + qty)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def take_from_stock(quantities):
+    """Условно списывает {record_id: qty}; возвращает id пластинок, которых не хватило."""
+    quantities = {rid: q for rid, q in quantities.items() if q > 0}
+    if not quantities:
+        return set()
+    qty = db.case(quantities, value=Record.id)
+    taken = db.session.execute(
+        db.update(Record)
+        .where(Record.id.in_(list(quantities)), Record.stock_quantity >= qty)
+        .values(stock_quantity=Record.stock_quantity - qty)
+        .returning(Record.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    return set(quantities) - set(taken)
+
+
+def reserve(user_id, record_id, quantity):
+    """Удерживает до quantity экземпляров (без commit); возвращает, сколько удалось удержать."""
+    for _ in range(3):
+        available = db.session.query(Record.stock_quantity).filter(Record.id == record_id).scalar() or 0
+        take = min(quantity, available)
+        if take <= 0:
+            return 0
+        if not take_from_stock({record_id: take}):
+            break
+    else:
+        return 0
+
+    stmt = upsert_insert(StockReservation).values(
+        user_id=user_id, record_id=record_id, quantity=take, expires_at=_expiry()
+    )
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=['user_id', 'record_id'],
+        set_={
+            'quantity': StockReservation.quantity + stmt.excluded.quantity,
+            'expires_at': stmt.excluded.expires_at,
+        }
+    ))
+    return take
+
+
+def release(user_id, record_id=None, quantity=None):
+    """Возвращает на склад удержание по пластинке (целиком или quantity штук) или всю корзину."""
+    if quantity is not None and record_id is not None:
+        left = db.session.execute(
+            db.update(StockReservation)
+            .where(StockReservation.user_id == user_id,
+                   StockReservation.record_id == record_id,
+                   StockReservation.quantity > quantity)
+            .values(quantity=StockReservation.quantity - quantity)
+            .returning(StockReservation.quantity)
+            .execution_options(synchronize_session=False)
+        ).first()
+        if left is not None:
+            return_to_stock({record_id: quantity})
+            db.session.commit()
+            return
+
+    stmt = db.delete(StockReservation).where(StockReservation.user_id == user_id)
+    if record_id is not None:
+        stmt = stmt.where(StockReservation.record_id == record_id)
+    rows = db.session.execute(
+        stmt.returning(StockReservation.record_id, StockReservation.quantity)
+        .execution_options(synchronize_session=False)
+    ).all()
+    return_to_stock(dict(rows))
+    db.session.commit()
+
+
+def drop_record(record_id):
+    """Снимает все удержания пластинки, которую удаляют из каталога (без commit, склад не трогает)."""
+    db.session.execute(
+        db.delete(StockReservation).where(StockReservation.record_id == record_id)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def claim(user_id, record_ids):
+    """Забирает удержания покупателя (внутри транзакции заказа): {record_id: qty}."""
+    # и просроченные тоже: пока их не вернул фоновый поток, товар по-прежнему списан со склада
+    rows = db.session.execute(
+        db.delete(StockReservation)
+        .where(StockReservation.user_id == user_id,
+               StockReservation.record_id.in_(list(record_ids)))
+        .returning(StockReservation.record_id, StockReservation.quantity)
+        .execution_options(synchronize_session=False)
+    ).all()
+    return dict(rows)
+
+
+def sweep_expired(batch=SWEEP_BATCH):
+    """Возвращает на склад одну пачку просроченных удержаний; результат - число удержаний."""
+    expired = db.select(StockReservation.id) \
+        .where(StockReservation.expires_at <= datetime.datetime.utcnow()) \
+        .limit(batch)
+    rows = db.session.execute(
+        db.delete(StockReservation)
+        .where(StockReservation.id.in_(expired))
+        .returning(StockReservation.record_id, StockReservation.quantity)
+        .execution_options(synchronize_session=False)
+    ).all()
+
+    returned = {}
+    for record_id, quantity in rows:
+        returned[record_id] = returned.get(record_id, 0) + quantity
+    return_to_stock(returned)
+    db.session.commit()
+    return len(rows)
+
+
+def _sweeper_loop(app, stop):
+    interval = app.config['RESERVATION_SWEEP_INTERVAL']
+    while not stop.wait(interval):
+        with app.app_context():
+            try:
+                while sweep_expired() == SWEEP_BATCH:
+                    pass
+            except Exception:
+                db.session.rollback()
+                logger.exception('Ошибка при очистке просроченных удержаний')
+            finally:
+                db.session.remove()
+
+
+def start_reservation_sweeper(app):
+    if app.config['RESERVATION_SWEEP_INTERVAL'] <= 0:
+        return None
+    stop = threading.Event()
+    thread = threading.Thread(target=_sweeper_loop, args=(app, stop), name='reservation-sweeper', daemon=True)
+    thread.start()
+    return stop
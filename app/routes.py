@@ -1,12 +1,36 @@
+import datetime
+import logging
 import os
-from app import app, db
-from werkzeug.utils import secure_filename
-from flask import render_template, flash, redirect, url_for, session, request, abort, send_from_directory, jsonify, current_app
+from app import db
+from flask import Blueprint, current_app, render_template, flash, redirect, url_for, request, abort, jsonify, Response, stream_with_context
 from functools import wraps
 from flask_login import current_user, login_user, logout_user, login_required
 from app.models import Record, Release, Band, User, CustomerProfile, ManufacturerProfile, Order, OrderItem, Genre, Artist, Composition
-from app.forms import LoginForm, RegistrationForm, EditProfileForm, CheckoutForm, ManufacturerProfileForm, RecordForm, AdminEditUserForm, GenreForm, ArtistForm, BandForm, CompositionForm, ReleaseForm, AdminOrderForm
+from app.forms import LoginForm, RegistrationForm, EditProfileForm, CheckoutForm, ManufacturerProfileForm, RecordForm, AdminEditUserForm, GenreForm, ArtistForm, BandForm, CompositionForm, ReleaseForm, AdminOrderForm, RecordImportForm, RecordBulkEditForm
+from app.search import search_releases
+from app.suggest import suggest
+from app.pagination import paginate_query
+from app.refcache import ref_choices
+from app.checkout import place_order, OutOfStock
+from app.reservations import reserve, release, drop_record
+from app.cart_store import get_cart_store
+from app.uploads import save_cover, content_hash
+from app.file_serving import send_file_cached, IMMUTABLE_MAX_AGE
+from app.replica import replica_reads
+from app.thumbnails import thumbnail_name
+from app.jobs import queue_stats
+from app.profiler import list_profiles, hot_stacks, sampled_collapsed, reset_samples, sampling_status
+from app.order_search import filter_orders, parse_date, ORDER_STATUSES
+from app.export import export_rows, GENERATORS, EXPORT_FORMATS
+from app.record_import import read_rows, import_records
+from app.bulk_edit import bulk_criteria, bulk_update, BulkEditError, BULK_OPERATIONS, FILTER_KEYS
+from app.sales import apply_order, top_records, year_range, manufacturer_report, REPORT_PERIODS, CANCELLED_STATUS
 from sqlalchemy import or_
+from sqlalchemy.orm import joinedload, selectinload, contains_eager
+
+logger = logging.getLogger(__name__)
+
+bp = Blueprint('main', __name__)
 
 # --- ДЕКОРАТОРЫ ДЛЯ РОЛЕЙ ---
 def manufacturer_required(f):
@@ -28,39 +52,61 @@ def admin_required(f):
 
 # --- ПУБЛИЧНЫЕ МАРШРУТЫ ---
 
-@app.route('/search_suggestions')
+@bp.route('/search_suggestions')
 def search_suggestions():
     q = request.args.get('q', '').strip()
     if not q:
         return jsonify([])
 
-    results = Release.query.join(Band).filter(
-        or_(
-            Release.title.ilike(f'{q}%'),
-            Band.name.ilike(f'{q}%')
-        )
-    ).limit(5).all()
+    return jsonify(suggest(q))
 
-    suggestions = [f"{r.title} ({r.band.name})" for r in results]
-    return jsonify(suggestions)
+# встроенная отдача статики заменяется на общую - с 304, диапазонами и сжатыми копиями (см. create_app)
+def static_file(filename):
+    return send_file_cached(current_app.static_folder, filename)
 
-@app.route('/uploads/<filename>')
+@bp.route('/uploads/<filename>')
 def uploaded_file(filename):
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
-
-@app.route('/')
-@app.route('/index')
+    digest = content_hash(filename)
+    if digest is None:
+        # старые файлы с именем от пользователя могут быть перезаписаны
+        return send_file_cached(current_app.config['UPLOAD_FOLDER'], filename)
+    # содержимое по этому адресу не меняется: сильный ETag и кеш на год без перепроверки
+    return send_file_cached(current_app.config['UPLOAD_FOLDER'], filename, etag=digest,
+                            max_age=IMMUTABLE_MAX_AGE, immutable=True)
+
+@bp.route('/thumbs/<int:width>/<filename>')
+def cover_thumbnail(width, filename):
+    if width not in current_app.config['THUMBNAIL_WIDTHS']:
+        abort(404)
+    folder = current_app.config['THUMBNAIL_FOLDER']
+    # WebP - если браузер его принимает, иначе копия в исходном формате, пока копий нет - оригинал
+    candidates = [thumbnail_name(filename, width)]
+    # image/* и */* не в счёт: их шлют и браузеры без поддержки WebP
+    if any(mimetype == 'image/webp' and q > 0 for mimetype, q in request.accept_mimetypes):
+        candidates.insert(0, thumbnail_name(filename, width, webp=True))
+    digest = content_hash(filename)
+    for name in candidates:
+        if os.path.exists(os.path.join(folder, name)):
+            if digest is None:
+                return send_file_cached(folder, name, vary=['Accept'])
+            return send_file_cached(folder, name, etag=f'{digest}-{width}{os.path.splitext(name)[1]}',
+                                    max_age=IMMUTABLE_MAX_AGE, immutable=True, vary=['Accept'])
+    # копии ещё нет - отдаём оригинал без долгого кеширования, чтобы потом перейти на копию
+    return send_file_cached(current_app.config['UPLOAD_FOLDER'], filename, vary=['Accept'])
+
+@bp.route('/')
+@bp.route('/index')
+@replica_reads
 def index():
-    page = request.args.get('page', 1, type=int)
     selected_band = request.args.get('band', type=int)
     selected_genre = request.args.get('genre', type=int)
-    selected_sort = request.args.get('sort', 'title_asc')
     search_query = request.args.get('q', '').strip()
+    selected_sort = request.args.get('sort', 'relevance' if search_query else 'title_asc')
     year_min = request.args.get('year_min', type=int)
     year_max = request.args.get('year_max', type=int)
 
-    # базовый запрос
-    query = Release.query.join(Band).join(Genre)
+    # базовый запрос (группа уже в JOIN - подгружаем её оттуда же)
+    query = Release.query.join(Band).join(Genre).options(contains_eager(Release.band))
 
     # фильтры
     if selected_band:
@@ -72,8 +118,11 @@ def index():
     if year_max is not None:
         query = query.filter(Release.release_year <= year_max)
 
-    # поиск
-    if search_query:
+    # поиск: полнотекстовый индекс, если он доступен
+    fts = search_releases(search_query) if search_query else None
+    if fts is not None:
+        query = query.join(fts, fts.c.release_id == Release.id)
+    elif search_query:
         query = query.filter(
             or_(
                 Release.title.ilike(f'%{search_query}%'),
@@ -81,32 +130,27 @@ def index():
             )
         )
 
-    # сортировка
-    if selected_sort == 'title_asc':
-        query = query.order_by(Release.title.asc())
+    # сортировка (id в конце - уникальный ключ для курсора)
+    if selected_sort == 'relevance' and fts is not None:
+        order = [(fts.c.rank, 'asc'), (Release.id, 'asc')]
     elif selected_sort == 'title_desc':
-        query = query.order_by(Release.title.desc())
+        order = [(Release.title, 'desc'), (Release.id, 'desc')]
     elif selected_sort == 'year_asc':
-        query = query.order_by(Release.release_year.asc())
+        order = [(db.func.coalesce(Release.release_year, db.literal_column('0')), 'asc'), (Release.id, 'asc')]
     elif selected_sort == 'year_desc':
-        query = query.order_by(Release.release_year.desc())
+        order = [(db.func.coalesce(Release.release_year, db.literal_column('0')), 'desc'), (Release.id, 'desc')]
+    else:
+        order = [(Release.title, 'asc'), (Release.id, 'asc')]
 
     # пагинация
-    pagination = query.paginate(page=page, per_page=20, error_out=False)
+    pagination = paginate_query(query, order, per_page=20)
     releases = pagination.items
 
-    bands = Band.query.all()
-    genres = Genre.query.all()
+    bands = ref_choices('bands')
+    genres = ref_choices('genres')
 
     # автоподсказки для текущего запроса
-    autocomplete_options = []
-    if search_query:
-        autocomplete_options = Release.query.join(Band).filter(
-            or_(
-                Release.title.ilike(f'{search_query}%'),
-                Band.name.ilike(f'{search_query}%')
-            )
-        ).limit(5).all()
+    autocomplete_options = suggest(search_query) if search_query else []
 
     return render_template(
         'index.html',
@@ -123,14 +167,14 @@ def index():
         year_max=year_max
     )
 
-@app.route('/about')
+@bp.route('/about')
 def about():
     return render_template('about.html', title='О нас')
 
 
-@app.route('/bands')
+@bp.route('/bands')
+@replica_reads
 def bands_list():
-    page = request.args.get('page', 1, type=int)
     search_query = request.args.get('q', '').strip()
     selected_sort = request.args.get('sort', 'name_asc')
 
@@ -142,62 +186,82 @@ def bands_list():
         query = query.filter(Band.name.ilike(f'%{search_query}%'))
 
     # Сортировка
-    if selected_sort == 'name_asc':
-        query = query.order_by(Band.name.asc())
-    elif selected_sort == 'name_desc':
-        query = query.order_by(Band.name.desc())
+    if selected_sort == 'name_desc':
+        order = [(Band.name, 'desc'), (Band.id, 'desc')]
+    else:
+        order = [(Band.name, 'asc'), (Band.id, 'asc')]
 
     # Пагинация: 8 групп на страницу
-    pagination = query.paginate(page=page, per_page=8, error_out=False)
+    pagination = paginate_query(query, order, per_page=8)
     bands = pagination.items
 
+    # число релизов для всей страницы одним сгруппированным запросом
+    release_counts = {}
+    if bands:
+        release_counts = dict(
+            db.session.query(Release.band_id, db.func.count(Release.id))
+            .filter(Release.band_id.in_([b.id for b in bands]))
+            .group_by(Release.band_id)
+        )
+
     return render_template(
         'bands_list.html',
         bands=bands,
+        release_counts=release_counts,
         search_query=search_query,
         selected_sort=selected_sort,
         pagination=pagination
     )
 
-@app.route('/record/<int:id>')
+@bp.route('/record/<int:id>')
+@replica_reads
 def record_detail(id):
-    record = Record.query.get_or_404(id)
+    record = Record.query.options(
+        joinedload(Record.release).joinedload(Release.band),
+        joinedload(Record.release).selectinload(Release.compositions),
+        joinedload(Record.manufacturer_profile)
+    ).filter(Record.id == id).first_or_404()
     return render_template('record_detail.html', title=record.title, record=record)
 
-@app.route('/release/<int:id>')
+@bp.route('/release/<int:id>')
+@replica_reads
 def release_detail(id):
-    release = Release.query.get_or_404(id)
+    release = Release.query.options(
+        joinedload(Release.band),
+        selectinload(Release.compositions)
+    ).filter(Release.id == id).first_or_404()
     return render_template('release_detail.html', title=release.title, release=release)
 
-@app.route('/band/<int:id>')
+@bp.route('/band/<int:id>')
+@replica_reads
 def band_detail(id):
-    band = Band.query.get_or_404(id)
+    band = Band.query.options(selectinload(Band.members)).filter(Band.id == id).first_or_404()
     return render_template('band_detail.html', title=band.name, band=band)
 
-@app.route('/login', methods=['GET', 'POST'])
+@bp.route('/login', methods=['GET', 'POST'])
 def login():
     if current_user.is_authenticated:
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     form = LoginForm()
     if form.validate_on_submit():
         user = User.query.filter_by(username=form.username.data).first()
         if user is None or not user.check_password(form.password.data):
             flash('Неправильное имя пользователя или пароль')
-            return redirect(url_for('login'))
+            return redirect(url_for('main.login'))
         login_user(user, remember=form.remember_me.data)
         flash(f'Добро пожаловать, {user.username}!')
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     return render_template('login.html', title='Вход', form=form)
 
-@app.route('/register', methods=['GET', 'POST'])
+@bp.route('/register', methods=['GET', 'POST'])
 def register():
     if current_user.is_authenticated:
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     form = RegistrationForm()
     if form.validate_on_submit():
         if User.query.filter_by(username=form.username.data).first():
             flash('Это имя пользователя уже занято. Пожалуйста, выберите другое.')
-            return redirect(url_for('register'))
+            return redirect(url_for('main.register'))
         new_user = User(username=form.username.data, role='user')
         new_user.set_password(form.password.data)
         new_customer_profile = CustomerProfile(user=new_user)
@@ -205,21 +269,21 @@ def register():
         db.session.add(new_customer_profile)
         db.session.commit()
         flash('Регистрация прошла успешно! Теперь вы можете войти.')
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     return render_template('register.html', title='Регистрация', form=form)
 
-@app.route('/logout')
+@bp.route('/logout')
 def logout():
     logout_user()
-    return redirect(url_for('index'))
+    return redirect(url_for('main.index'))
 
 # --- ЛИЧНЫЙ КАБИНЕТ ---
-@app.route('/profile')
+@bp.route('/profile')
 @login_required
 def profile():
     return render_template('profile.html', title='Личный кабинет')
 
-@app.route('/profile/edit', methods=['GET', 'POST'])
+@bp.route('/profile/edit', methods=['GET', 'POST'])
 @login_required
 def edit_profile():
     if current_user.role == 'user':
@@ -244,7 +308,7 @@ def edit_profile():
             current_user.manufacturer_profile.company_address = form.company_address.data
         db.session.commit()
         flash('Ваш профиль был успешно обновлен.')
-        return redirect(url_for('profile'))
+        return redirect(url_for('main.profile'))
     elif request.method == 'GET':
         form.username.data = current_user.username
         if current_user.role == 'user' and current_user.customer_profile:
@@ -255,69 +319,80 @@ def edit_profile():
     return render_template('edit_profile.html', title='Редактировать профиль', form=form)
 
 # --- ЛОГИКА КОРЗИНЫ И ЗАКАЗОВ ---
-@app.route('/add_to_cart/<int:record_id>', methods=['POST'])
+def _delete_record(record):
+    # SQLite не проверяет внешние ключи: строки корзин и удержания удаляем в той же транзакции,
+    # иначе они ссылаются на несуществующую пластинку
+    get_cart_store().remove_record(record.id)
+    drop_record(record.id)
+    db.session.delete(record)
+    db.session.commit()
+
+@bp.route('/add_to_cart/<int:record_id>', methods=['POST'])
 @login_required
 def add_to_cart(record_id):
-    record = Record.query.get_or_404(record_id)
-    cart = session.get('cart', {})
-    record_id_str = str(record_id)
+    Record.query.get_or_404(record_id)
+    store = get_cart_store()
     qty_to_add = int(request.form.get('quantity', 1))
     
     # текущий кол-во в корзине
-    current_qty = cart.get(record_id_str, 0)
-    
-    # нельзя добавить больше, чем есть на складе
-    if current_qty + qty_to_add > record.stock_quantity:
-        flash(f'Нельзя добавить больше {record.stock_quantity} шт. в корзину.', 'warning')
-        qty_to_add = max(0, record.stock_quantity - current_qty)
+    current_qty = store.get(current_user.id).get(record_id, 0)
     
+    # удерживаем экземпляры на складе; больше, чем доступно, не получится
+    reserved = reserve(current_user.id, record_id, qty_to_add) if qty_to_add > 0 else 0
+    if reserved < qty_to_add:
+        flash(f'Нельзя добавить больше {current_qty + reserved} шт. в корзину.', 'warning')
+    qty_to_add = reserved
+
+    if qty_to_add > 0:
+        store.add(current_user.id, record_id, qty_to_add)
+    # удержание и строка корзины - один commit: иначе сбой между ними оставил бы товар удержанным без корзины
+    db.session.commit()
     if qty_to_add > 0:
-        cart[record_id_str] = current_qty + qty_to_add
-        session['cart'] = cart
         flash(f'{qty_to_add} шт. добавлено в корзину.', 'success')
-    return redirect(request.referrer or url_for('index'))
+    return redirect(request.referrer or url_for('main.index'))
 
 
-@app.route('/decrease_cart_item/<int:record_id>', methods=['POST'])
+@bp.route('/decrease_cart_item/<int:record_id>', methods=['POST'])
 @login_required
 def decrease_cart_item(record_id):
-    cart = session.get('cart', {})
-    record_id_str = str(record_id)
-    if record_id_str in cart:
-        cart[record_id_str] -= 1
-        if cart[record_id_str] <= 0:
-            del cart[record_id_str]
-    session['cart'] = cart
-    return redirect(url_for('cart'))
-
-@app.route('/remove_from_cart/<int:record_id>', methods=['POST'])
+    store = get_cart_store()
+    if record_id in store.get(current_user.id):
+        store.decrease(current_user.id, record_id)
+        release(current_user.id, record_id, 1)
+    return redirect(url_for('main.cart'))
+
+@bp.route('/remove_from_cart/<int:record_id>', methods=['POST'])
 @login_required
 def remove_from_cart(record_id):
-    cart = session.get('cart', {})
-    record_id_str = str(record_id)
-    if record_id_str in cart:
-        del cart[record_id_str]
-    session['cart'] = cart
-    return redirect(url_for('cart'))
-
-@app.route('/clear_cart', methods=['POST'])
+    store = get_cart_store()
+    if record_id in store.get(current_user.id):
+        store.remove(current_user.id, record_id)
+        release(current_user.id, record_id)
+    return redirect(url_for('main.cart'))
+
+@bp.route('/clear_cart', methods=['POST'])
 @login_required
 def clear_cart():
-    session['cart'] = {}
-    return redirect(url_for('cart'))
+    release(current_user.id)
+    get_cart_store().clear(current_user.id)
+    return redirect(url_for('main.cart'))
 
-@app.route('/cart')
+@bp.route('/cart')
 @login_required
 def cart():
-    cart_items = session.get('cart', {})
+    store = get_cart_store()
+    cart_items = store.get(current_user.id)
     if not cart_items:
         return render_template('cart.html', title='Корзина', items_with_details=[], total=0)
-    record_ids = [int(id) for id in cart_items.keys()]
-    records_in_cart = Record.query.filter(Record.id.in_(record_ids)).all()
+    records_in_cart = Record.query.filter(Record.id.in_(list(cart_items))).all()
+    # удалённые из каталога пластинки убираем из корзины, иначе заказ не оформить
+    for record_id in set(cart_items) - {record.id for record in records_in_cart}:
+        store.remove(current_user.id, record_id)
+        release(current_user.id, record_id)
     items_with_details = []
     total_price = 0
     for record in records_in_cart:
-        quantity = cart_items.get(str(record.id), 0)
+        quantity = cart_items.get(record.id, 0)
         subtotal = record.price * quantity
         total_price += subtotal
         items_with_details.append({
@@ -327,7 +402,7 @@ def cart():
         })
     return render_template('cart.html', title='Корзина', items_with_details=items_with_details, total=total_price)
 
-@app.route('/checkout', methods=['GET', 'POST'])
+@bp.route('/checkout', methods=['GET', 'POST'])
 @login_required
 def checkout():
     # --- гарантируем, что у пользователя есть профиль ---
@@ -337,52 +412,38 @@ def checkout():
         db.session.commit()
 
     form = CheckoutForm()
-    cart_items_dict = session.get('cart', {})
+    store = get_cart_store()
+    cart_items_dict = store.get(current_user.id)
 
     if not cart_items_dict:
         flash('Ваша корзина пуста, невозможно оформить заказ.')
-        return redirect(url_for('cart'))
-
-    record_ids = [int(x) for x in cart_items_dict.keys()]
-    records = Record.query.filter(Record.id.in_(record_ids)).all()
-
-    total_amount = sum(rec.price * cart_items_dict[str(rec.id)] for rec in records)
+        return redirect(url_for('main.cart'))
 
     if form.validate_on_submit():
-        new_order = Order(
-            user_id=current_user.id,
-            total_amount=total_amount,
-            status='В обработке',
-            payment_method=form.payment_method.data
-        )
-        db.session.add(new_order)
-
-        for rec in records:
-            qty = cart_items_dict[str(rec.id)]
-
-            # уменьшаем склад
-            rec.stock_quantity -= qty
-
-            # создаём позиции заказа
-            db.session.add(OrderItem(
-                order=new_order,
-                record_id=rec.id,
-                quantity=qty,
-                price_at_purchase=rec.price
-            ))
-
-        # обновляем адрес доставки
-        current_user.customer_profile.shipping_address = form.shipping_address.data
+        try:
+            place_order(
+                current_user.id,
+                cart_items_dict,
+                payment_method=form.payment_method.data,
+                shipping_address=form.shipping_address.data,
+                comment=form.comment.data
+            )
+        except OutOfStock:
+            flash('Некоторых пластинок уже нет в нужном количестве. Проверьте корзину.', 'warning')
+            return redirect(url_for('main.cart'))
 
-        db.session.commit()
-        session['cart'] = {}
+        store.clear(current_user.id)
         flash('Ваш заказ успешно оформлен!')
-        return redirect(url_for('orders_list'))
+        return redirect(url_for('main.orders_list'))
 
     # подставляем адрес при открытии страницы
     if request.method == 'GET':
         form.shipping_address.data = current_user.customer_profile.shipping_address
 
+    records = Record.query.filter(Record.id.in_(list(cart_items_dict))).all()
+
+    total_amount = sum(rec.price * cart_items_dict[rec.id] for rec in records)
+
     return render_template(
         'checkout.html',
         title='Оформление заказа',
@@ -393,51 +454,45 @@ def checkout():
     )
 
 
-@app.route('/orders')
+@bp.route('/orders')
 @login_required
 def orders_list():
     orders = current_user.orders.order_by(Order.order_date.desc()).all()
     return render_template('orders.html', title='Мои заказы', orders=orders)
 
-@app.route('/order/<int:order_id>')
+@bp.route('/order/<int:order_id>')
 @login_required
 def order_detail(order_id):
     order = Order.query.get_or_404(order_id)
     if order.user_id != current_user.id and current_user.role != 'admin':
         abort(403)
-    return render_template('order_detail.html', title=f'Заказ #{order.id}', order=order)
+    items = order.items.options(joinedload(OrderItem.record)).all()
+    return render_template('order_detail.html', title=f'Заказ #{order.id}', order=order, items=items)
 
 # --- РАЗДЕЛ ПРОИЗВОДИТЕЛЯ (ЛЕЙБЛА) ---
 
-@app.route('/my-records')
+@bp.route('/my-records')
 @login_required
 @manufacturer_required
 def my_records():
-    records = current_user.manufacturer_profile.records.all()
+    records = current_user.manufacturer_profile.records.options(joinedload(Record.release)).all()
     return render_template('my_records.html', title='Мои пластинки', records=records)
 
 # ------------------- ДОБАВЛЕНИЕ -------------------
-@app.route('/my-records/add', methods=['GET', 'POST'])
+@bp.route('/my-records/add', methods=['GET', 'POST'])
 @login_required
 @manufacturer_required
 def manuf_add_record():
-    print("REQUEST METHOD:", request.method)
-    print("FORM DATA:", request.form)
-    print("FILES:", request.files)
-
     form = RecordForm()
-    form.release.choices = [(r.id, r.title) for r in Release.query.order_by(Release.title).all()]
+    form.release.choices = ref_choices('releases')
     form.manufacturer_profile.choices = [
         (current_user.manufacturer_profile.id, current_user.manufacturer_profile.company_name)
     ]  # всегда текущий пользователь
 
     if form.validate_on_submit():
-        print("Form validated")
         filename = None
         if form.cover_image.data:
-            file = form.cover_image.data
-            filename = secure_filename(file.filename)
-            file.save(os.path.join(current_app.config['UPLOAD_FOLDER'], filename))
+            filename = save_cover(form.cover_image.data)
 
         new_record = Record(
             title=form.title.data,
@@ -453,15 +508,14 @@ def manuf_add_record():
         db.session.add(new_record)
         db.session.commit()
         flash('Пластинка успешно добавлена.', 'success')
-        return redirect(url_for('my_records'))
-    else:
-        print("Form errors:", form.errors)
-        print("Request method:", request.method)
+        return redirect(url_for('main.my_records'))
+    elif form.errors:
+        logger.info('Пластинка не добавлена, ошибки формы: %s', form.errors)
 
     return render_template('record_form.html', title='Добавить пластинку', form=form)
 
 # ------------------- РЕДАКТИРОВАНИЕ -------------------
-@app.route('/my-records/edit/<int:record_id>', methods=['GET', 'POST'])
+@bp.route('/my-records/edit/<int:record_id>', methods=['GET', 'POST'])
 @login_required
 @manufacturer_required
 def manuf_edit_record(record_id):
@@ -470,7 +524,7 @@ def manuf_edit_record(record_id):
         abort(403)
 
     form = RecordForm(obj=record)
-    form.release.choices = [(r.id, r.title) for r in Release.query.order_by(Release.title).all()]
+    form.release.choices = ref_choices('releases')
     form.manufacturer_profile.choices = [
         (current_user.manufacturer_profile.id, current_user.manufacturer_profile.company_name)
     ]
@@ -485,76 +539,100 @@ def manuf_edit_record(record_id):
         record.release_id = form.release.data
 
         if form.cover_image.data:
-            file = form.cover_image.data
-            filename = secure_filename(file.filename)
-            file.save(os.path.join(current_app.config['UPLOAD_FOLDER'], filename))
+            filename = save_cover(form.cover_image.data)
             record.cover_image_url = filename
 
         db.session.commit()
         flash('Данные пластинки успешно обновлены.', 'success')
-        return redirect(url_for('my_records'))
+        return redirect(url_for('main.my_records'))
 
     form.release.data = record.release_id
     form.manufacturer_profile.data = current_user.manufacturer_profile.id
     return render_template('record_form.html', title='Редактировать пластинку', form=form)
 
+# ------------------- МАССОВЫЙ ИМПОРТ -------------------
+@bp.route('/my-records/import', methods=['GET', 'POST'])
+@login_required
+@manufacturer_required
+def manuf_import_records():
+    form = RecordImportForm()
+    result = None
+
+    if form.validate_on_submit():
+        upload = form.data_file.data
+        fmt = upload.filename.rsplit('.', 1)[-1].lower()
+        rows = read_rows(upload.stream, fmt)
+        result = import_records(rows, current_user.manufacturer_profile.id, form.skip_invalid.data)
+        if result.inserted:
+            flash(f'Загружено пластинок: {result.inserted}.', 'success')
+        elif result.error_rows:
+            flash('Файл не загружен: исправьте ошибки или включите пропуск строк с ошибками.', 'error')
+
+    return render_template('record_import.html', title='Импорт пластинок', form=form, result=result)
+
 # ------------------- УДАЛЕНИЕ -------------------
-@app.route('/my-records/delete/<int:record_id>', methods=['POST'])
+@bp.route('/my-records/delete/<int:record_id>', methods=['POST'])
 @login_required
 @manufacturer_required
 def delete_record(record_id):
     record = Record.query.get_or_404(record_id)
     if record.manufacturer_profile_id != current_user.manufacturer_profile.id:
         abort(403)
-    db.session.delete(record)
-    db.session.commit()
+    _delete_record(record)
     flash('Пластинка была удалена.', 'success')
-    return redirect(url_for('my_records'))
+    return redirect(url_for('main.my_records'))
 
-@app.route('/sales-report')
+@bp.route('/sales-report')
 @login_required
 @manufacturer_required
 def sales_report():
-    total_sold = 0
-    total_revenue = 0
-
-    for record in current_user.manufacturer_profile.records:
-        total_sold += 50 - record.stock_quantity
-        total_revenue += total_sold * record.price
+    # окно группировки и период отчёта (по умолчанию - с начала года по сегодня)
+    period = request.args.get('period', 'month')
+    if period not in REPORT_PERIODS:
+        period = 'month'
+    today = datetime.date.today()
+    try:
+        start = datetime.date.fromisoformat(request.args.get('start') or f'{today.year}-01-01')
+        end = datetime.date.fromisoformat(request.args.get('end') or today.isoformat())
+    except ValueError:
+        abort(400)
+
+    report = manufacturer_report(current_user.manufacturer_profile.id, start, end, period)
 
     return render_template(
         'sales_report.html',
         title='Отчет о продажах',
-        total_sold=total_sold,
-        total_revenue=total_revenue
+        period=period,
+        start=start,
+        end=end,
+        **report
     )
 
 
-@app.route('/top_selling')
+@bp.route('/top_selling')
+@replica_reads
 def top_selling():
-    max_stock = 50  # если это фикс
-    records = Record.query.all()
-
-    # посчитаем "сколько продано" на лету
-    enriched = []
-    for r in records:
-        sold = max_stock - r.stock_quantity
-        revenue = sold * float(r.price)
-        enriched.append((r, sold, revenue))
+    # лидеры продаж за год (по умолчанию - текущий) или за период start..end
+    year = request.args.get('year', datetime.date.today().year, type=int)
+    try:
+        # год вне MINYEAR..MAXYEAR (например, 0 из поля формы) - ValueError
+        start, end = year_range(year)
+        if request.args.get('start'):
+            start = datetime.date.fromisoformat(request.args['start'])
+        if request.args.get('end'):
+            end = datetime.date.fromisoformat(request.args['end'])
+    except ValueError:
+        abort(400)
 
-    # сортировка: по sold убыв
-    enriched.sort(key=lambda x: x[1], reverse=True)
+    records = top_records(start, end, limit=10)
 
-    # возьмём топ-10
-    enriched = enriched[:10]
-
-    return render_template('top_selling.html', records=enriched)
+    return render_template('top_selling.html', records=records, year=year, start=start, end=end)
 
 
 # --- АДМИН-ПАНЕЛЬ ---
 
 
-@app.route('/admin/dashboard')
+@bp.route('/admin/dashboard')
 @login_required
 @admin_required
 def admin_dashboard():
@@ -572,14 +650,52 @@ def admin_dashboard():
 
 
 
-@app.route('/admin/users')
+@bp.route('/admin/jobs')
 @login_required
 @admin_required
-def admin_users():
-    page = request.args.get('page', 1, type=int)
+def admin_jobs():
+    return render_template('admin/jobs.html', title='Фоновые задачи', stats=queue_stats())
+
 
+@bp.route('/admin/profiles')
+@login_required
+@admin_required
+def admin_profiles():
+    stacks, total = hot_stacks()
+    return render_template('admin/profiles.html', title='Профилирование',
+                           profiles=list_profiles(current_app.config['PROFILE_FOLDER']),
+                           stacks=stacks, total=total, sampling=sampling_status())
+
+
+@bp.route('/admin/profiles/sampled.collapsed')
+@login_required
+@admin_required
+def admin_profile_samples():
+    return Response(sampled_collapsed(), content_type='text/plain; charset=utf-8')
+
+
+@bp.route('/admin/profiles/reset', methods=['POST'])
+@login_required
+@admin_required
+def admin_reset_profile_samples():
+    reset_samples()
+    flash('Выборка стеков очищена.', 'success')
+    return redirect(url_for('main.admin_profiles'))
+
+
+@bp.route('/admin/profiles/<name>')
+@login_required
+@admin_required
+def admin_profile_file(name):
+    return send_file_cached(current_app.config['PROFILE_FOLDER'], name)
+
+
+@bp.route('/admin/users')
+@login_required
+@admin_required
+def admin_users():
     per_page = 15
-    pagination = User.query.order_by(User.id.asc()).paginate(page=page, per_page=per_page)
+    pagination = paginate_query(User.query, [(User.id, 'asc')], per_page=per_page)
 
     return render_template(
         'admin/users_list.html',
@@ -589,7 +705,7 @@ def admin_users():
     )
 
 
-@app.route('/admin/user/<int:user_id>')
+@bp.route('/admin/user/<int:user_id>')
 @login_required
 @admin_required
 def admin_user_detail(user_id):
@@ -597,7 +713,7 @@ def admin_user_detail(user_id):
     return render_template('admin/user_detail.html', title=f'Профиль {user.username}', user=user)
 
 
-@app.route('/admin/user/edit/<int:user_id>', methods=['GET', 'POST'])
+@bp.route('/admin/user/edit/<int:user_id>', methods=['GET', 'POST'])
 @login_required
 @admin_required
 def admin_edit_user(user_id):
@@ -627,7 +743,7 @@ def admin_edit_user(user_id):
 
         db.session.commit()
         flash('Данные пользователя обновлены.')
-        return redirect(url_for('admin_users'))
+        return redirect(url_for('main.admin_users'))
         
     elif request.method == 'GET':
         form.username.data = user.username
@@ -636,29 +752,28 @@ def admin_edit_user(user_id):
     return render_template('admin/user_edit.html', title='Редактировать пользователя', form=form, user=user)
 
 
-@app.route('/admin/user/delete/<int:user_id>', methods=['POST'])
+@bp.route('/admin/user/delete/<int:user_id>', methods=['POST'])
 @login_required
 @admin_required
 def admin_delete_user(user_id):
     # Защита от удаления самого себя
     if user_id == current_user.id:
         flash('Вы не можете удалить свой собственный аккаунт.', 'error')
-        return redirect(url_for('admin_users'))
+        return redirect(url_for('main.admin_users'))
         
     user_to_delete = User.query.get_or_404(user_id)
     db.session.delete(user_to_delete)
     db.session.commit()
     flash('Пользователь был успешно удален.')
-    return redirect(url_for('admin_users'))
+    return redirect(url_for('main.admin_users'))
 
 # --- АДМИН: УПРАВЛЕНИЕ ЖАНРАМИ ---
 
-@app.route('/admin/genres')
+@bp.route('/admin/genres')
 @login_required
 @admin_required
 def admin_genres():
-    page = request.args.get('page', 1, type=int)
-    pagination = Genre.query.order_by(Genre.name).paginate(page=page, per_page=15)
+    pagination = paginate_query(Genre.query, [(Genre.name, 'asc'), (Genre.id, 'asc')], per_page=15)
     return render_template(
         'admin/genres_list.html',
         genres=pagination.items,
@@ -666,7 +781,7 @@ def admin_genres():
     )
 
 
-@app.route('/admin/genre/add', methods=['GET', 'POST'])
+@bp.route('/admin/genre/add', methods=['GET', 'POST'])
 @login_required
 @admin_required
 def admin_add_genre():
@@ -676,10 +791,10 @@ def admin_add_genre():
         db.session.add(new_genre)
         db.session.commit()
         flash('Жанр успешно добавлен.')
-        return redirect(url_for('admin_genres'))
+        return redirect(url_for('main.admin_genres'))
     return render_template('admin/genre_form.html', title='Добавить жанр', form=form)
 
-@app.route('/admin/genre/edit/<int:genre_id>', methods=['GET', 'POST'])
+@bp.route('/admin/genre/edit/<int:genre_id>', methods=['GET', 'POST'])
 @login_required
 @admin_required
 def admin_edit_genre(genre_id):
@@ -689,10 +804,10 @@ def admin_edit_genre(genre_id):
         genre.name = form.name.data
         db.session.commit()
         flash('Жанр успешно обновлен.')
-        return redirect(url_for('admin_genres'))
+        return redirect(url_for('main.admin_genres'))
     return render_template('admin/genre_form.html', title='Редактировать жанр', form=form)
 
-@app.route('/admin/genre/delete/<int:genre_id>', methods=['POST'])
+@bp.route('/admin/genre/delete/<int:genre_id>', methods=['POST'])
 @login_required
 @admin_required
 def admin_delete_genre(genre_id):
@@ -700,16 +815,15 @@ def admin_delete_genre(genre_id):
     db.session.delete(genre)
     db.session.commit()
     flash('Жанр удален.')
-    return redirect(url_for('admin_genres'))
+    return redirect(url_for('main.admin_genres'))
 
 # --- АДМИН: УПРАВЛЕНИЕ АРТИСТАМИ ---
 
-@app.route('/admin/artists')
+@bp.route('/admin/artists')
 @login_required
 @admin_required
 def admin_artists():
-    page = request.args.get('page', 1, type=int)
-    pagination = Artist.query.order_by(Artist.name).paginate(page=page, per_page=15)
+    pagination = paginate_query(Artist.query, [(Artist.name, 'asc'), (Artist.id, 'asc')], per_page=15)
     return render_template(
         'admin/artists_list.html',
         artists=pagination.items,
@@ -717,7 +831,7 @@ def admin_artists():
     )
 
 
-@app.route('/admin/artist/add', methods=['GET', 'POST'])
+@bp.route('/admin/artist/add', methods=['GET', 'POST'])
 @login_required
 @admin_required
 def admin_add_artist():
@@ -727,10 +841,10 @@ def admin_add_artist():
         db.session.add(new_artist)
         db.session.commit()
         flash('Артист успешно добавлен.')
-        return redirect(url_for('admin_artists'))
+        return redirect(url_for('main.admin_artists'))
     return render_template('admin/artist_form.html', title='Добавить артиста', form=form)
 
-@app.route('/admin/artist/edit/<int:artist_id>', methods=['GET', 'POST'])
+@bp.route('/admin/artist/edit/<int:artist_id>', methods=['GET', 'POST'])
 @login_required
 @admin_required
 def admin_edit_artist(artist_id):
@@ -741,10 +855,10 @@ def admin_edit_artist(artist_id):
         artist.bio = form.bio.data
         db.session.commit()
         flash('Данные артиста успешно обновлены.')
-        return redirect(url_for('admin_artists'))
+        return redirect(url_for('main.admin_artists'))
     return render_template('admin/artist_form.html', title='Редактировать артиста', form=form)
 
-@app.route('/admin/artist/delete/<int:artist_id>', methods=['POST'])
+@bp.route('/admin/artist/delete/<int:artist_id>', methods=['POST'])
 @login_required
 @admin_required
 def admin_delete_artist(artist_id):
@@ -752,17 +866,17 @@ def admin_delete_artist(artist_id):
     db.session.delete(artist)
     db.session.commit()
     flash('Артист удален.')
-    return redirect(url_for('admin_artists'))
+    return redirect(url_for('main.admin_artists'))
 
 
 # --- АДМИН: УПРАВЛЕНИЕ ГРУППАМИ ---
 
-@app.route('/admin/bands')
+@bp.route('/admin/bands')
 @login_required
 @admin_required
 def admin_bands():
-    page = request.args.get('page', 1, type=int)
-    pagination = Band.query.order_by(Band.name).paginate(page=page, per_page=15)
+    query = Band.query.options(joinedload(Band.genre), selectinload(Band.members))
+    pagination = paginate_query(query, [(Band.name, 'asc'), (Band.id, 'asc')], per_page=15)
 
     return render_template(
         'admin/bands_list.html',
@@ -771,20 +885,18 @@ def admin_bands():
     )
 
 
-@app.route('/admin/band/add', methods=['GET', 'POST'])
+@bp.route('/admin/band/add', methods=['GET', 'POST'])
 @login_required
 @admin_required
 def admin_add_band():
     form = BandForm()
-    form.genre.choices = [(g.id, g.name) for g in Genre.query.order_by('name').all()]
-    form.members.choices = [(a.id, a.name) for a in Artist.query.order_by('name').all()]
+    form.genre.choices = ref_choices('genres')
+    form.members.choices = ref_choices('artists')
 
     if form.validate_on_submit():
         filename = None
         if form.cover_image.data:
-            file = form.cover_image.data
-            filename = secure_filename(file.filename)
-            file.save(os.path.join(current_app.config['UPLOAD_FOLDER'], filename))
+            filename = save_cover(form.cover_image.data)
 
         new_band = Band(
             name=form.name.data,
@@ -799,19 +911,19 @@ def admin_add_band():
         db.session.add(new_band)
         db.session.commit()
         flash('Группа успешно добавлена.')
-        return redirect(url_for('admin_bands'))
+        return redirect(url_for('main.admin_bands'))
 
     return render_template('admin/band_form.html', title='Добавить группу', form=form)
 
 
-@app.route('/admin/band/edit/<int:band_id>', methods=['GET', 'POST'])
+@bp.route('/admin/band/edit/<int:band_id>', methods=['GET', 'POST'])
 @login_required
 @admin_required
 def admin_edit_band(band_id):
     band = Band.query.get_or_404(band_id)
     form = BandForm(obj=band)
-    form.genre.choices = [(g.id, g.name) for g in Genre.query.order_by('name').all()]
-    form.members.choices = [(a.id, a.name) for a in Artist.query.order_by('name').all()]
+    form.genre.choices = ref_choices('genres')
+    form.members.choices = ref_choices('artists')
     
     if form.validate_on_submit():
         band.name = form.name.data
@@ -822,14 +934,12 @@ def admin_edit_band(band_id):
         band.members = selected_members
 
         if form.cover_image.data:
-            file = form.cover_image.data
-            filename = secure_filename(file.filename)
-            file.save(os.path.join(current_app.config['UPLOAD_FOLDER'], filename))
+            filename = save_cover(form.cover_image.data)
             band.cover_image_url = filename
         
         db.session.commit()
         flash('Данные группы успешно обновлены.')
-        return redirect(url_for('admin_bands'))
+        return redirect(url_for('main.admin_bands'))
 
     elif request.method == 'GET':
         form.genre.data = band.genre_id
@@ -838,7 +948,7 @@ def admin_edit_band(band_id):
     return render_template('admin/band_form.html', title='Редактировать группу', form=form)
 
 
-@app.route('/admin/band/delete/<int:band_id>', methods=['POST'])
+@bp.route('/admin/band/delete/<int:band_id>', methods=['POST'])
 @login_required
 @admin_required
 def admin_delete_band(band_id):
@@ -846,17 +956,17 @@ def admin_delete_band(band_id):
     db.session.delete(band)
     db.session.commit()
     flash('Группа удалена.')
-    return redirect(url_for('admin_bands'))
+    return redirect(url_for('main.admin_bands'))
 
 
 # --- АДМИН: УПРАВЛЕНИЕ КОМПОЗИЦИЯМИ ---
 
-@app.route('/admin/compositions')
+@bp.route('/admin/compositions')
 @login_required
 @admin_required
 def admin_compositions():
-    page = request.args.get('page', 1, type=int)
-    pagination = Composition.query.order_by(Composition.id).paginate(page=page, per_page=15)
+    query = Composition.query.options(joinedload(Composition.author_band))
+    pagination = paginate_query(query, [(Composition.id, 'asc')], per_page=15)
 
     return render_template(
         'admin/compositions_list.html',
@@ -865,13 +975,13 @@ def admin_compositions():
     )
 
 
-@app.route('/admin/composition/add', methods=['GET', 'POST'])
+@bp.route('/admin/composition/add', methods=['GET', 'POST'])
 @login_required
 @admin_required
 def admin_add_composition():
     form = CompositionForm()
     # Загружаем список групп в поле выбора
-    form.author_band.choices = [(b.id, b.name) for b in Band.query.order_by('name').all()]
+    form.author_band.choices = ref_choices('bands')
 
     if form.validate_on_submit():
         new_composition = Composition(
@@ -882,16 +992,16 @@ def admin_add_composition():
         db.session.add(new_composition)
         db.session.commit()
         flash('Композиция успешно добавлена.')
-        return redirect(url_for('admin_compositions'))
+        return redirect(url_for('main.admin_compositions'))
     return render_template('admin/composition_form.html', title='Добавить композицию', form=form)
 
-@app.route('/admin/composition/edit/<int:composition_id>', methods=['GET', 'POST'])
+@bp.route('/admin/composition/edit/<int:composition_id>', methods=['GET', 'POST'])
 @login_required
 @admin_required
 def admin_edit_composition(composition_id):
     composition = Composition.query.get_or_404(composition_id)
     form = CompositionForm(obj=composition)
-    form.author_band.choices = [(b.id, b.name) for b in Band.query.order_by('name').all()]
+    form.author_band.choices = ref_choices('bands')
     
     if form.validate_on_submit():
         composition.title = form.title.data
@@ -899,7 +1009,7 @@ def admin_edit_composition(composition_id):
         composition.duration = form.duration.data
         db.session.commit()
         flash('Данные композиции успешно обновлены.')
-        return redirect(url_for('admin_compositions'))
+        return redirect(url_for('main.admin_compositions'))
 
     # При GET-запросе предзаполняем поле автора
     elif request.method == 'GET':
@@ -907,7 +1017,7 @@ def admin_edit_composition(composition_id):
 
     return render_template('admin/composition_form.html', title='Редактировать композицию', form=form)
 
-@app.route('/admin/composition/delete/<int:composition_id>', methods=['POST'])
+@bp.route('/admin/composition/delete/<int:composition_id>', methods=['POST'])
 @login_required
 @admin_required
 def admin_delete_composition(composition_id):
@@ -915,15 +1025,15 @@ def admin_delete_composition(composition_id):
     db.session.delete(composition)
     db.session.commit()
     flash('Композиция удалена.')
-    return redirect(url_for('admin_compositions'))
+    return redirect(url_for('main.admin_compositions'))
 
 
-@app.route('/admin/releases')
+@bp.route('/admin/releases')
 @login_required
 @admin_required
 def admin_releases():
-    page = request.args.get('page', 1, type=int)
-    pagination = Release.query.order_by(Release.id).paginate(page=page, per_page=15)
+    query = Release.query.options(joinedload(Release.band))
+    pagination = paginate_query(query, [(Release.id, 'asc')], per_page=15)
     return render_template(
         'admin/releases_list.html',
         releases=pagination.items,
@@ -931,13 +1041,13 @@ def admin_releases():
     )
 
 
-@app.route('/admin/release/add', methods=['GET', 'POST'])
+@bp.route('/admin/release/add', methods=['GET', 'POST'])
 @login_required
 @admin_required
 def admin_add_release():
     form = ReleaseForm()
     # Список групп
-    form.band.choices = [(b.id, b.name) for b in Band.query.order_by(Band.name).all()]
+    form.band.choices = ref_choices('bands')
     # Если группа выбрана (POST), подгружаем композиции
     form.compositions.choices = [(c.id, c.title) for c in Composition.query.filter_by(author_band_id=form.band.data).all()] if form.band.data else []
 
@@ -950,10 +1060,8 @@ def admin_add_release():
 
         # Картинка
         if form.cover_image.data:
-            file = form.cover_image.data
-            filename = secure_filename(file.filename)
-            file.save(os.path.join(current_app.config['UPLOAD_FOLDER'], filename))
-            new_release.cover_image_url = f'/uploads/{filename}'
+            filename = save_cover(form.cover_image.data)
+            new_release.cover_image_url = filename
 
         # Треки
         selected_compositions = Composition.query.filter(Composition.id.in_(form.compositions.data)).all()
@@ -962,18 +1070,18 @@ def admin_add_release():
         db.session.add(new_release)
         db.session.commit()
         flash('Релиз успешно добавлен.')
-        return redirect(url_for('admin_releases'))
+        return redirect(url_for('main.admin_releases'))
 
     return render_template('admin/release_form.html', title='Добавить релиз', form=form)
 
 
-@app.route('/admin/release/edit/<int:release_id>', methods=['GET', 'POST'])
+@bp.route('/admin/release/edit/<int:release_id>', methods=['GET', 'POST'])
 @login_required
 @admin_required
 def admin_edit_release(release_id):
     release = Release.query.get_or_404(release_id)
     form = ReleaseForm(obj=release)
-    form.band.choices = [(b.id, b.name) for b in Band.query.order_by(Band.name).all()]
+    form.band.choices = ref_choices('bands')
     form.compositions.choices = [(c.id, c.title) for c in release.band.compositions]
 
     if form.validate_on_submit():
@@ -983,9 +1091,7 @@ def admin_edit_release(release_id):
         release.band_id = form.band.data
 
         if form.cover_image.data:
-            file = form.cover_image.data
-            filename = secure_filename(file.filename)
-            file.save(os.path.join(current_app.config['UPLOAD_FOLDER'], filename))
+            filename = save_cover(form.cover_image.data)
             release.cover_image_url = f'{filename}'
 
         selected_compositions = Composition.query.filter(Composition.id.in_(form.compositions.data)).all()
@@ -993,7 +1099,7 @@ def admin_edit_release(release_id):
 
         db.session.commit()
         flash('Релиз успешно обновлён.')
-        return redirect(url_for('admin_releases'))
+        return redirect(url_for('main.admin_releases'))
 
     elif request.method == 'GET':
         form.band.data = release.band_id
@@ -1001,7 +1107,7 @@ def admin_edit_release(release_id):
 
     return render_template('admin/release_form.html', title='Редактировать релиз', form=form)
 
-@app.route('/admin/release/delete/<int:release_id>', methods=['POST'])
+@bp.route('/admin/release/delete/<int:release_id>', methods=['POST'])
 @login_required
 @admin_required
 def admin_delete_release(release_id):
@@ -1009,37 +1115,106 @@ def admin_delete_release(release_id):
     db.session.delete(release)
     db.session.commit()
     flash('Релиз удален.')
-    return redirect(url_for('admin_releases'))
+    return redirect(url_for('main.admin_releases'))
 
 # --- СПИСОК ПЛАСТИНОК ---
-@app.route('/admin/records')
+@bp.route('/admin/records')
 @login_required
 @admin_required
 def admin_records():
-    page = request.args.get('page', 1, type=int)
-    pagination = Record.query.order_by(Record.id).paginate(page=page, per_page=15)
+    query = Record.query.options(joinedload(Record.release), joinedload(Record.manufacturer_profile))
+    pagination = paginate_query(query, [(Record.id, 'asc')], per_page=15)
     return render_template(
         'admin/records_list.html',
         records=pagination.items,
         pagination=pagination
     )
 
-@app.route('/admin/record/add', methods=['GET', 'POST'])
+# --- МАССОВОЕ ИЗМЕНЕНИЕ ПЛАСТИНОК ---
+def _bulk_edit_form(manufacturer_id=None):
+    form = RecordBulkEditForm()
+    form.operation.choices = BULK_OPERATIONS
+    form.release_id.choices = [(0, 'Все')] + ref_choices('releases')
+    form.band_id.choices = [(0, 'Все')] + ref_choices('bands')
+    if manufacturer_id:
+        # производитель меняет только свои пластинки, весь каталог ему недоступен
+        form.manufacturer_profile_id.choices = [(manufacturer_id, current_user.manufacturer_profile.company_name)]
+        del form.all_records
+    else:
+        form.manufacturer_profile_id.choices = [(0, 'Все')] + ref_choices('manufacturers')
+
+    matched = None
+    if form.validate_on_submit():
+        criteria = bulk_criteria(
+            form.release_id.data, form.band_id.data,
+            manufacturer_id or form.manufacturer_profile_id.data, form.record_type.data.strip()
+        )
+        dry_run = not form.submit.data
+        try:
+            count = bulk_update(form.operation.data, form.value.data, criteria, dry_run=dry_run,
+                                whole_catalog=not manufacturer_id and form.all_records.data)
+        except BulkEditError as exc:
+            flash(str(exc), 'error')
+        else:
+            if dry_run:
+                matched = count
+            else:
+                flash(f'Изменено пластинок: {count}.', 'success')
+    return form, matched
+
+
+@bp.route('/admin/records/bulk', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def admin_bulk_edit_records():
+    form, matched = _bulk_edit_form()
+    return render_template('admin/records_bulk.html', title='Массовое изменение', form=form, matched=matched)
+
+
+@bp.route('/my-records/bulk', methods=['GET', 'POST'])
+@login_required
+@manufacturer_required
+def manuf_bulk_edit_records():
+    form, matched = _bulk_edit_form(current_user.manufacturer_profile.id)
+    return render_template('records_bulk.html', title='Массовое изменение', form=form, matched=matched)
+
+
+@bp.route('/api/records/bulk-update', methods=['POST'])
+@login_required
+def api_bulk_update_records():
+    if current_user.role not in ('admin', 'manufacturer'):
+        abort(403)
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get('filters', {}), dict):
+        return jsonify({'error': 'Ожидается JSON-объект'}), 400
+    filters = {key: data.get('filters', {}).get(key) for key in FILTER_KEYS}
+    if current_user.role == 'manufacturer':
+        filters['manufacturer_profile_id'] = current_user.manufacturer_profile.id
+    try:
+        for key in ('release_id', 'band_id', 'manufacturer_profile_id'):
+            filters[key] = int(filters[key]) if filters[key] else None
+    except (TypeError, ValueError):
+        return jsonify({'error': 'id в фильтрах должны быть целыми числами'}), 400
+    try:
+        # пустые filters - весь каталог, только с явным "all": true
+        count = bulk_update(data.get('operation'), data.get('value'), bulk_criteria(**filters),
+                            dry_run=bool(data.get('dry_run')), whole_catalog=data.get('all') is True)
+    except BulkEditError as exc:
+        return jsonify({'error': str(exc)}), 400
+    return jsonify({'matched' if data.get('dry_run') else 'updated': count})
+
+@bp.route('/admin/record/add', methods=['GET', 'POST'])
 @login_required
 @admin_required
 def admin_add_record():
     form = RecordForm()
-    form.release.choices = [(r.id, r.title) for r in Release.query.order_by(Release.title).all()]
-    form.manufacturer_profile.choices = [
-        (m.id, m.company_name) for m in ManufacturerProfile.query.order_by(ManufacturerProfile.company_name).all()
-    ]
+    form.release.choices = ref_choices('releases')
+    form.manufacturer_profile.choices = ref_choices('manufacturers')
 
     if form.validate_on_submit():
         filename = None
         if form.cover_image.data:
-            file = form.cover_image.data
-            filename = secure_filename(file.filename)
-            file.save(os.path.join(current_app.config['UPLOAD_FOLDER'], filename))
+            filename = save_cover(form.cover_image.data)
 
         new_record = Record(
             title=form.title.data,
@@ -1055,21 +1230,19 @@ def admin_add_record():
         db.session.add(new_record)
         db.session.commit()
         flash('Пластинка успешно добавлена.')
-        return redirect(url_for('admin_records'))
+        return redirect(url_for('main.admin_records'))
 
     return render_template('admin/record_form.html', title='Добавить пластинку', form=form)
 
 
-@app.route('/admin/record/edit/<int:record_id>', methods=['GET', 'POST'])
+@bp.route('/admin/record/edit/<int:record_id>', methods=['GET', 'POST'])
 @login_required
 @admin_required
 def admin_edit_record(record_id):
     record = Record.query.get_or_404(record_id)
     form = RecordForm(obj=record)
-    form.release.choices = [(r.id, r.title) for r in Release.query.order_by(Release.title).all()]
-    form.manufacturer_profile.choices = [
-        (m.id, m.company_name) for m in ManufacturerProfile.query.order_by(ManufacturerProfile.company_name).all()
-    ]
+    form.release.choices = ref_choices('releases')
+    form.manufacturer_profile.choices = ref_choices('manufacturers')
 
     if form.validate_on_submit():
         record.title = form.title.data
@@ -1082,14 +1255,12 @@ def admin_edit_record(record_id):
         record.manufacturer_profile_id = form.manufacturer_profile.data
 
         if form.cover_image.data:
-            file = form.cover_image.data
-            filename = secure_filename(file.filename)
-            file.save(os.path.join(current_app.config['UPLOAD_FOLDER'], filename))
+            filename = save_cover(form.cover_image.data)
             record.cover_image_url = filename
 
         db.session.commit()
         flash('Данные пластинки успешно обновлены.')
-        return redirect(url_for('admin_records'))
+        return redirect(url_for('main.admin_records'))
 
     # Предзаполнение select-полей при GET
     form.release.data = record.release_id
@@ -1098,41 +1269,54 @@ def admin_edit_record(record_id):
 
 
 # --- УДАЛИТЬ ПЛАСТИНКУ ---
-@app.route('/admin/record/delete/<int:record_id>', methods=['POST'])
+@bp.route('/admin/record/delete/<int:record_id>', methods=['POST'])
 @login_required
 @admin_required
 def admin_delete_record(record_id):
     record = Record.query.get_or_404(record_id)
-    db.session.delete(record)
-    db.session.commit()
+    _delete_record(record)
     flash('Пластинка удалена.')
-    return redirect(url_for('admin_records'))
+    return redirect(url_for('main.admin_records'))
 
 # app/routes.py
-@app.route('/admin/orders')
+@bp.route('/admin/orders')
 @login_required
 @admin_required
 def admin_orders():
-    page = request.args.get('page', 1, type=int)
     q = request.args.get('q', '', type=str)
+    status = request.args.get('status', '', type=str)
+    date_from = parse_date(request.args.get('date_from'))
+    date_to = parse_date(request.args.get('date_to'))
 
-    orders_query = Order.query.order_by(Order.order_date.desc())
-
-    if q:
-        # Можно фильтровать по ID или имени пользователя
-        orders_query = orders_query.join(User).filter(
-            db.or_(
-                Order.id.ilike(f"%{q}%"),
-                User.username.ilike(f"%{q}%")
-            )
-        )
+    # Можно фильтровать по ID (точно) или началу имени пользователя, статусу и датам
+    orders_query = filter_orders(Order.query.options(joinedload(Order.user)), q, status, date_from, date_to)
 
-    pagination = orders_query.paginate(page=page, per_page=15)
+    pagination = paginate_query(orders_query, [(Order.order_date, 'desc'), (Order.id, 'desc')], per_page=15)
     orders = pagination.items
 
-    return render_template('admin/orders_list.html', orders=orders, pagination=pagination, q=q)
+    return render_template('admin/orders_list.html', orders=orders, pagination=pagination, q=q,
+                           status=status, statuses=ORDER_STATUSES, date_from=date_from, date_to=date_to)
 
-@app.route('/admin/order/edit/<int:order_id>', methods=['GET', 'POST'])
+@bp.route('/admin/orders/export.<fmt>')
+@login_required
+@admin_required
+def admin_export_orders(fmt):
+    if fmt not in EXPORT_FORMATS:
+        abort(404)
+    rows = export_rows(
+        request.args.get('q', '', type=str),
+        request.args.get('status', '', type=str),
+        parse_date(request.args.get('date_from')),
+        parse_date(request.args.get('date_to'))
+    )
+    filename = f'orders-{datetime.date.today().isoformat()}.{fmt}'
+    return Response(
+        stream_with_context(GENERATORS[fmt](rows)),
+        content_type=EXPORT_FORMATS[fmt],
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+@bp.route('/admin/order/edit/<int:order_id>', methods=['GET', 'POST'])
 @login_required
 @admin_required
 def admin_edit_order(order_id):
@@ -1140,6 +1324,12 @@ def admin_edit_order(order_id):
     form = AdminOrderForm(obj=order)
 
     if form.validate_on_submit():
+        # отмена заказа убирает его из свода продаж, возврат из отмены - добавляет
+        was_cancelled = order.status == CANCELLED_STATUS
+        is_cancelled = form.status.data == CANCELLED_STATUS
+        if was_cancelled != is_cancelled:
+            apply_order(order, -1 if is_cancelled else 1)
+
         order.status = form.status.data
         order.shipping_address = form.shipping_address.data
         order.payment_method = form.payment_method.data
@@ -1147,7 +1337,7 @@ def admin_edit_order(order_id):
 
         db.session.commit()
         flash('Заказ успешно обновлён.')
-        return redirect(url_for('admin_orders'))
+        return redirect(url_for('main.admin_orders'))
 
     # Предзаполнение select-полей при GET
     elif request.method == 'GET':
@@ -1158,19 +1348,21 @@ def admin_edit_order(order_id):
 
     return render_template('admin/order_form.html', title=f'Редактировать заказ #{order.id}', form=form, order=order)
 
-@app.route('/admin/order/delete/<int:order_id>', methods=['POST'])
+@bp.route('/admin/order/delete/<int:order_id>', methods=['POST'])
 @login_required
 @admin_required
 def admin_delete_order(order_id):
     order = Order.query.get_or_404(order_id)
+    if order.status != CANCELLED_STATUS:
+        apply_order(order, -1)
     db.session.delete(order)
     db.session.commit()
     flash('Заказ удалён.')
-    return redirect(url_for('admin_orders'))
+    return redirect(url_for('main.admin_orders'))
 
 
 # --- API-маршрут для JavaScript ---
-@app.route('/api/compositions_by_band/<int:band_id>')
+@bp.route('/api/compositions_by_band/<int:band_id>')
 @login_required
 @admin_required
 def api_compositions_by_band(band_id):
@@ -0,0 +1,129 @@
+import datetime
+from app import db
+from app.database import upsert_insert
+from app.models import Record, Order, OrderItem, RecordSalesDaily
+
+# --- СВОД ПРОДАЖ ---
+# record_sales_daily хранит (пластинка, день) -> количество и выручку.
+# Оформление заказа прибавляет к своду, отмена/удаление заказа - вычитает,
+# поэтому отчёты за любой период читают только свод, а не историю заказов.
+
+CANCELLED_STATUS = 'cancelled'
+
+
+def add_sales(day, lines, sign=1):
+    """lines - список (record_id, quantity, price); sign=-1 откатывает продажу."""
+    totals = {}
+    for record_id, quantity, price in lines:
+        qty, revenue = totals.get(record_id, (0, 0))
+        totals[record_id] = (qty + quantity, revenue + quantity * price)
+    if not totals:
+        return
+
+    stmt = upsert_insert(RecordSalesDaily).values([
+        {'record_id': record_id, 'day': day, 'quantity': sign * qty, 'revenue': sign * revenue}
+        for record_id, (qty, revenue) in totals.items()
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['record_id', 'day'],
+        set_={
+            'quantity': RecordSalesDaily.quantity + stmt.excluded.quantity,
+            'revenue': RecordSalesDaily.revenue + stmt.excluded.revenue,
+        }
+    )
+    db.session.execute(stmt)
+
+
+def apply_order(order, sign=1):
+    lines = db.session.query(OrderItem.record_id, OrderItem.quantity, OrderItem.price_at_purchase) \
+        .filter(OrderItem.order_id == order.id).all()
+    add_sales(order.order_date.date(), lines, sign)
+
+
+def rebuild_sales_rollup():
+    db.session.query(RecordSalesDaily).delete()
+    day = db.func.date(Order.order_date)
+    select = db.select(
+        OrderItem.record_id,
+        day,
+        db.func.sum(OrderItem.quantity),
+        db.func.sum(OrderItem.quantity * OrderItem.price_at_purchase)
+    ).join(Order, Order.id == OrderItem.order_id) \
+        .where(Order.status != CANCELLED_STATUS) \
+        .group_by(OrderItem.record_id, day)
+    db.session.execute(
+        db.insert(RecordSalesDaily).from_select(['record_id', 'day', 'quantity', 'revenue'], select)
+    )
+    db.session.commit()
+
+
+def init_sales_rollup():
+    # свод пуст, а заказы уже есть (например, таблицу только что создали) - пересчитываем
+    if db.session.query(RecordSalesDaily.record_id).first() is None \
+            and db.session.query(OrderItem.id).first() is not None:
+        rebuild_sales_rollup()
+
+
+def year_range(year):
+    return datetime.date(year, 1, 1), datetime.date(year, 12, 31)
+
+
+def top_records(start, end, limit=10):
+    """Лидеры продаж за период [start, end]: список (Record, продано, выручка)."""
+    sold = db.func.sum(RecordSalesDaily.quantity).label('sold')
+    revenue = db.func.sum(RecordSalesDaily.revenue).label('revenue')
+    totals = db.session.query(RecordSalesDaily.record_id, sold, revenue) \
+        .filter(RecordSalesDaily.day.between(start, end)) \
+        .group_by(RecordSalesDaily.record_id) \
+        .having(sold > 0) \
+        .subquery()
+    rows = db.session.query(Record, totals.c.sold, totals.c.revenue) \
+        .join(totals, totals.c.record_id == Record.id) \
+        .order_by(totals.c.sold.desc(), Record.id) \
+        .limit(limit).all()
+    return [(record, sold, float(revenue or 0)) for record, sold, revenue in rows]
+
+
+# --- ОТЧЁТ ПРОИЗВОДИТЕЛЯ ---
+
+# формат группировки по окну: strftime для SQLite и to_char для PostgreSQL (неделя там - ISO)
+REPORT_PERIODS = {
+    'day': ('%Y-%m-%d', 'YYYY-MM-DD'),
+    'week': ('%Y-W%W', 'IYYY-"W"IW'),
+    'month': ('%Y-%m', 'YYYY-MM'),
+    'year': ('%Y', 'YYYY'),
+}
+
+
+def period_bucket(period, column, dialect):
+    sqlite_format, postgresql_format = REPORT_PERIODS[period]
+    if dialect == 'postgresql':
+        return db.func.to_char(column, postgresql_format)
+    return db.func.strftime(sqlite_format, column)
+
+
+def manufacturer_report(profile_id, start, end, period='month'):
+    """Итоги, разбивка по окнам и по пластинкам для производителя за [start, end]."""
+    sold = db.func.coalesce(db.func.sum(RecordSalesDaily.quantity), 0)
+    revenue = db.func.coalesce(db.func.sum(RecordSalesDaily.revenue), 0)
+
+    base = db.session.query().select_from(RecordSalesDaily) \
+        .join(Record, Record.id == RecordSalesDaily.record_id) \
+        .filter(Record.manufacturer_profile_id == profile_id,
+                RecordSalesDaily.day.between(start, end))
+
+    total_sold, total_revenue = base.add_columns(sold, revenue).one()
+
+    bucket = period_bucket(period, RecordSalesDaily.day, db.engine.dialect.name).label('bucket')
+    by_period = base.add_columns(bucket, sold, revenue) \
+        .group_by(bucket).order_by(bucket).all()
+
+    by_record = base.add_columns(Record.id, Record.title, sold, revenue) \
+        .group_by(Record.id, Record.title).order_by(sold.desc(), Record.id).all()
+
+    return {
+        'total_sold': total_sold,
+        'total_revenue': float(total_revenue),
+        'by_period': [(label, qty, float(rev)) for label, qty, rev in by_period],
+        'by_record': [(record_id, title, qty, float(rev)) for record_id, title, qty, rev in by_record],
+    }
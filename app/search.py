@@ -0,0 +1,161 @@
+import re
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+from app import db
+from app.models import Release, Band, Composition, Artist
+
+# --- ПОЛНОТЕКСТОВЫЙ ИНДЕКС КАТАЛОГА (SQLite FTS5) ---
+# Одна строка индекса на релиз: rowid = releases.id,
+# колонки - название релиза, группа, композиции и участники группы.
+
+FTS_TABLE = 'catalog_fts'
+
+# веса колонок для bm25: название важнее всего, потом группа
+FTS_WEIGHTS = '10.0, 5.0, 1.0, 1.0'
+
+_fts_enabled = False
+
+
+def fts_enabled():
+    return _fts_enabled
+
+
+def _create_table(conn):
+    conn.exec_driver_sql(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        "title, band_name, compositions, artists, "
+        "tokenize = 'unicode61 remove_diacritics 2')"
+    )
+
+
+def _refresh(conn, release_ids):
+    if not release_ids:
+        return
+    ids = ', '.join(str(int(i)) for i in release_ids)
+    conn.exec_driver_sql(f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({ids})")
+    conn.exec_driver_sql(
+        f"INSERT INTO {FTS_TABLE} (rowid, title, band_name, compositions, artists) "
+        "SELECT r.id, r.title, b.name, "
+        "  (SELECT group_concat(c.title, ' ') FROM release_compositions rc "
+        "     JOIN compositions c ON c.id = rc.composition_id WHERE rc.release_id = r.id), "
+        "  (SELECT group_concat(a.name, ' ') FROM band_members bm "
+        "     JOIN artists a ON a.id = bm.artist_id WHERE bm.band_id = r.band_id) "
+        f"FROM releases r JOIN bands b ON b.id = r.band_id WHERE r.id IN ({ids})"
+    )
+
+
+def _remove(conn, release_ids):
+    if not release_ids:
+        return
+    ids = ', '.join(str(int(i)) for i in release_ids)
+    conn.exec_driver_sql(f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({ids})")
+
+
+def _select_ids(conn, sql, ids):
+    if not ids:
+        return set()
+    ids = ', '.join(str(int(i)) for i in ids)
+    return {row[0] for row in conn.exec_driver_sql(sql.format(ids=ids))}
+
+
+def _affected_releases(conn, bands=(), compositions=(), artists=()):
+    result = set()
+    result |= _select_ids(conn, "SELECT id FROM releases WHERE band_id IN ({ids})", bands)
+    result |= _select_ids(
+        conn, "SELECT release_id FROM release_compositions WHERE composition_id IN ({ids})", compositions
+    )
+    result |= _select_ids(
+        conn,
+        "SELECT r.id FROM releases r JOIN band_members bm ON bm.band_id = r.band_id "
+        "WHERE bm.artist_id IN ({ids})",
+        artists
+    )
+    return result
+
+
+def rebuild_search_index():
+    conn = db.session.connection()
+    conn.exec_driver_sql(f"DELETE FROM {FTS_TABLE}")
+    ids = [row[0] for row in conn.exec_driver_sql("SELECT id FROM releases")]
+    _refresh(conn, ids)
+    db.session.commit()
+
+
+def init_search_index():
+    global _fts_enabled
+    if db.engine.dialect.name != 'sqlite':
+        return
+    try:
+        with db.engine.begin() as conn:
+            _create_table(conn)
+    except OperationalError:
+        # сборка SQLite без FTS5 - остаёмся на ILIKE
+        return
+    _fts_enabled = True
+
+    indexed = db.session.execute(db.text(f"SELECT count(*) FROM {FTS_TABLE}")).scalar()
+    total = db.session.execute(db.text("SELECT count(*) FROM releases")).scalar()
+    if indexed != total:
+        rebuild_search_index()
+
+
+# --- СИНХРОНИЗАЦИЯ С ИЗМЕНЕНИЯМИ МОДЕЛЕЙ ---
+
+def _ids_of(objects, model):
+    return {obj.id for obj in objects if isinstance(obj, model) and obj.id is not None}
+
+
+@event.listens_for(db.session, 'before_flush')
+def _collect_deleted(session, flush_context, instances):
+    if not _fts_enabled or not session.deleted:
+        return
+    # связи удаляемых композиций/артистов пропадут после flush, поэтому считаем заранее
+    conn = session.connection()
+    pending = session.info.setdefault('fts_refresh', set())
+    pending |= _affected_releases(
+        conn,
+        compositions=_ids_of(session.deleted, Composition),
+        artists=_ids_of(session.deleted, Artist)
+    )
+
+
+@event.listens_for(db.session, 'after_flush')
+def _sync_search_index(session, flush_context):
+    if not _fts_enabled:
+        return
+    changed = session.new | session.dirty
+    conn = session.connection()
+
+    refresh = session.info.pop('fts_refresh', set())
+    refresh |= _ids_of(changed, Release)
+    refresh |= _affected_releases(
+        conn,
+        bands=_ids_of(changed, Band),
+        compositions=_ids_of(changed, Composition),
+        artists=_ids_of(changed, Artist)
+    )
+    deleted = _ids_of(session.deleted, Release)
+
+    _remove(conn, deleted)
+    _refresh(conn, refresh - deleted)
+
+
+# --- ПОИСК ---
+
+def _match_expression(q):
+    # каждое слово - префиксный терм в кавычках, чтобы не ломаться на синтаксисе FTS5
+    tokens = re.findall(r'\w+', q)
+    return ' '.join(f'"{t}"*' for t in tokens)
+
+
+def search_releases(q):
+    """Подзапрос (release_id, rank) для найденных релизов, либо None, если FTS недоступен."""
+    if not _fts_enabled:
+        return None
+    match = _match_expression(q)
+    if not match:
+        return None
+    return db.text(
+        f"SELECT rowid AS release_id, bm25({FTS_TABLE}, {FTS_WEIGHTS}) AS rank "
+        f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :q"
+    ).bindparams(q=match).columns(release_id=db.Integer, rank=db.Float).subquery('fts')
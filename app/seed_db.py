@@ -1,15 +1,20 @@
+import click
+from flask.cli import with_appcontext
 from app import db
 from app.models import Genre, Band, Artist, Composition, Release, Record, User, ManufacturerProfile
 from werkzeug.security import generate_password_hash
 import random
-import faker
-
-fake = faker.Faker()
 
 def seed_database():
     if User.query.filter_by(role='admin').first():
         print("База уже содержит администратора. Seed пропущен.")
         return
+    # faker импортируется только здесь: воркеру при старте он не нужен
+    import faker
+    fake = faker.Faker()
+    # всё наполнение - одна транзакция (flush вместо commit на каждом шаге),
+    # общий пароль хешируется один раз
+    password_hash = generate_password_hash('password')
     # ------------------
     # Админ и обычный пользователь
     # ------------------
@@ -25,13 +30,13 @@ def seed_database():
     if not User.query.filter_by(username='user1').first():
         user = User(
             username='user1',
-            password_hash=generate_password_hash('password'),
+            password_hash=password_hash,
             role='user'
         )
         db.session.add(user)
         print("✅ Обычный пользователь создан: user1 / password")
 
-    db.session.commit()
+    db.session.flush()
 
     # ------------------
     # Жанры
@@ -39,7 +44,7 @@ def seed_database():
     genre_names = ['Rock', 'Jazz', 'Pop', 'Hip-Hop', 'Electronic']
     genres = [Genre(name=name) for name in genre_names]
     db.session.add_all(genres)
-    db.session.commit()
+    db.session.flush()
 
     # ------------------
     # Производители
@@ -49,11 +54,11 @@ def seed_database():
         username = f'manufacturer{i+1}'
         user = User(
             username=username,
-            password_hash=generate_password_hash('password'),
+            password_hash=password_hash,
             role='manufacturer'
         )
         db.session.add(user)
-        db.session.commit()
+        db.session.flush()
 
         profile = ManufacturerProfile(
             user_id=user.id,
@@ -61,7 +66,7 @@ def seed_database():
             company_address=fake.address()
         )
         db.session.add(profile)
-        db.session.commit()
+        db.session.flush()
         manufacturers.append(profile)
 
     # ------------------
@@ -75,7 +80,7 @@ def seed_database():
         )
         db.session.add(artist)
         artists.append(artist)
-    db.session.commit()
+    db.session.flush()
 
     # ------------------
     # Группы
@@ -94,7 +99,7 @@ def seed_database():
         band.members = random.sample(artists, num_members)
         db.session.add(band)
         bands.append(band)
-    db.session.commit()
+    db.session.flush()
 
     # ------------------
     # Релизы
@@ -110,7 +115,7 @@ def seed_database():
         )
         db.session.add(release)
         releases.append(release)
-    db.session.commit()
+    db.session.flush()
 
     # ------------------
     # Композиции
@@ -127,7 +132,7 @@ def seed_database():
             comp.releases.append(release)
             db.session.add(comp)
             compositions.append(comp)
-    db.session.commit()
+    db.session.flush()
 
     # ------------------
     # Пластинки
@@ -172,11 +177,18 @@ def seed_database():
     print(f"- Производители: {len(manufacturers)}")
     print("Админ и обычный пользователь созданы.")
 
+@click.command('seed')
+@with_appcontext
+def seed_command():
+    """Создаёт недостающие таблицы и наполняет пустую базу демонстрационными данными."""
+    db.create_all()
+    seed_database()
+
 # ------------------
 # Если запускаем как скрипт
 # ------------------
 if __name__ == "__main__":
-    from app import app
-    with app.app_context():
+    from app import create_app
+    with create_app().app_context():
         db.create_all()
         seed_database()
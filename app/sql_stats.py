@@ -0,0 +1,105 @@
+import logging
+import time
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from app import db
+
+# --- СТАТИСТИКА SQL ПО ЗАПРОСАМ ---
+# События before/after_cursor_execute всех движков считают для каждого
+# HTTP-запроса число SQL-запросов, время в базе и повторы одного и того же
+# текста. Текст, выполненный больше SQL_N_PLUS_ONE_THRESHOLD раз с разными
+# параметрами, - типичный N+1 (ленивая загрузка в цикле), он пишется в лог.
+# Запросы дольше SQL_SLOW_QUERY_MS попадают в лог с параметрами и планом.
+# При SQL_STATS_HEADER (или в debug) итоги уходят в заголовок X-SQL-Stats.
+
+logger = logging.getLogger(__name__)
+
+
+class RequestSqlStats:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        # текст запроса -> [сколько раз, множество наборов параметров]
+        self.statements = {}
+
+    def add(self, statement, parameters, elapsed):
+        self.count += 1
+        self.total += elapsed
+        seen = self.statements.setdefault(statement, [0, set()])
+        seen[0] += 1
+        seen[1].add(repr(parameters))
+
+    def repeated(self):
+        return {statement: n for statement, (n, _) in self.statements.items() if n > 1}
+
+    def n_plus_one(self, threshold):
+        # один и тот же текст с разными параметрами больше threshold раз
+        return {statement: n for statement, (n, params) in self.statements.items()
+                if n > threshold and len(params) > 1}
+
+
+def _explain(cursor, dialect, statement, parameters):
+    if not statement.lstrip().upper().startswith('SELECT'):
+        return None
+    prefix = 'EXPLAIN QUERY PLAN ' if dialect == 'sqlite' else 'EXPLAIN '
+    plan_cursor = cursor.connection.cursor()
+    try:
+        plan_cursor.execute(prefix + statement, parameters)
+        return [row[-1] for row in plan_cursor.fetchall()]
+    except Exception as exc:
+        return [f'не удалось получить план: {exc!r}']
+    finally:
+        plan_cursor.close()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(slow_ms):
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_start'].pop()
+        if has_request_context():
+            stats = g.get('sql_stats')
+            if stats is not None:
+                stats.add(statement, parameters, elapsed)
+        if slow_ms and elapsed * 1000 >= slow_ms:
+            plan = None if executemany else _explain(cursor, conn.dialect.name, statement, parameters)
+            logger.warning('Медленный SQL (%.1f мс)%s: %s; параметры: %r; план: %s',
+                           elapsed * 1000, f' в {request.path}' if has_request_context() else '',
+                           statement, parameters, plan)
+    return after_cursor_execute
+
+
+def request_sql_stats():
+    """Статистика SQL текущего HTTP-запроса (None вне запроса)."""
+    return g.get('sql_stats') if has_request_context() else None
+
+
+def init_sql_stats(app):
+    slow_ms = app.config['SQL_SLOW_QUERY_MS']
+    threshold = app.config['SQL_N_PLUS_ONE_THRESHOLD']
+    header = app.config['SQL_STATS_HEADER'] or app.debug
+
+    for engine in db.engines.values():
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute(slow_ms))
+
+    @app.before_request
+    def start_sql_stats():
+        g.sql_stats = RequestSqlStats()
+
+    @app.after_request
+    def report_sql_stats(response):
+        stats = g.pop('sql_stats', None)
+        if stats is None:
+            return response
+        suspects = stats.n_plus_one(threshold)
+        for statement, n in suspects.items():
+            logger.warning('Похоже на N+1 в %s %s: %d раз %s', request.method, request.path, n, statement)
+        if header:
+            response.headers['X-SQL-Stats'] = (
+                f'queries={stats.count}; db_ms={stats.total * 1000:.1f}; '
+                f'repeated={len(stats.repeated())}; n_plus_one={len(suspects)}'
+            )
+        return response
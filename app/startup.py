@@ -0,0 +1,106 @@
+import datetime
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from app.search import init_search_index
+from app.suggest import init_suggestions
+from app.sales import init_sales_rollup
+from app.database import optimize_planner
+from app.thumbnails import init_thumbnails
+from app.file_serving import init_file_serving
+from app.reservations import start_reservation_sweeper
+from app.jobs import start_job_workers
+from app.replica import start_replication
+from app.profiler import start_sampling
+
+# --- ЛЕНИВЫЙ ЗАПУСК ---
+# create_app только собирает приложение и не обращается к базе, поэтому
+# импорт, flask CLI и загрузка воркера не ждут прогрева. Индексы в памяти,
+# сводные таблицы и фоновые потоки поднимаются один раз на процесс -
+# перед первым запросом (или явным вызовом warm_up).
+
+_lock = threading.Lock()
+
+
+def warm_up(app):
+    state = app.extensions.setdefault('warm_up', {'done': False})
+    if state['done']:
+        return
+    with _lock:
+        if state['done']:
+            return
+        # отдельный контекст - отдельная сессия, запрос начнёт с чистой
+        with app.app_context():
+            init_search_index()
+            init_suggestions()
+            init_sales_rollup()
+            optimize_planner()
+            init_thumbnails()
+            init_file_serving()
+        start_reservation_sweeper(app)
+        start_job_workers(app)
+        start_replication(app)
+        start_sampling(app)
+        state['done'] = True
+
+
+def init_startup(app):
+    @app.before_request
+    def warm_up_once():
+        # при ошибке (например, база ещё не создана) попробуем снова на следующем запросе
+        warm_up(current_app._get_current_object())
+
+
+# --- ЗАМЕР ХОЛОДНОГО СТАРТА ---
+
+# выполняется в новом интерпретаторе, печатает время этапов в секундах
+_COLD_START = '''
+import json, time
+start = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+status = app.test_client().get({path!r}).status_code
+served = time.perf_counter()
+print(json.dumps({{'import': imported - start, 'create_app': created - imported,
+                  'first_request': served - created, 'total': served - start, 'status': status}}))
+'''
+
+PHASES = ('import', 'create_app', 'first_request', 'total')
+
+
+@click.command('bench-startup')
+@click.option('--runs', default=5, show_default=True, help='Сколько раз запустить воркер.')
+@click.option('--path', default='/', show_default=True, help='Адрес первого запроса.')
+@click.option('--output', type=click.Path(dir_okay=False), help='Дописать результат строкой JSON в файл.')
+@with_appcontext
+def bench_startup_command(runs, path, output):
+    """Холодный старт воркера: импорт, create_app и первый запрос в новом процессе."""
+    root = os.path.dirname(current_app.root_path)
+    # фоновые потоки не нужны для замера и не должны переживать его
+    env = dict(os.environ, JOB_WORKERS='0', RESERVATION_SWEEP_INTERVAL='0', PROFILE_SAMPLE_INTERVAL='0')
+    samples = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, '-c', _COLD_START.format(path=path)], cwd=root, env=env,
+                                capture_output=True, text=True, check=True)
+        sample = json.loads(result.stdout.strip().splitlines()[-1])
+        if sample['status'] >= 500:
+            raise click.ClickException(f'{path} ответил {sample["status"]}')
+        samples.append(sample)
+
+    summary = {phase: {'median': statistics.median(s[phase] for s in samples),
+                       'min': min(s[phase] for s in samples)} for phase in PHASES}
+    for phase in PHASES:
+        click.echo(f'{phase:>14}: медиана {summary[phase]["median"] * 1000:8.1f} мс, '
+                   f'минимум {summary[phase]["min"] * 1000:8.1f} мс')
+    if output:
+        with open(output, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'at': datetime.datetime.utcnow().isoformat(timespec='seconds'),
+                                'runs': runs, 'path': path, **summary}) + '\n')
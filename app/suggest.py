@@ -0,0 +1,119 @@
+import threading
+from bisect import bisect_left
+from sqlalchemy import event
+from app import db
+from app.models import Release, Band
+
+# --- ПРЕФИКСНЫЙ ИНДЕКС ДЛЯ АВТОПОДСКАЗОК ---
+# Отсортированные массивы (ключ в нижнем регистре, id) + bisect.
+# Читатели работают без блокировок: при изменении массивы пересобираются
+# и подменяются целиком (изменения каталога редки, подсказки - часты).
+
+_lock = threading.Lock()
+
+_releases = {}        # release_id -> (title, band_id)
+_band_names = {}      # band_id -> name
+_band_releases = {}   # band_id -> множество release_id
+_title_keys = []      # [(title.lower(), release_id)]
+_band_keys = []       # [(name.lower(), band_id)]
+
+
+def _rebuild_keys():
+    global _title_keys, _band_keys
+    _title_keys = sorted((title.lower(), rid) for rid, (title, _) in _releases.items())
+    _band_keys = sorted((name.lower(), bid) for bid, name in _band_names.items())
+
+
+def init_suggestions():
+    with _lock:
+        _releases.clear()
+        _band_names.clear()
+        _band_releases.clear()
+        for bid, name in db.session.query(Band.id, Band.name):
+            _band_names[bid] = name
+        for rid, title, bid in db.session.query(Release.id, Release.title, Release.band_id):
+            _releases[rid] = (title, bid)
+            _band_releases.setdefault(bid, set()).add(rid)
+        _rebuild_keys()
+
+
+def _scan(keys, prefix):
+    i = bisect_left(keys, (prefix,))
+    while i < len(keys) and keys[i][0].startswith(prefix):
+        yield keys[i][1]
+        i += 1
+
+
+def suggest(q, limit=5):
+    prefix = q.strip().lower()
+    if not prefix:
+        return []
+    title_keys, band_keys = _title_keys, _band_keys
+
+    found = []
+    seen = set()
+
+    def add(rid):
+        if rid not in seen and rid in _releases:
+            seen.add(rid)
+            found.append(rid)
+        return len(found) >= limit
+
+    for rid in _scan(title_keys, prefix):
+        if add(rid):
+            break
+    else:
+        for bid in _scan(band_keys, prefix):
+            if any(add(rid) for rid in sorted(_band_releases.get(bid, ()))):
+                break
+
+    result = []
+    for rid in found:
+        title, bid = _releases.get(rid, ('', None))
+        result.append(f"{title} ({_band_names.get(bid, '')})")
+    return result
+
+
+# --- ОБНОВЛЕНИЕ ПО СОБЫТИЯМ МОДЕЛЕЙ ---
+# Изменения копятся до коммита; при откате транзакции они отбрасываются.
+
+@event.listens_for(db.session, 'after_flush')
+def _collect_changes(session, flush_context):
+    pending = session.info.setdefault('suggest_changes', [])
+    for obj in session.new | session.dirty:
+        if isinstance(obj, Release):
+            pending.append(('release', obj.id, (obj.title, obj.band_id)))
+        elif isinstance(obj, Band):
+            pending.append(('band', obj.id, obj.name))
+    for obj in session.deleted:
+        if isinstance(obj, Release):
+            pending.append(('release', obj.id, None))
+        elif isinstance(obj, Band):
+            pending.append(('band', obj.id, None))
+
+
+@event.listens_for(db.session, 'after_commit')
+def _apply_changes(session):
+    pending = session.info.pop('suggest_changes', None)
+    if not pending:
+        return
+    with _lock:
+        for kind, obj_id, value in pending:
+            if kind == 'release':
+                old = _releases.pop(obj_id, None)
+                if old:
+                    _band_releases[old[1]] = _band_releases.get(old[1], set()) - {obj_id}
+                if value:
+                    _releases[obj_id] = value
+                    _band_releases[value[1]] = _band_releases.get(value[1], set()) | {obj_id}
+            else:
+                if value is None:
+                    _band_names.pop(obj_id, None)
+                else:
+                    _band_names[obj_id] = value
+        _rebuild_keys()
+
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _discard_changes(session, previous_transaction):
+    session.info.pop('suggest_changes', None)
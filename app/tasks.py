@@ -0,0 +1,35 @@
+import logging
+import os
+from flask import current_app
+from app import db
+from app.jobs import task
+from app.models import CustomerProfile
+from app.thumbnails import looks_like_image, make_thumbnails, thumbnails_enabled
+
+# --- ОБРАБОТЧИКИ ФОНОВЫХ ЗАДАЧ ---
+
+logger = logging.getLogger(__name__)
+
+
+@task('save_shipping_address')
+def save_shipping_address(user_id, address):
+    db.session.query(CustomerProfile).filter(CustomerProfile.user_id == user_id) \
+        .update({'shipping_address': address}, synchronize_session=False)
+    db.session.commit()
+
+
+@task('order_placed')
+def order_placed(order_id):
+    # точка подключения уведомлений о новом заказе
+    logger.info('Оформлен заказ #%s', order_id)
+
+
+@task('cover_uploaded')
+def cover_uploaded(filename):
+    # FileAllowed проверяет только расширение - проверяем, что это действительно картинка
+    path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
+    if not looks_like_image(path):
+        logger.warning('Загруженный файл %s не похож на изображение', filename)
+        return
+    if thumbnails_enabled():
+        make_thumbnails(filename)
@@ -0,0 +1,141 @@
+import json
+import logging
+import os
+from flask import current_app, url_for
+from app import db
+from app.models import Job
+from app.jobs import enqueue
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # без Pillow страницы показывают оригиналы
+    Image = None
+
+# --- УМЕНЬШЕННЫЕ ОБЛОЖКИ ---
+# Для каждой загруженной обложки фоновая задача готовит копии фиксированной
+# ширины (THUMBNAIL_WIDTHS) в исходном формате и в WebP и складывает их в
+# THUMBNAIL_FOLDER. Страницы ссылаются на нужную ширину через srcset, а маршрут
+# /thumbs/<ширина>/<файл> отдаёт WebP тем браузерам, что его принимают,
+# и оригинал, пока копия ещё не готова.
+
+JPEG_QUALITY = 82
+WEBP_QUALITY = 80
+# формат оригинала (по расширению имени) -> расширение копии; GIF перекодируется в PNG
+EXTENSION_FORMATS = {'.jpg': 'JPEG', '.jpeg': 'JPEG', '.png': 'PNG', '.gif': 'GIF', '.webp': 'WEBP'}
+SAVE_FORMATS = {'JPEG': '.jpg', 'PNG': '.png', 'GIF': '.png', 'WEBP': '.webp'}
+# расширение копии -> формат Pillow, которым она пишется
+ENCODERS = {'.jpg': 'JPEG', '.png': 'PNG', '.webp': 'WEBP'}
+IMAGE_SIGNATURES = (b'\xff\xd8\xff', b'\x89PNG\r\n\x1a\n', b'GIF8', b'RIFF')
+
+logger = logging.getLogger(__name__)
+
+
+def thumbnails_enabled():
+    return Image is not None and bool(current_app.config['THUMBNAIL_WIDTHS'])
+
+
+def looks_like_image(path):
+    with open(path, 'rb') as f:
+        return f.read(8).startswith(IMAGE_SIGNATURES)
+
+
+def _copy_extension(filename):
+    # выводится из имени оригинала, чтобы маршрут находил копию, не открывая файл
+    ext = os.path.splitext(filename)[1].lower()
+    return SAVE_FORMATS.get(EXTENSION_FORMATS.get(ext), '.jpg')
+
+
+def thumbnail_name(filename, width, webp=False):
+    stem = os.path.splitext(filename)[0]
+    return f'{stem}_{width}{".webp" if webp else _copy_extension(filename)}'
+
+
+def _save(image, path, fmt, **options):
+    # пишем во временный файл и подменяем, чтобы не отдать недописанную картинку
+    tmp = f'{path}.tmp'
+    image.save(tmp, fmt, **options)
+    os.replace(tmp, path)
+
+
+def make_thumbnails(filename):
+    """Готовит все ширины обложки (исходный формат + WebP); возвращает число файлов."""
+    source = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
+    folder = current_app.config['THUMBNAIL_FOLDER']
+    os.makedirs(folder, exist_ok=True)
+
+    # формат копии задаётся её расширением, чтобы содержимое совпадало с Content-Type
+    fmt = ENCODERS[_copy_extension(filename)]
+    with Image.open(source) as original:
+        image = ImageOps.exif_transpose(original)
+        if fmt == 'JPEG':
+            image = image.convert('RGB')
+        elif image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA')
+
+        written = 0
+        for width in current_app.config['THUMBNAIL_WIDTHS']:
+            # не увеличиваем: узкий оригинал просто перекодируется
+            scaled = image
+            if image.width > width:
+                height = max(1, round(image.height * width / image.width))
+                scaled = image.resize((width, height), Image.LANCZOS)
+
+            # у WebP-оригинала копия в исходном формате и WebP-копия - один файл
+            if fmt == 'JPEG':
+                _save(scaled, os.path.join(folder, thumbnail_name(filename, width)), 'JPEG',
+                      quality=JPEG_QUALITY, optimize=True, progressive=True)
+                written += 1
+            elif fmt == 'PNG':
+                _save(scaled, os.path.join(folder, thumbnail_name(filename, width)), 'PNG', optimize=True)
+                written += 1
+            _save(scaled, os.path.join(folder, thumbnail_name(filename, width, webp=True)), 'WEBP',
+                  quality=WEBP_QUALITY, method=4)
+            written += 1
+    return written
+
+
+def backfill_thumbnails():
+    # ставит в очередь обложки, у которых ещё нет копий (например, загруженные до появления копий)
+    if not thumbnails_enabled():
+        return 0
+    folder = current_app.config['THUMBNAIL_FOLDER']
+    widest = max(current_app.config['THUMBNAIL_WIDTHS'])
+    # уже стоящие в очереди обложки не дублируем при каждом запуске
+    pending = {json.loads(payload).get('filename') for payload, in db.session.query(Job.payload).filter(
+        Job.name == 'cover_uploaded', Job.status.in_(['queued', 'running']))}
+    queued = 0
+    for entry in os.scandir(current_app.config['UPLOAD_FOLDER']):
+        if not entry.is_file() or entry.name in pending:
+            continue
+        if os.path.exists(os.path.join(folder, thumbnail_name(entry.name, widest, webp=True))):
+            continue
+        if looks_like_image(entry.path):
+            enqueue('cover_uploaded', filename=entry.name)
+            queued += 1
+    db.session.commit()
+    return queued
+
+
+def init_thumbnails():
+    if Image is None:
+        logger.warning('Pillow не установлен: уменьшенные обложки не создаются')
+        return
+    backfill_thumbnails()
+
+
+# --- ССЫЛКИ ИЗ ШАБЛОНОВ ---
+# регистрируются в create_app как глобальные функции шаблонов
+
+def cover_url(filename, width=None):
+    if width is None or not thumbnails_enabled():
+        return url_for('main.uploaded_file', filename=filename)
+    # ширина из шаблона может не входить в THUMBNAIL_WIDTHS (тогда /thumbs ответит 404):
+    # берём ближайшую настроенную, при равенстве - большую
+    width = min(current_app.config['THUMBNAIL_WIDTHS'], key=lambda w: (abs(w - width), -w))
+    return url_for('main.cover_thumbnail', width=width, filename=filename)
+
+
+def cover_srcset(filename):
+    if not thumbnails_enabled():
+        return ''
+    return ', '.join(f'{cover_url(filename, width)} {width}w' for width in current_app.config['THUMBNAIL_WIDTHS'])
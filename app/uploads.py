@@ -0,0 +1,75 @@
+import hashlib
+import os
+import re
+import tempfile
+from flask import current_app
+from werkzeug.utils import secure_filename
+from app.jobs import enqueue
+
+# --- ЗАГРУЗКА ОБЛОЖЕК ---
+# Файл хранится под sha256 своего содержимого: <hash>.<расширение>.
+# Поток загрузки читается кусками - одновременно считается хеш и идёт запись
+# во временный файл, - поэтому картинка не держится в памяти целиком.
+# Одинаковые байты дают одно имя (повторная загрузка ничего не пишет), а
+# содержимое по имени никогда не меняется, и его можно кешировать навсегда.
+
+CHUNK_SIZE = 64 * 1024
+
+# сигнатура -> расширение; имя файла от пользователя используется только как запасной вариант
+EXTENSIONS = (
+    (b'\xff\xd8\xff', '.jpg'),
+    (b'\x89PNG\r\n\x1a\n', '.png'),
+    (b'GIF8', '.gif'),
+    (b'RIFF', '.webp'),
+)
+
+CONTENT_ADDRESSED = re.compile(r'^([0-9a-f]{64})\.[a-z0-9]+$')
+
+
+def _extension(head, original_name):
+    for signature, ext in EXTENSIONS:
+        if head.startswith(signature):
+            return ext
+    ext = os.path.splitext(secure_filename(original_name or ''))[1].lower()
+    return ext or '.bin'
+
+
+def content_hash(filename):
+    """sha256 из имени файла, если файл хранится по содержимому, иначе None."""
+    match = CONTENT_ADDRESSED.match(filename)
+    return match.group(1) if match else None
+
+
+def save_cover(file):
+    folder = current_app.config['UPLOAD_FOLDER']
+    digest = hashlib.sha256()
+    head = b''
+    with tempfile.NamedTemporaryFile(dir=folder, prefix='.upload-', delete=False) as tmp:
+        try:
+            while True:
+                chunk = file.stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                if len(head) < 8:
+                    head += chunk[:8 - len(head)]
+                digest.update(chunk)
+                tmp.write(chunk)
+        except BaseException:
+            tmp.close()
+            os.unlink(tmp.name)
+            raise
+
+    filename = digest.hexdigest() + _extension(head, file.filename)
+    path = os.path.join(folder, filename)
+    if os.path.exists(path):
+        # такие байты уже загружены - копии для них тоже готовы
+        os.unlink(tmp.name)
+        return filename
+
+    os.chmod(tmp.name, 0o644)
+    os.replace(tmp.name, path)
+    # сохраняем сам файл в запросе, дальнейшую обработку отдаём фоновой задаче;
+    # задачу сохранит commit маршрута вместе с формой
+    enqueue('cover_uploaded', filename=filename)
+    return filename
+
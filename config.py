@@ -1,11 +1,85 @@
+import json
 import os
 from dotenv import load_dotenv
 
 basedir = os.path.abspath(os.path.dirname(__file__))
 load_dotenv(os.path.join(basedir, '.env'))
 
+# SQLite (по умолчанию) или PostgreSQL - upsert'ы корзины, удержаний и свода продаж других баз не знают
+DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///' + os.path.join(basedir, 'instance', 'app.db')
+
+
+def engine_options(uri):
+    # параметры пула и соединения из окружения; SQLALCHEMY_ENGINE_OPTIONS (JSON) дополняет и перекрывает их
+    options = {'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', '0') == '1'}
+    for key, env, cast in (('pool_size', 'DB_POOL_SIZE', int),
+                           ('max_overflow', 'DB_MAX_OVERFLOW', int),
+                           ('pool_timeout', 'DB_POOL_TIMEOUT', float),
+                           ('pool_recycle', 'DB_POOL_RECYCLE', int)):
+        if os.environ.get(env):
+            options[key] = cast(os.environ[env])
+    connect_timeout = float(os.environ.get('DB_CONNECT_TIMEOUT', 15))
+    if uri.startswith('sqlite'):
+        # для sqlite3 это ожидание снятия блокировки, а не установки соединения
+        options['connect_args'] = {'timeout': connect_timeout}
+    else:
+        options['connect_args'] = {'connect_timeout': int(connect_timeout)}
+    options.update(json.loads(os.environ.get('SQLALCHEMY_ENGINE_OPTIONS') or '{}'))
+    return options
+
+
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'you-will-never-guess'
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(basedir, 'instance', 'app.db')
+    SQLALCHEMY_DATABASE_URI = DATABASE_URI
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(DATABASE_URI)
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    UPLOAD_FOLDER = os.path.join(basedir, 'app', 'uploads')
\ No newline at end of file
+    # реплика только для чтения каталога (пусто - читаем основную базу) и допустимое отставание, секунды
+    SQLALCHEMY_BINDS = {'replica': os.environ['REPLICA_DATABASE_URL']} if os.environ.get('REPLICA_DATABASE_URL') else {}
+    REPLICA_MAX_LAG = float(os.environ.get('REPLICA_MAX_LAG', 30))
+    REPLICA_HEARTBEAT_INTERVAL = float(os.environ.get('REPLICA_HEARTBEAT_INTERVAL', 5))
+    # локальная проверка: копировать файл SQLite в реплику раз в N секунд (0 - не копировать)
+    REPLICA_COPY_INTERVAL = float(os.environ.get('REPLICA_COPY_INTERVAL', 0))
+    # PRAGMA для каждого нового соединения SQLite: WAL - читатели не ждут писателя,
+    # NORMAL - fsync только на чекпоинтах WAL; размеры mmap и кеша - в байтах и KiB (отрицательное)
+    SQLITE_PRAGMAS = {
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 15000)),
+        'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+        'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE', -64 * 1024)),
+    }
+    # статистика SQL по запросам: порог N+1 (повторов одного текста с разными параметрами),
+    # медленный запрос в мс (0 - не логировать) и заголовок X-SQL-Stats (в debug включён всегда)
+    SQL_N_PLUS_ONE_THRESHOLD = int(os.environ.get('SQL_N_PLUS_ONE_THRESHOLD', 5))
+    SQL_SLOW_QUERY_MS = float(os.environ.get('SQL_SLOW_QUERY_MS', 200))
+    SQL_STATS_HEADER = os.environ.get('SQL_STATS_HEADER', '0') == '1'
+    # /metrics в формате Prometheus; METRICS_TOKEN - если задан, нужен заголовок Authorization: Bearer
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+    # профили запросов администратора (?_profile=1) - каталог и сколько последних хранить;
+    # период постоянной выборки стеков запросов в секундах (0 - выключена)
+    PROFILE_FOLDER = os.environ.get('PROFILE_FOLDER') or os.path.join(basedir, 'instance', 'profiles')
+    PROFILE_KEEP = int(os.environ.get('PROFILE_KEEP', 50))
+    PROFILE_SAMPLE_INTERVAL = float(os.environ.get('PROFILE_SAMPLE_INTERVAL', 0.05))
+    UPLOAD_FOLDER = os.path.join(basedir, 'app', 'uploads')
+    # удержание товара в корзине (секунды) и период фоновой очистки просроченных удержаний
+    RESERVATION_TTL = int(os.environ.get('RESERVATION_TTL', 15 * 60))
+    RESERVATION_SWEEP_INTERVAL = int(os.environ.get('RESERVATION_SWEEP_INTERVAL', 60))
+    # хранилище корзин: 'sql' (таблица cart_items) или 'memory' (LRU в памяти процесса)
+    CART_BACKEND = os.environ.get('CART_BACKEND', 'sql')
+    CART_MEMORY_CAPACITY = int(os.environ.get('CART_MEMORY_CAPACITY', 10000))
+    # фоновые задачи: число потоков-исполнителей (0 - не запускать) и период опроса очереди;
+    # задача, которая выполняется дольше JOB_LEASE_TIMEOUT секунд, считается брошенной и возвращается в очередь
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+    JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 5))
+    JOB_LEASE_TIMEOUT = float(os.environ.get('JOB_LEASE_TIMEOUT', 30 * 60))
+    # уменьшенные копии обложек: ширины в пикселях (пусто - не создавать) и каталог для них
+    THUMBNAIL_WIDTHS = [int(w) for w in os.environ.get('THUMBNAIL_WIDTHS', '160,320,640').split(',') if w.strip()]
+    THUMBNAIL_FOLDER = os.environ.get('THUMBNAIL_FOLDER') or os.path.join(basedir, 'instance', 'thumbnails')
+    # отдача файлов: сжатые копии CSS/JS и выгрузка тела через прокси
+    # SENDFILE_MODE: '' - отдаёт Flask, 'x-sendfile' - Apache mod_xsendfile,
+    # 'x-accel-redirect' - nginx (internal location SENDFILE_ACCEL_PREFIX с alias на SENDFILE_ROOT)
+    PRECOMPRESSED_FOLDER = os.environ.get('PRECOMPRESSED_FOLDER') or os.path.join(basedir, 'instance', 'precompressed')
+    SENDFILE_MODE = os.environ.get('SENDFILE_MODE', '')
+    SENDFILE_ROOT = os.environ.get('SENDFILE_ROOT') or basedir
+    SENDFILE_ACCEL_PREFIX = os.environ.get('SENDFILE_ACCEL_PREFIX', '/_sendfile')
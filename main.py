@@ -1,3 +1,3 @@
-from app import app
+from app import create_app
 
-# test
\ No newline at end of file
+app = create_app()
@@ -0,0 +1,80 @@
+"""Add secondary indexes
+
+Revision ID: 3f8c1a7d5e29
+Revises: 9d4a2f61b7c3
+Create Date: 2026-10-18 19:12:44.602913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f8c1a7d5e29'
+down_revision = '9d4a2f61b7c3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('band_members', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_band_members_artist_id'), ['artist_id'], unique=False)
+
+    with op.batch_alter_table('bands', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_bands_genre_id'), ['genre_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_bands_name'), ['name'], unique=False)
+
+    with op.batch_alter_table('compositions', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_compositions_author_band_id'), ['author_band_id'], unique=False)
+
+    with op.batch_alter_table('order_items', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_order_items_order_id'), ['order_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_order_items_record_id'), ['record_id'], unique=False)
+
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_orders_order_date'), ['order_date'], unique=False)
+
+    with op.batch_alter_table('records', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_records_manufacturer_profile_id'), ['manufacturer_profile_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_records_release_id'), ['release_id'], unique=False)
+
+    with op.batch_alter_table('release_compositions', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_release_compositions_composition_id'), ['composition_id'], unique=False)
+
+    with op.batch_alter_table('releases', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_releases_band_id'), ['band_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_releases_release_year'), ['release_year'], unique=False)
+        batch_op.create_index(batch_op.f('ix_releases_title'), ['title'], unique=False)
+        batch_op.create_index('ix_releases_sort_year', [sa.text('coalesce(release_year, 0)')], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('releases', schema=None) as batch_op:
+        batch_op.drop_index('ix_releases_sort_year')
+        batch_op.drop_index(batch_op.f('ix_releases_title'))
+        batch_op.drop_index(batch_op.f('ix_releases_release_year'))
+        batch_op.drop_index(batch_op.f('ix_releases_band_id'))
+
+    with op.batch_alter_table('release_compositions', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_release_compositions_composition_id'))
+
+    with op.batch_alter_table('records', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_records_release_id'))
+        batch_op.drop_index(batch_op.f('ix_records_manufacturer_profile_id'))
+
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_orders_order_date'))
+
+    with op.batch_alter_table('order_items', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_order_items_record_id'))
+        batch_op.drop_index(batch_op.f('ix_order_items_order_id'))
+
+    with op.batch_alter_table('compositions', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_compositions_author_band_id'))
+
+    with op.batch_alter_table('bands', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_bands_name'))
+        batch_op.drop_index(batch_op.f('ix_bands_genre_id'))
+
+    with op.batch_alter_table('band_members', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_band_members_artist_id'))
@@ -0,0 +1,45 @@
+"""Add record_sales_daily rollup
+
+Revision ID: 4c1d7e2a9b30
+Revises: a5af9a4e75f5
+Create Date: 2026-10-18 10:12:41.503118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4c1d7e2a9b30'
+down_revision = 'a5af9a4e75f5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('record_sales_daily',
+    sa.Column('record_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.ForeignKeyConstraint(['record_id'], ['records.id'], ),
+    sa.PrimaryKeyConstraint('record_id', 'day')
+    )
+    with op.batch_alter_table('record_sales_daily', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_record_sales_daily_day'), ['day'], unique=False)
+
+    # заполняем свод по уже оформленным заказам
+    op.execute(
+        "INSERT INTO record_sales_daily (record_id, day, quantity, revenue) "
+        "SELECT oi.record_id, date(o.order_date), sum(oi.quantity), sum(oi.quantity * oi.price_at_purchase) "
+        "FROM order_items oi JOIN orders o ON o.id = oi.order_id "
+        "WHERE o.status != 'cancelled' "
+        "GROUP BY oi.record_id, date(o.order_date)"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('record_sales_daily', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_record_sales_daily_day'))
+
+    op.drop_table('record_sales_daily')
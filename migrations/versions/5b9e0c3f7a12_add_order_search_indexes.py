@@ -0,0 +1,27 @@
+"""Add order search indexes
+
+Revision ID: 5b9e0c3f7a12
+Revises: e2b6d38f0a17
+Create Date: 2026-10-18 14:36:05.118240
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '5b9e0c3f7a12'
+down_revision = 'e2b6d38f0a17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.create_index('ix_orders_status_order_date', ['status', 'order_date'], unique=False)
+        batch_op.create_index('ix_orders_user_id_order_date', ['user_id', 'order_date'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_index('ix_orders_user_id_order_date')
+        batch_op.drop_index('ix_orders_status_order_date')
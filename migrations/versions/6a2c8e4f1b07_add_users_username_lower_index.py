@@ -0,0 +1,26 @@
+"""Add users username lower index
+
+Revision ID: 6a2c8e4f1b07
+Revises: 3f8c1a7d5e29
+Create Date: 2026-10-18 21:05:37.284116
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6a2c8e4f1b07'
+down_revision = '3f8c1a7d5e29'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.create_index('ix_users_username_lower', [sa.text('lower(username)')], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_index('ix_users_username_lower')
@@ -0,0 +1,28 @@
+"""Add replication_heartbeat
+
+Revision ID: 9d4a2f61b7c3
+Revises: 5b9e0c3f7a12
+Create Date: 2026-10-18 16:12:44.508317
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d4a2f61b7c3'
+down_revision = '5b9e0c3f7a12'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('replication_heartbeat',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('replication_heartbeat')
@@ -0,0 +1,31 @@
+"""Add cart_items
+
+Revision ID: c7a0b94d1e58
+Revises: 8e3f5a61c2d4
+Create Date: 2026-10-18 12:31:52.190457
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7a0b94d1e58'
+down_revision = '8e3f5a61c2d4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('cart_items',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('record_id', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['record_id'], ['records.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'record_id')
+    )
+
+
+def downgrade():
+    op.drop_table('cart_items')
@@ -0,0 +1,75 @@
+import decimal
+import pytest
+from config import Config
+from app import create_app, db
+from app.models import Record, User
+from app.seed_db import seed_database
+from app.startup import warm_up
+
+PASSWORDS = {'admin': 'admin123', 'user1': 'password', 'manufacturer1': 'password'}
+
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    root = tmp_path_factory.mktemp('instance')
+    (root / 'uploads').mkdir()
+
+    # файловая база (не :memory:), чтобы потоки стресс-теста видели одни и те же данные;
+    # фоновые потоки выключены - тесты сами решают, что и когда выполнять
+    class TestConfig(Config):
+        TESTING = True
+        WTF_CSRF_ENABLED = False
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{root / "app.db"}'
+        SQLALCHEMY_BINDS = {}
+        SQL_STATS_HEADER = True
+        SQL_SLOW_QUERY_MS = 0
+        JOB_WORKERS = 0
+        RESERVATION_SWEEP_INTERVAL = 0
+        PROFILE_SAMPLE_INTERVAL = 0
+        UPLOAD_FOLDER = str(root / 'uploads')
+        THUMBNAIL_FOLDER = str(root / 'thumbnails')
+        PRECOMPRESSED_FOLDER = str(root / 'precompressed')
+        PROFILE_FOLDER = str(root / 'profiles')
+
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        seed_database()
+    warm_up(app)
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def login(client):
+    def login(username):
+        client.get('/logout')
+        response = client.post('/login', data={'username': username, 'password': PASSWORDS[username]})
+        assert response.status_code == 302, f'не удалось войти как {username}'
+        return client
+    return login
+
+
+@pytest.fixture
+def new_record(app):
+    """Отдельная пластинка для теста, чтобы не зависеть от остатков демо-данных."""
+    def new_record(stock, price='10.00'):
+        with app.app_context():
+            template = Record.query.order_by(Record.id).first()
+            record = Record(title='Тестовая пластинка', price=decimal.Decimal(price), stock_quantity=stock,
+                            release_id=template.release_id,
+                            manufacturer_profile_id=template.manufacturer_profile_id)
+            db.session.add(record)
+            db.session.commit()
+            return record.id
+    return new_record
+
+
+@pytest.fixture
+def user_id(app):
+    with app.app_context():
+        return User.query.filter_by(username='user1').one().id
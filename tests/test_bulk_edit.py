@@ -0,0 +1,70 @@
+import decimal
+import pytest
+from app import db
+from app.models import Record
+
+
+@pytest.fixture
+def bulk_record(app, new_record):
+    # отдельный тип записи, чтобы операция задела только эту пластинку
+    record_id = new_record(stock=7, price='20.00')
+    with app.app_context():
+        db.session.get(Record, record_id).record_type = f'bulk-test-{record_id}'
+        db.session.commit()
+    return record_id
+
+
+def _record(app, record_id):
+    with app.app_context():
+        return db.session.get(Record, record_id)
+
+
+@pytest.mark.parametrize('operation, value, field, expected', [
+    ('set_stock', '0', 'stock_quantity', 0),
+    ('adjust_price', '0', 'price', decimal.Decimal('20.00')),
+    ('set_price', '0', 'price', decimal.Decimal('0.00')),
+])
+def test_bulk_form_accepts_zero(app, login, bulk_record, operation, value, field, expected):
+    client = login('admin')
+    response = client.post('/admin/records/bulk', data={
+        'operation': operation, 'value': value, 'release_id': 0, 'band_id': 0,
+        'manufacturer_profile_id': 0, 'record_type': f'bulk-test-{bulk_record}', 'submit': 'Применить',
+    })
+    assert response.status_code == 200
+    assert 'Укажите значение' not in response.get_data(as_text=True)
+    assert getattr(_record(app, bulk_record), field) == expected
+
+
+@pytest.mark.parametrize('operation', ['set_price', 'adjust_price', 'set_stock'])
+@pytest.mark.parametrize('value', ['NaN', 'Infinity', '-Infinity', '1e999999'])
+def test_bulk_api_rejects_non_finite_and_huge_values(app, login, bulk_record, operation, value):
+    client = login('admin')
+    response = client.post('/api/records/bulk-update', json={
+        'operation': operation, 'value': value, 'filters': {'record_type': f'bulk-test-{bulk_record}'},
+    })
+    assert response.status_code == 400
+    record = _record(app, bulk_record)
+    assert (record.price, record.stock_quantity) == (decimal.Decimal('20.00'), 7)
+
+
+def test_bulk_update_without_filters_needs_confirmation(app, login, bulk_record):
+    # {"set_stock": 0} без фильтров обнулил бы весь каталог
+    client = login('admin')
+    with app.app_context():
+        before = db.session.query(db.func.sum(Record.stock_quantity)).scalar()
+
+    response = client.post('/api/records/bulk-update', json={'operation': 'set_stock', 'value': 0})
+    assert response.status_code == 400
+    response = client.post('/admin/records/bulk', data={
+        'operation': 'set_stock', 'value': '0', 'release_id': 0, 'band_id': 0,
+        'manufacturer_profile_id': 0, 'record_type': '', 'submit': 'Применить',
+    })
+    assert 'подтвердите изменение всего каталога' in response.get_data(as_text=True)
+
+    with app.app_context():
+        assert db.session.query(db.func.sum(Record.stock_quantity)).scalar() == before
+
+    # пробный запуск по-прежнему считает весь каталог
+    response = client.post('/api/records/bulk-update', json={'operation': 'set_stock', 'value': 0, 'dry_run': True})
+    with app.app_context():
+        assert response.get_json() == {'matched': Record.query.count()}
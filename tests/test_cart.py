@@ -0,0 +1,45 @@
+import pytest
+from app import db
+from app.cart_store import SqlCartStore
+from app.models import CartItem, Record, StockReservation
+
+
+def test_deleting_record_clears_carts_and_holds(app, client, login, new_record):
+    record_id = new_record(stock=5)
+    login('user1')
+    client.post(f'/add_to_cart/{record_id}', data={'quantity': 2})
+
+    login('admin')
+    assert client.post(f'/admin/record/delete/{record_id}').status_code == 302
+
+    with app.app_context():
+        assert db.session.query(CartItem).filter_by(record_id=record_id).count() == 0
+        assert db.session.query(StockReservation).filter_by(record_id=record_id).count() == 0
+
+
+def test_add_to_cart_keeps_hold_and_cart_row_together(app, login, new_record, monkeypatch):
+    # сбой после удержания, но до строки корзины не должен оставить товар удержанным
+    record_id = new_record(stock=5)
+    client = login('user1')
+
+    def broken_add(self, user_id, record_id, quantity):
+        raise RuntimeError('сбой хранилища корзины')
+
+    monkeypatch.setattr(SqlCartStore, 'add', broken_add)
+    with pytest.raises(RuntimeError):
+        client.post(f'/add_to_cart/{record_id}', data={'quantity': 2})
+
+    with app.app_context():
+        assert db.session.get(Record, record_id).stock_quantity == 5
+        assert db.session.query(StockReservation).filter_by(record_id=record_id).count() == 0
+
+    monkeypatch.undo()
+    client.post(f'/add_to_cart/{record_id}', data={'quantity': 2})
+    with app.app_context():
+        assert db.session.get(Record, record_id).stock_quantity == 3
+        assert db.session.query(StockReservation).filter_by(record_id=record_id).one().quantity == 2
+        assert db.session.query(CartItem).filter_by(record_id=record_id).one().quantity == 2
+
+    client.post(f'/remove_from_cart/{record_id}')
+    with app.app_context():
+        assert db.session.get(Record, record_id).stock_quantity == 5
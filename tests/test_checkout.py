@@ -0,0 +1,92 @@
+import datetime
+import threading
+import time
+from app import db
+from app.checkout import place_order, OutOfStock
+from app.models import OrderItem, Record, StockReservation
+
+STOCK = 100
+THREADS = 8
+ATTEMPTS_PER_THREAD = 40
+
+
+def test_concurrent_checkout_never_oversells(app, new_record, user_id):
+    # покупателей больше, чем экземпляров: ровно STOCK заказов должны пройти, остальные - OutOfStock
+    record_id = new_record(stock=STOCK)
+    results = {'placed': 0, 'out_of_stock': 0, 'errors': []}
+    lock = threading.Lock()
+
+    def buyer():
+        with app.app_context():
+            for _ in range(ATTEMPTS_PER_THREAD):
+                try:
+                    place_order(user_id, {record_id: 1}, 'Card', 'ул. Тестовая, 1')
+                    outcome = 'placed'
+                except OutOfStock:
+                    outcome = 'out_of_stock'
+                except Exception as exc:
+                    with lock:
+                        results['errors'].append(repr(exc))
+                    continue
+                with lock:
+                    results[outcome] += 1
+
+    threads = [threading.Thread(target=buyer) for _ in range(THREADS)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    with app.app_context():
+        stock = db.session.get(Record, record_id).stock_quantity
+        sold = db.session.query(db.func.sum(OrderItem.quantity)).filter(OrderItem.record_id == record_id).scalar()
+
+    attempts = THREADS * ATTEMPTS_PER_THREAD
+    print(f'\n{attempts} попыток в {THREADS} потоках: {attempts / elapsed:.0f} оформлений/с, '
+          f'продано {sold}, отказов {results["out_of_stock"]}')
+    assert results['errors'] == []
+    assert results['placed'] == STOCK
+    assert results['out_of_stock'] == attempts - STOCK
+    assert sold == STOCK
+    assert stock == 0
+
+
+def test_checkout_with_deleted_held_record(app, login, new_record):
+    # удержание покрывает весь заказ, а самой пластинки уже нет (строка удалена в обход маршрутов)
+    client = login('user1')
+    record_id = new_record(stock=5)
+    client.post(f'/add_to_cart/{record_id}', data={'quantity': 2})
+    with app.app_context():
+        db.session.execute(db.delete(Record).where(Record.id == record_id))
+        db.session.commit()
+
+    response = client.post('/checkout', data={'shipping_address': 'ул. Тестовая, 1', 'payment_method': 'Card'})
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith('/cart')
+
+    # корзина сама избавляется от удалённой пластинки, и заказ снова можно оформить
+    assert client.get('/cart').status_code == 200
+    assert client.get('/checkout').headers['Location'].endswith('/cart')
+
+
+def test_checkout_with_expired_hold(app, login, new_record):
+    # удержание последнего экземпляра просрочено, но фоновый поток его ещё не вернул на склад
+    client = login('user1')
+    record_id = new_record(stock=1)
+    client.post(f'/add_to_cart/{record_id}', data={'quantity': 1})
+    with app.app_context():
+        db.session.execute(db.update(StockReservation).where(StockReservation.record_id == record_id)
+                           .values(expires_at=datetime.datetime.utcnow() - datetime.timedelta(minutes=1)))
+        db.session.commit()
+
+    response = client.post('/checkout', data={'shipping_address': 'ул. Тестовая, 1', 'payment_method': 'Card'})
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith('/orders')
+
+    with app.app_context():
+        assert db.session.get(Record, record_id).stock_quantity == 0
+        assert StockReservation.query.filter_by(record_id=record_id).count() == 0
+        sold = db.session.query(db.func.sum(OrderItem.quantity)).filter(OrderItem.record_id == record_id).scalar()
+        assert sold == 1
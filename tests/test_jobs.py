@@ -0,0 +1,38 @@
+import datetime
+from app import db
+from app.jobs import enqueue, requeue_stale
+from app.models import Job
+
+
+def test_enqueue_is_part_of_callers_transaction(app):
+    with app.app_context():
+        before = db.session.query(Job).count()
+        enqueue('order_placed', order_id=0)
+        db.session.rollback()
+        assert db.session.query(Job).count() == before
+
+        job = enqueue('order_placed', order_id=0)
+        db.session.commit()
+        assert db.session.query(Job).count() == before + 1
+
+        db.session.delete(job)
+        db.session.commit()
+
+
+def test_requeue_stale_leaves_live_jobs_running(app):
+    # свежую задачу выполняет другой живой процесс - при перезапуске соседа она не должна пойти второй раз
+    now = datetime.datetime.utcnow()
+    with app.app_context():
+        live = enqueue('order_placed', order_id=0)
+        stale = enqueue('order_placed', order_id=0)
+        live.status, live.started_at = 'running', now - datetime.timedelta(minutes=1)
+        stale.status, stale.started_at = 'running', now - datetime.timedelta(hours=2)
+        db.session.commit()
+
+        assert requeue_stale(lease=30 * 60) == 1
+        db.session.expire_all()
+        assert (live.status, stale.status) == ('running', 'queued')
+
+        db.session.delete(live)
+        db.session.delete(stale)
+        db.session.commit()
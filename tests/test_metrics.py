@@ -0,0 +1,19 @@
+import threading
+from app import metrics
+
+
+def _run_threads(count):
+    for _ in range(count):
+        thread = threading.Thread(target=metrics.inc, args=('test_thread_metrics_total',))
+        thread.start()
+        thread.join()
+
+
+def test_dead_threads_do_not_accumulate_without_scrape():
+    # поток на запрос, /metrics никто не опрашивает - список потоков всё равно не растёт
+    before = metrics.snapshot()[0].get(('test_thread_metrics_total', ()), 0)
+    _run_threads(500)
+    assert len(metrics._threads) <= threading.active_count() + 1
+
+    counters, _ = metrics.snapshot()
+    assert counters[('test_thread_metrics_total', ())] == before + 500
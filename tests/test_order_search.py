@@ -0,0 +1,24 @@
+import pytest
+
+
+@pytest.mark.parametrize('q', ['²', '٣', '99999999999999999999999', '#9223372036854775808'])
+def test_non_id_digits_find_nothing(login, q):
+    # не ASCII-цифры и id за пределами 64 бит - не ошибка, а пустой результат
+    client = login('admin')
+    assert client.get('/admin/orders', query_string={'q': q}).status_code == 200
+
+    response = client.get('/admin/orders/export.csv', query_string={'q': q})
+    assert response.status_code == 200
+    assert response.get_data(as_text=True).splitlines()[1:] == []
+
+
+def test_username_search_ignores_case(login, new_record):
+    client = login('user1')
+    record_id = new_record(stock=1)
+    client.post(f'/add_to_cart/{record_id}', data={'quantity': 1})
+    client.post('/checkout', data={'shipping_address': 'ул. Тестовая, 1', 'payment_method': 'Card'})
+
+    client = login('admin')
+    response = client.get('/admin/orders/export.csv', query_string={'q': 'USER1'})
+    rows = response.get_data(as_text=True).splitlines()[1:]
+    assert rows and all(',user1,' in row for row in rows)
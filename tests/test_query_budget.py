@@ -0,0 +1,78 @@
+import re
+import pytest
+from app import db
+from app.models import Order, Record, User
+
+# Бюджет SQL-запросов на страницу: число не должно расти с числом строк.
+# Ленивая загрузка в шаблоне (N+1) сразу выводит страницу за бюджет.
+# Запрос повторяется дважды, считается второй - кэши справочников уже прогреты.
+BUDGETS = {
+    None: {
+        '/': 1,
+        '/?genre=1&sort=year_desc': 1,
+        '/?q=the': 1,
+        '/bands': 2,
+        '/band/1': 4,
+        '/release/1': 4,
+        '/record/1': 2,
+        '/top_selling': 1,
+    },
+    'user1': {
+        '/cart': 2,
+        '/orders': 2,
+        '/order/{order_id}': 3,
+        '/profile': 2,
+    },
+    'manufacturer1': {
+        '/my-records': 3,
+        '/sales-report': 5,
+    },
+    'admin': {
+        '/admin/dashboard': 4,
+        '/admin/records': 2,
+        '/admin/orders': 2,
+        '/admin/bands': 3,
+        '/admin/releases': 2,
+        '/admin/compositions': 2,
+        '/admin/users': 2,
+        '/admin/artists': 2,
+        '/admin/genres': 2,
+        '/admin/jobs': 5,
+        '/order/{order_id}': 3,
+    },
+}
+
+
+@pytest.fixture(scope='module')
+def order_id(app):
+    # заказ из нескольких позиций, чтобы страницы заказов было на чём проверять
+    client = app.test_client()
+    client.post('/login', data={'username': 'user1', 'password': 'password'})
+    with app.app_context():
+        record_ids = [r.id for r in Record.query.filter(Record.stock_quantity > 0).order_by(Record.id).limit(3)]
+    for record_id in record_ids:
+        client.post(f'/add_to_cart/{record_id}', data={'quantity': 1})
+    client.post('/checkout', data={'shipping_address': 'ул. Тестовая, 1', 'payment_method': 'Card'})
+    with app.app_context():
+        user = User.query.filter_by(username='user1').one()
+        return db.session.query(db.func.max(Order.id)).filter(Order.user_id == user.id).scalar()
+
+
+def _sql_stats(response):
+    header = response.headers['X-SQL-Stats']
+    return {key: float(value) for key, value in re.findall(r'(\w+)=([\d.]+)', header)}
+
+
+@pytest.mark.parametrize('user, path, budget', [
+    (user, path, budget) for user, routes in BUDGETS.items() for path, budget in routes.items()
+])
+def test_query_budget(client, login, order_id, user, path, budget):
+    if user:
+        login(user)
+    url = path.format(order_id=order_id)
+    client.get(url)
+    response = client.get(url)
+    assert response.status_code == 200
+    stats = _sql_stats(response)
+    assert stats['n_plus_one'] == 0
+    assert stats['queries'] <= budget, f'{url}: {stats["queries"]:.0f} запросов при бюджете {budget}'
@@ -0,0 +1,154 @@
+import re
+import threading
+import pytest
+from sqlalchemy import event
+from app import db
+from app.refcache import invalidate
+from app.sales import rebuild_sales_rollup
+
+# Регрессия планов запросов: каждый SELECT горячих маршрутов прогоняется через
+# EXPLAIN QUERY PLAN, полный просмотр таблицы (SCAN без поиска по индексу) -
+# ошибка. На крошечных демо-таблицах планировщику выгоднее сканировать, поэтому
+# база сначала дополняется до размеров живого магазина и анализируется.
+
+ROUTES = {
+    'user1': ['/', '/?genre=1', '/?band=2', '/?year_min=1990&year_max=2000', '/?sort=year_desc',
+              '/?sort=year_asc', '/?sort=title_desc', '/?q=Release', '/bands', '/band/2', '/release/3',
+              '/record/5', '/top_selling', '/cart', '/orders', '/order/{order_id}'],
+    'admin': ['/admin/orders', '/admin/orders?q=user', '/admin/orders?date_from=2020-01-01',
+              '/admin/orders/export.csv?date_from=2026-06-01', '/admin/records', '/admin/bands',
+              '/admin/releases', '/admin/compositions', '/api/compositions_by_band/2'],
+    'manufacturer1': ['/my-records', '/sales-report'],
+}
+
+# просмотр, который и есть смысл запроса: все строки справочника нужны целиком
+ALLOWED_SCANS = {
+    'genres',                 # фильтр жанров в каталоге
+    'manufacturer_profiles',  # выбор производителя в формах
+    'bands',                  # список групп для фильтра (по ix_bands_name, уже в нужном порядке)
+}
+
+_BULK_CATALOG = [
+    "CREATE TEMP TABLE n AS WITH RECURSIVE c(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM c WHERE i < 20000) "
+    "SELECT i FROM c",
+    "INSERT INTO users (username, password_hash, role) SELECT 'bulk' || i, 'x', 'user' FROM n WHERE i <= 3000",
+    "INSERT INTO bands (name, genre_id) SELECT 'Band ' || i, 1 + i % 5 FROM n WHERE i <= 800",
+    "INSERT INTO artists (name) SELECT 'Artist ' || i FROM n WHERE i <= 2000",
+    "INSERT OR IGNORE INTO band_members (band_id, artist_id) SELECT 1 + i % 800, 1 + i % 2000 FROM n WHERE i <= 3000",
+    "INSERT INTO releases (title, release_year, band_id) SELECT 'Rel ' || i, 1960 + i % 60, 1 + i % 800 "
+    "FROM n WHERE i <= 4000",
+    "INSERT INTO compositions (title, duration, author_band_id) SELECT 'Song ' || i, 200, 1 + i % 800 "
+    "FROM n WHERE i <= 8000",
+    "INSERT INTO records (title, release_year, price, stock_quantity, release_id, manufacturer_profile_id) "
+    "SELECT 'Rec ' || i, 1990, 10, 5, 1 + i % 4000, 1 FROM n WHERE i <= 6000",
+    "INSERT INTO orders (user_id, order_date, total_amount, status, payment_method) "
+    "SELECT 1 + i % 3000, datetime('2020-01-01', '+' || (i % 2500) || ' days'), 10, 'В обработке', 'Card' "
+    "FROM n WHERE i <= 8000",
+    "INSERT INTO order_items (order_id, record_id, quantity, price_at_purchase) "
+    "SELECT 1 + i % 8000, 1 + i % 6000, 1, 10 FROM n",
+    "INSERT OR IGNORE INTO record_sales_daily (record_id, day, quantity, revenue) "
+    "SELECT oi.record_id, date(o.order_date), sum(oi.quantity), sum(oi.quantity * oi.price_at_purchase) "
+    "FROM order_items oi JOIN orders o ON o.id = oi.order_id GROUP BY 1, 2",
+    "DROP TABLE n",
+]
+
+
+# таблицы с добавленными строками - в порядке удаления (сначала ссылающиеся)
+_BULK_TABLES = ['order_items', 'orders', 'records', 'compositions', 'releases', 'artists', 'bands', 'users']
+
+
+def _analyze():
+    db.session.connection().exec_driver_sql('ANALYZE')
+    db.session.commit()
+    # статистику соединение читает при загрузке схемы - открытые соединения её не видят
+    db.engine.dispose()
+
+
+@pytest.fixture(scope='module')
+def order_id(app):
+    client = app.test_client()
+    client.post('/login', data={'username': 'user1', 'password': 'password'})
+    client.post('/add_to_cart/5', data={'quantity': 1})
+    client.post('/checkout', data={'shipping_address': 'ул. Тестовая, 1', 'payment_method': 'Card'})
+
+    with app.app_context():
+        connection = db.session.connection()
+        last_ids = {table: connection.exec_driver_sql(f'SELECT coalesce(max(id), 0) FROM {table}').scalar()
+                    for table in _BULK_TABLES}
+        members = set(connection.exec_driver_sql('SELECT band_id, artist_id FROM band_members'))
+        for statement in _BULK_CATALOG:
+            connection.exec_driver_sql(statement)
+        db.session.commit()
+        _analyze()
+        order_id = db.session.execute(db.text(
+            "SELECT max(o.id) FROM orders o JOIN users u ON u.id = o.user_id WHERE u.username = 'user1'"
+        )).scalar()
+
+    yield order_id
+
+    # база общая на всю сессию тестов: убираем добавленное, чтобы следующие модули видели демо-данные
+    with app.app_context():
+        connection = db.session.connection()
+        added = set(connection.exec_driver_sql('SELECT band_id, artist_id FROM band_members')) - members
+        if added:
+            connection.exec_driver_sql('DELETE FROM band_members WHERE band_id = ? AND artist_id = ?',
+                                       [tuple(pair) for pair in added])
+        for table in _BULK_TABLES:
+            connection.exec_driver_sql(f'DELETE FROM {table} WHERE id > ?', (last_ids[table],))
+        db.session.commit()
+        rebuild_sales_rollup()
+        _analyze()
+    # строки добавлялись в обход ORM - кэш справочников о них не знает, но мог успеть их прочитать
+    invalidate()
+
+
+@pytest.fixture
+def captured_selects(app):
+    # только запросы самого маршрута: фоновые потоки тестам не нужны, но и не мешают
+    statements = []
+    main = threading.current_thread()
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if threading.current_thread() is main and not executemany \
+                and statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', capture)
+    yield statements
+    event.remove(engine, 'before_cursor_execute', capture)
+
+
+def _full_scans(statement, plan):
+    # SCAN под LIMIT в порядке индекса (без временной сортировки) читает только одну страницу
+    if ' LIMIT ' in statement and not any('USE TEMP B-TREE FOR ORDER BY' in step for step in plan):
+        return []
+    scans = []
+    for step in plan:
+        match = re.match(r'SCAN (?!anon_|CONSTANT)(\w+)', step)
+        # MATCH по FTS5 (INDEX 0:M...) - поиск по полнотекстовому индексу, а не просмотр
+        if match and match.group(1) not in ALLOWED_SCANS and not re.search(r'VIRTUAL TABLE INDEX \d+:M', step):
+            scans.append(step)
+    return scans
+
+
+@pytest.mark.parametrize('user, path', [(user, path) for user, paths in ROUTES.items() for path in paths])
+def test_hot_route_uses_indexes(app, client, login, order_id, captured_selects, user, path):
+    login(user)
+    captured_selects.clear()
+    response = client.get(path.format(order_id=order_id))
+    response.get_data()
+    response.close()
+    assert response.status_code == 200
+    assert captured_selects
+
+    scans = {}
+    with app.app_context():
+        connection = db.session.connection()
+        for statement, parameters in captured_selects:
+            plan = [row[-1] for row in connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters)]
+            for step in _full_scans(statement, plan):
+                scans.setdefault(step, (statement, parameters, plan))
+    assert not scans, '\n\n'.join(f'{step}:\n{statement}\n{parameters}\n{plan}'
+                                    for step, (statement, parameters, plan) in scans.items())
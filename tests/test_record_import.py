@@ -0,0 +1,33 @@
+import io
+import json
+import pytest
+from app.models import Record
+
+
+def _row(title, **values):
+    row = {'title': title, 'release_id': 1, 'price': '10.00', 'stock_quantity': 3, 'release_year': 1999}
+    row.update(values)
+    return json.dumps(row, ensure_ascii=False)
+
+
+@pytest.mark.parametrize('field, value, message', [
+    ('stock_quantity', 10 ** 30, 'stock_quantity: не может быть больше'),
+    ('release_year', 10 ** 30, 'release_year: не может быть больше'),
+    ('release_year', 1200, 'release_year: не может быть меньше'),
+    ('price', '1e20', 'price: не может быть больше'),
+])
+def test_out_of_range_values_are_row_errors(app, login, field, value, message):
+    # не 500 на вставке пачки, а ошибка в строке - остальной файл загружается
+    client = login('manufacturer1')
+    title = f'Импорт {field}={value}'
+    data = '\n'.join([_row(f'{title} ок'), _row(title, **{field: value})]).encode()
+
+    response = client.post('/my-records/import', data={
+        'data_file': (io.BytesIO(data), 'records.jsonl'), 'skip_invalid': 'y',
+    }, content_type='multipart/form-data')
+    assert response.status_code == 200
+    assert message in response.get_data(as_text=True)
+
+    with app.app_context():
+        assert Record.query.filter_by(title=f'{title} ок').count() == 1
+        assert Record.query.filter_by(title=title).count() == 0
@@ -0,0 +1,27 @@
+import pytest
+from sqlalchemy.dialects import postgresql, sqlite
+from app.models import RecordSalesDaily
+from app.sales import period_bucket, REPORT_PERIODS
+
+
+@pytest.mark.parametrize('year', ['0', '-5', '10000'])
+def test_top_selling_rejects_year_out_of_range(client, year):
+    assert client.get(f'/top_selling?year={year}').status_code == 400
+
+
+def test_top_selling_accepts_year(client):
+    assert client.get('/top_selling?year=1999').status_code == 200
+
+
+@pytest.mark.parametrize('period', REPORT_PERIODS)
+def test_report_period_bucket_matches_dialect(period):
+    # strftime есть только в SQLite - на PostgreSQL отчёт группирует через to_char
+    for dialect, function in ((sqlite, 'strftime'), (postgresql, 'to_char')):
+        expr = period_bucket(period, RecordSalesDaily.day, dialect.dialect.name)
+        assert str(expr.compile(dialect=dialect.dialect())).startswith(function + '(')
+
+
+@pytest.mark.parametrize('period', REPORT_PERIODS)
+def test_sales_report_periods(login, period):
+    client = login('manufacturer1')
+    assert client.get(f'/sales-report?period={period}').status_code == 200
@@ -0,0 +1,35 @@
+import os
+from PIL import Image
+from config import Config
+from app.thumbnails import cover_url, make_thumbnails
+
+
+def _upload(app, name, fmt):
+    path = os.path.join(app.config['UPLOAD_FOLDER'], name)
+    Image.new('RGB', (400, 300), 'red').save(path, fmt)
+    return name
+
+
+def test_gif_copies_are_served_as_png(app, client):
+    name = _upload(app, 'cover-test.gif', 'GIF')
+    with app.app_context():
+        make_thumbnails(name)
+
+    response = client.get(f'/thumbs/160/{name}', headers={'Accept': 'image/png,image/*'})
+    assert response.status_code == 200
+    assert response.mimetype == 'image/png'
+    assert response.get_data().startswith(b'\x89PNG')
+
+    response = client.get(f'/thumbs/160/{name}', headers={'Accept': 'image/webp,image/*'})
+    assert response.mimetype == 'image/webp'
+
+
+def test_cover_url_uses_nearest_configured_width(app):
+    with app.test_request_context():
+        app.config['THUMBNAIL_WIDTHS'] = [200, 500]
+        try:
+            assert cover_url('a.jpg', 320) == '/thumbs/200/a.jpg'
+            assert cover_url('a.jpg', 350) == '/thumbs/500/a.jpg'
+            assert cover_url('a.jpg', 900) == '/thumbs/500/a.jpg'
+        finally:
+            app.config['THUMBNAIL_WIDTHS'] = Config.THUMBNAIL_WIDTHS